@@ -0,0 +1,276 @@
+import pandas as pd
+import numpy as np
+import threading
+
+import instrumentation
+
+ROLLUP_COLUMNS = ['date', 'class_type', 'school_id', 'classes', 'hours', 'earnings']
+MEASURES = ['classes', 'hours', 'earnings']
+
+# Periods the daily buckets roll up to; weeks start on Monday
+PERIODS = ['day', 'week', 'month', 'quarter']
+
+# Rollups shared by every session in the process, keyed on the storage
+# location and tagged with the storage signature they were built from
+_rollup_cache = {}
+_rollup_cache_lock = threading.Lock()
+
+
+class Rollups:
+    """Class counts, hours and earnings per day, class type and school.
+
+    Buckets live in flat arrays in insertion order, plus a permutation that
+    sorts them by day, so a date range is two binary searches and a slice.
+    """
+
+    def __init__(self, grouped=None):
+        if grouped is None:
+            grouped = pd.DataFrame(columns=ROLLUP_COLUMNS)
+        self._dates = grouped['date'].to_numpy(dtype='datetime64[ns]', copy=True)
+        self._types = grouped['class_type'].to_numpy(dtype=object, copy=True)
+        self._schools = grouped['school_id'].to_numpy(dtype=object, copy=True)
+        self._classes = grouped['classes'].to_numpy(dtype='int64', copy=True)
+        self._hours = grouped['hours'].to_numpy(dtype='float64', copy=True)
+        self._earnings = grouped['earnings'].to_numpy(dtype='float64', copy=True)
+        # (day, class_type, school_id) -> bucket position
+        self._positions = {
+            (day, class_type, school_id): i
+            for i, (day, class_type, school_id) in enumerate(zip(self._dates, self._types, self._schools))
+        }
+        # Buckets created since the arrays were last rebuilt
+        self._pending = []
+        # Totals per week, month or quarter, built on first use and dropped on every add
+        self._cubes = {}
+        self._lock = threading.Lock()
+        self._order = np.argsort(self._dates, kind='stable')
+        self._sorted_dates = self._dates[self._order]
+
+    @classmethod
+    def from_classes(cls, classes_df):
+        """Build rollups with one pass over a typed classes frame."""
+        return cls(_group(classes_df))
+
+    def add(self, rows):
+        """Fold newly saved class rows into the rollups."""
+        with self._lock:
+            for row in rows:
+                self._add_row(row)
+            self._cubes.clear()
+
+    def remove(self, rows):
+        """Take edited or deleted class rows, as they were, back out of the rollups."""
+        with self._lock:
+            for row in rows:
+                self._add_row(row, -1)
+            self._cubes.clear()
+
+    def _add_row(self, row, sign=1):
+        key = (np.datetime64(pd.Timestamp(row['date']).normalize(), 'ns'), row['class_type'], row['school_id'])
+        duration, price = sign * float(row['duration']), sign * float(row['price'])
+        position = self._positions.get(key)
+        if position is None:
+            self._positions[key] = len(self._dates) + len(self._pending)
+            self._pending.append([*key, sign, duration, price])
+        elif position < len(self._dates):
+            self._classes[position] += sign
+            self._hours[position] += duration
+            self._earnings[position] += price
+        else:
+            bucket = self._pending[position - len(self._dates)]
+            bucket[3] += sign
+            bucket[4] += duration
+            bucket[5] += price
+
+    def _flush(self):
+        """Move pending buckets into the arrays and re-sort them by day."""
+        if not self._pending:
+            return
+        dates, types, schools, classes, hours, earnings = zip(*self._pending)
+        self._dates = np.concatenate([self._dates, np.array(dates, dtype='datetime64[ns]')])
+        self._types = np.concatenate([self._types, np.array(types, dtype=object)])
+        self._schools = np.concatenate([self._schools, np.array(schools, dtype=object)])
+        self._classes = np.concatenate([self._classes, np.array(classes, dtype='int64')])
+        self._hours = np.concatenate([self._hours, np.array(hours, dtype='float64')])
+        self._earnings = np.concatenate([self._earnings, np.array(earnings, dtype='float64')])
+        self._pending = []
+        self._order = np.argsort(self._dates, kind='stable')
+        self._sorted_dates = self._dates[self._order]
+
+    def range(self, start=None, end=None):
+        """Return the rollup rows for an inclusive date range."""
+        with self._lock:
+            self._flush()
+            return self._slice(start, end)
+
+    def _slice(self, start, end):
+        lo = 0 if start is None else np.searchsorted(
+            self._sorted_dates, np.datetime64(pd.Timestamp(start).normalize(), 'ns'), side='left'
+        )
+        hi = len(self._sorted_dates) if end is None else np.searchsorted(
+            self._sorted_dates, np.datetime64(pd.Timestamp(end).normalize(), 'ns'), side='right'
+        )
+        rows = self._order[lo:hi]
+        # Buckets whose classes were all deleted or moved stay behind empty
+        rows = rows[self._classes[rows] != 0]
+        return pd.DataFrame({
+            'date': self._dates[rows],
+            'class_type': self._types[rows],
+            'school_id': self._schools[rows],
+            'classes': self._classes[rows],
+            'hours': self._hours[rows],
+            'earnings': self._earnings[rows],
+        }, columns=ROLLUP_COLUMNS)
+
+    def _cube(self, period):
+        """Totals per period start, class type and school, sorted by period; the caller holds the lock."""
+        cube = self._cubes.get(period)
+        if cube is None:
+            days = self._slice(None, None)
+            days['period'] = period_start(days['date'], period)
+            grouped = days.groupby(['period', 'class_type', 'school_id'], sort=True)[MEASURES].sum()
+            cube = self._cubes[period] = grouped.reset_index()
+        return cube
+
+    def totals(self, start=None, end=None, period='month', by=('class_type', 'school_id')):
+        """Return totals for an inclusive date range per period and the `by` dimensions.
+
+        Whole weeks, months or quarters inside the range come from the
+        cached cube and only the partial periods at either end are summed
+        from the daily buckets, so a drilldown costs the same however
+        long the range is. With `period` None the range is one total per
+        `by` group.
+        """
+        by = list(by)
+        # Whole-range totals are summed from months
+        grain = period or 'month'
+        with self._lock:
+            self._flush()
+            if grain == 'day':
+                parts = [self._slice(start, end).rename(columns={'date': 'period'})]
+            else:
+                # First day of the first whole period, and of the period after the last whole one
+                full_start = full_end = None
+                if start is not None:
+                    day = pd.Timestamp(start).normalize()
+                    full_start = period_start([day], grain)[0]
+                    if full_start != day:
+                        full_start = next_period(full_start, grain)
+                if end is not None:
+                    day = pd.Timestamp(end).normalize()
+                    full_end = period_start([day], grain)[0]
+                    if next_period(full_end, grain) - pd.Timedelta(days=1) == day:
+                        full_end = next_period(full_end, grain)
+
+                cube = self._cube(grain)
+                if full_start is not None and full_end is not None and full_start >= full_end:
+                    # The range sits inside a single period
+                    middle, edges = cube.iloc[:0], [self._slice(start, end)]
+                else:
+                    lo = 0 if full_start is None else cube['period'].searchsorted(full_start, side='left')
+                    hi = len(cube) if full_end is None else cube['period'].searchsorted(full_end, side='left')
+                    middle, edges = cube.iloc[lo:hi], []
+                    if full_start is not None:
+                        edges.append(self._slice(start, full_start - pd.Timedelta(days=1)))
+                    if full_end is not None:
+                        edges.append(self._slice(full_end, end))
+                edges = pd.concat(edges, ignore_index=True) if edges else self._slice(None, None).iloc[:0]
+                edges['period'] = period_start(edges['date'], grain)
+                parts = [middle, edges.drop(columns='date')]
+
+        return combine(parts, ([] if period is None else ['period']) + by)
+
+    def compare(self, classes_df, tolerance=0.01):
+        """Return the rollup rows that differ from a full recompute over `classes_df`."""
+        expected = _group(classes_df).set_index(['date', 'class_type', 'school_id'])
+        actual = self.range().set_index(['date', 'class_type', 'school_id'])
+        joined = expected.join(actual, how='outer', lsuffix='_expected', rsuffix='_actual').fillna(0)
+        mismatch = (
+            (joined['classes_expected'] != joined['classes_actual']) |
+            ((joined['hours_expected'] - joined['hours_actual']).abs() > tolerance) |
+            ((joined['earnings_expected'] - joined['earnings_actual']).abs() > tolerance)
+        )
+        return joined.loc[mismatch].reset_index()
+
+
+def combine(frames, keys):
+    """Add up rollup or totals frames per `keys`; with no keys the result is one row of totals."""
+    df = pd.concat([frame for frame in frames if not frame.empty] or frames[:1], ignore_index=True)
+    if not keys:
+        # Keep class counts whole
+        return df[MEASURES].sum().to_frame().T.astype(df[MEASURES].dtypes)
+    return df.groupby(list(keys), sort=True)[MEASURES].sum().reset_index()
+
+
+def period_start(dates, period):
+    """Map days to the first day of their week (Monday), month or quarter."""
+    dates = pd.DatetimeIndex(dates)
+    if period == 'day':
+        return dates
+    if period == 'week':
+        return dates - pd.to_timedelta(dates.weekday, unit='D')
+    if period in ('month', 'quarter'):
+        return dates.to_period('M' if period == 'month' else 'Q').start_time
+    raise ValueError(f"Unknown period: {period}")
+
+
+def next_period(start, period):
+    """Return the first day of the period after the one starting on `start`."""
+    if period == 'week':
+        return start + pd.Timedelta(days=7)
+    return start + pd.DateOffset(months=1 if period == 'month' else 3)
+
+
+def _group(classes_df):
+    """Aggregate a typed classes frame to the rollup grain."""
+    grouped = classes_df.astype({'duration': 'float64', 'price': 'float64'}).groupby(
+        [classes_df['date'].dt.normalize(), 'class_type', 'school_id'], observed=True
+    ).agg(classes=('price', 'size'), hours=('duration', 'sum'), earnings=('price', 'sum'))
+    df = grouped.reset_index()
+    return df.astype({'class_type': object, 'school_id': object})
+
+
+def get_rollups(storage):
+    """Return the process-wide rollups for a storage backend, rebuilding them if the data changed."""
+    key = storage.cache_key()
+    signature = storage.signature()
+    with _rollup_cache_lock:
+        cached = _rollup_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    with instrumentation.span('aggregates.rebuild') as span:
+        classes = storage.load_classes()
+        rollups = Rollups.from_classes(classes)
+        span.rows = len(classes)
+    with _rollup_cache_lock:
+        _rollup_cache[key] = (signature, rollups)
+    return rollups
+
+
+def forget(storage):
+    """Drop the cached rollups of a storage backend."""
+    with _rollup_cache_lock:
+        _rollup_cache.pop(storage.cache_key(), None)
+
+
+def record_append(storage, rows, signature_before, signature_after):
+    """Update cached rollups after `rows` were appended to `storage`.
+
+    If the cache no longer matches the data the append started from it is
+    dropped and rebuilt on the next read instead.
+    """
+    record_edit(storage, [], rows, signature_before, signature_after)
+
+
+def record_edit(storage, removed, added, signature_before, signature_after):
+    """Update cached rollups after the `removed` class rows were replaced by the `added` ones."""
+    key = storage.cache_key()
+    with _rollup_cache_lock:
+        cached = _rollup_cache.get(key)
+        if cached is None or cached[0] == signature_after:
+            return
+        if cached[0] != signature_before:
+            del _rollup_cache[key]
+            return
+        cached[1].remove(removed)
+        cached[1].add(added)
+        _rollup_cache[key] = (signature_after, cached[1])
@@ -0,0 +1,348 @@
+"""Read-only HTTP API over the same DataManager the app uses.
+
+Run it next to the Streamlit app, or on its own:
+
+    python api.py --port 8502
+
+Every endpoint takes the educator as `?tenant=` or an `X-Tenant` header,
+like the app, along with the token TRACKER_TENANT_TOKENS lists for them as
+`Authorization: Bearer <token>` or `?token=`. Without one, TRACKER_TENANT
+or the files in the working directory are served. Responses carry an ETag derived from the data version, and
+a request whose If-None-Match still matches gets a 304 without touching
+the data.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import date
+
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import tenants
+from aggregates import PERIODS
+from data_manager import format_time
+
+# Worker threads that run DataManager calls; each keeps its own SQLite
+# connection, so this is also the size of the connection pool
+WORKERS = max(1, int(os.environ.get('TRACKER_API_WORKERS', 8)))
+
+# Rendered responses kept per educator and query, valid while their ETag is
+CACHE_SIZE = int(os.environ.get('TRACKER_API_CACHE', 256))
+
+# Classes per page of /classes, and per chunk of an NDJSON stream
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1_000
+STREAM_CHUNK = 5_000
+
+NDJSON = 'application/x-ndjson'
+
+_pool = None
+_responses = OrderedDict()
+_responses_lock = threading.Lock()
+
+
+class BadRequest(ValueError):
+    """A query parameter that can't be used; answered with a 400."""
+
+
+class Forbidden(PermissionError):
+    """An educator picked without their token; answered with a 403."""
+
+
+async def _run(function, *args):
+    """Run a blocking DataManager call on the worker pool."""
+    return await asyncio.get_running_loop().run_in_executor(_pool, function, *args)
+
+
+def _manager(request):
+    tenant = request.query_params.get('tenant') or request.headers.get('x-tenant')
+    if tenant:
+        authorization = request.headers.get('authorization', '')
+        token = authorization[7:] if authorization.lower().startswith('bearer ') else request.query_params.get('token')
+        try:
+            tenant = tenants.authorize(tenant, token)
+        except ValueError as e:
+            raise BadRequest(str(e)) from None
+        except PermissionError as e:
+            raise Forbidden(str(e)) from None
+    return tenants.get_data_manager(tenant or os.environ.get('TRACKER_TENANT') or None)
+
+
+def _file_signature(file_path):
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _etag(manager, request):
+    """Tag a request with the version of everything its answer depends on.
+
+    Classes saved by other processes are pulled into the shared caches
+    first. The date is part of the version since weekly stats and upcoming
+    recurring classes move with it.
+    """
+    manager.get_changes()
+    version = (
+        manager.storage.signature(),
+        manager.storage.schools_signature(),
+        _file_signature(manager.series_file),
+        _file_signature(manager.rates_file),
+        date.today().isoformat(),
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+    )
+    return '"' + hashlib.sha1(repr(version).encode()).hexdigest() + '"'
+
+
+def _resolve(request):
+    """Return the request's DataManager and ETag; loading a manager can block, so this runs on the pool."""
+    manager = _manager(request)
+    return manager, _etag(manager, request)
+
+
+def _not_modified(request, etag):
+    tags = request.headers.get('if-none-match')
+    return tags is not None and (tags.strip() == '*' or etag in [tag.strip() for tag in tags.split(',')])
+
+
+def _date(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value).date()
+    except ValueError:
+        raise BadRequest(f"{name} must be a date like 2024-01-31") from None
+
+
+def _int(request, name, default=None, low=None, high=None):
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be a whole number") from None
+    if (low is not None and number < low) or (high is not None and number > high):
+        raise BadRequest(f"{name} must be between {low} and {high}")
+    return number
+
+
+def _cursor(value):
+    """Parse a page cursor written by _format_cursor."""
+    if not value:
+        return None
+    day, _, ordinal = value.rpartition(':')
+    try:
+        return (pd.Timestamp(day).strftime('%Y-%m-%d'), int(ordinal))
+    except ValueError:
+        raise BadRequest("before must be a cursor returned as `next`") from None
+
+
+def _format_cursor(cursor):
+    return None if cursor is None else f"{cursor[0]}:{cursor[1]}"
+
+
+def _class_filters(request):
+    return (
+        _date(request, 'start'),
+        _date(request, 'end'),
+        request.query_params.getlist('class_type') or None,
+        _int(request, 'school_id'),
+    )
+
+
+def _to_json(df, lines=False):
+    """Serialize a frame as JSON records, or one record per line, with dates and times as text."""
+    df = df.copy()
+    for column in df:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime('%Y-%m-%d')
+        elif isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+    if 'time' in df and pd.api.types.is_integer_dtype(df['time']):
+        df['time'] = format_time(df['time'])
+    if df.empty:
+        return '' if lines else '[]'
+    return df.to_json(orient='records', lines=lines, double_precision=2)
+
+
+async def _cached(request, render):
+    """Answer a GET from the response cache or by rendering it on the pool.
+
+    `render(manager)` returns the JSON text of the response body.
+    """
+    manager, etag = await _run(_resolve, request)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    key = (manager.storage.cache_key(), request.url.path, str(request.query_params))
+    with _responses_lock:
+        cached = _responses.get(key)
+        if cached is not None and cached[0] == etag:
+            _responses.move_to_end(key)
+            return Response(cached[1], media_type='application/json', headers=headers)
+
+    body = (await _run(render, manager)).encode()
+    with _responses_lock:
+        _responses[key] = (etag, body)
+        _responses.move_to_end(key)
+        while len(_responses) > CACHE_SIZE:
+            _responses.popitem(last=False)
+    return Response(body, media_type='application/json', headers=headers)
+
+
+async def health(request):
+    return JSONResponse({'status': 'ok'})
+
+
+async def classes(request):
+    """Classes newest first, a page at a time, or all of them as NDJSON.
+
+    Filters: start, end, class_type (repeatable) and school_id. Pages are
+    `limit` classes long; pass the `next` cursor of one page as `before`
+    to get the next. With `Accept: application/x-ndjson` or
+    `?format=ndjson` every match is streamed, one class per line.
+    """
+    filters = _class_filters(request)
+    if request.query_params.get('format') == 'ndjson' or NDJSON in request.headers.get('accept', ''):
+        return await _stream_classes(request, filters)
+
+    limit = _int(request, 'limit', DEFAULT_LIMIT, 1, MAX_LIMIT)
+    before = _cursor(request.query_params.get('before'))
+
+    def render(manager):
+        columns = manager.classes_columns + ['class_id']
+        page, cursor = manager.query_page(*filters, columns=columns, before=before, limit=limit)
+        return f'{{"classes":{_to_json(page)},"next":{json.dumps(_format_cursor(cursor))}}}'
+
+    return await _cached(request, render)
+
+
+async def _stream_classes(request, filters):
+    manager, etag = await _run(_resolve, request)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    columns = manager.classes_columns + ['class_id']
+
+    async def lines():
+        # Page through with cursors so only one chunk is held at a time
+        cursor = None
+        while True:
+            page, cursor = await _run(
+                lambda before: manager.query_page(*filters, columns=columns, before=before, limit=STREAM_CHUNK), cursor
+            )
+            if not page.empty:
+                yield _to_json(page, lines=True).rstrip('\n') + '\n'
+            if cursor is None:
+                return
+
+    return StreamingResponse(lines(), media_type=NDJSON, headers=headers)
+
+
+async def schools(request):
+    def render(manager):
+        return _to_json(manager.get_schools().to_frame())
+
+    return await _cached(request, render)
+
+
+async def weekly_stats(request):
+    def render(manager):
+        total_classes, total_earnings = manager.get_weekly_stats()
+        return json.dumps({'classes': int(total_classes), 'earnings': round(float(total_earnings), 2)})
+
+    return await _cached(request, render)
+
+
+async def earnings(request):
+    """Earnings totals for start..end per `period` (day, week, month, quarter or none) and `by` columns.
+
+    `by` is a comma-separated list of school_id and class_type. With
+    `scheduled=1` upcoming classes of recurring series count too, which
+    needs an end date.
+    """
+    start, end = _date(request, 'start'), _date(request, 'end')
+    period = request.query_params.get('period', 'month')
+    if period not in PERIODS + ['none']:
+        raise BadRequest(f"period must be one of {', '.join(PERIODS + ['none'])}")
+    by = [column for column in request.query_params.get('by', 'school_id').split(',') if column]
+    if set(by) - {'school_id', 'class_type'}:
+        raise BadRequest("by can only list school_id and class_type")
+    scheduled = request.query_params.get('scheduled', '') in ('1', 'true')
+    if scheduled and end is None:
+        raise BadRequest("scheduled totals need an end date")
+
+    def render(manager):
+        totals = manager.get_period_totals(start, end, None if period == 'none' else period, by, scheduled=scheduled)
+        return _to_json(totals)
+
+    return await _cached(request, render)
+
+
+async def occurrences(request):
+    """Upcoming classes of recurring series from start (or their last recorded class) to end."""
+    start, end = _date(request, 'start'), _date(request, 'end')
+    if end is None:
+        raise BadRequest("end is required")
+
+    def render(manager):
+        return _to_json(manager.get_occurrences(start, end))
+
+    return await _cached(request, render)
+
+
+async def bad_request(request, exc):
+    return JSONResponse({'error': str(exc)}, status_code=400)
+
+
+async def forbidden(request, exc):
+    return JSONResponse({'error': str(exc)}, status_code=403)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global _pool
+    _pool = ThreadPoolExecutor(WORKERS, thread_name_prefix='api')
+    try:
+        yield
+    finally:
+        _pool.shutdown(wait=True)
+        tenants.clear()
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health),
+        Route('/classes', classes),
+        Route('/schools', schools),
+        Route('/stats/weekly', weekly_stats),
+        Route('/earnings', earnings),
+        Route('/occurrences', occurrences),
+    ],
+    exception_handlers={BadRequest: bad_request, Forbidden: forbidden},
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the tracker data as a read-only JSON API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
@@ -0,0 +1,145 @@
+"""Load test the JSON API against a synthetic history on localhost.
+
+Run from the repository root:
+
+    python benchmarks/bench_api.py [backend] [--rows 100k] [--clients 16] [--seconds 10]
+
+The API server runs in its own process. Keep-alive clients, written with
+asyncio so no load tool has to be installed, cycle through a mix of class
+pages, earnings drilldowns, weekly stats and schools:
+
+- cold: every query is new, so each one is rendered on the worker pool
+- cached: the same mix again, now answered from the response cache
+- revalidate: the same mix with If-None-Match, answered with 304s
+
+It prints requests per second and latency percentiles for each, then the
+time to stream a year of classes as NDJSON.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.synthetic import parse_size, write_dataset
+
+
+def queries():
+    """The request mix: class pages, weekly and monthly earnings drilldowns, stats and schools."""
+    paths = ['/schools?', '/stats/weekly?']
+    for month in range(1, 13):
+        paths.append(f'/classes?start=2023-{month:02d}-01&end=2023-{month:02d}-28&limit=50&class_type=Standard')
+        paths.append(f'/earnings?start=2022-{month:02d}-10&end=2023-{month:02d}-15&period=week&by=school_id')
+        paths.append(f'/earnings?start=2021-01-01&end=2023-{month:02d}-20&period=month&by=class_type')
+    return paths
+
+
+async def request(reader, writer, path, etag=None):
+    """Send one GET over a keep-alive connection; returns (status, headers)."""
+    extra = f'If-None-Match: {etag}\r\n' if etag else ''
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n{extra}\r\n'.encode())
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = dict(line.split(': ', 1) for line in lines[1:] if ': ' in line)
+    headers = {name.lower(): value for name, value in headers.items()}
+    length = int(headers.get('content-length', 0))
+    if length and status not in (204, 304):
+        await reader.readexactly(length)
+    return status, headers
+
+
+async def client(port, paths, deadline, latencies, etags, offset, unique):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    i = offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        if unique:
+            # An unused parameter makes the URL, and so the cache entry, new
+            path += f'&n={offset}-{i}'
+        start = time.perf_counter()
+        status, headers = await request(reader, writer, path, etags.get(path) if etags is not None else None)
+        latencies.append(time.perf_counter() - start)
+        assert status in (200, 304), (status, path)
+        i += 1
+    writer.close()
+
+
+async def load(port, paths, clients, seconds, etags=None, unique=False):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, paths, deadline, latencies, etags, i * 7, unique) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+
+
+async def collect_etags(port, paths):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    etags = {}
+    for path in paths:
+        etags[path] = (await request(reader, writer, path))[1]['etag']
+    writer.close()
+    return etags
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('backend', nargs='?', default='csv')
+    parser.add_argument('--rows', default='100k')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_dataset(tmp, parse_size(args.rows), start='2021-01-01', years=3)
+        env = {**os.environ, 'TRACKER_BACKEND': args.backend, 'PYTHONPATH': ROOT}
+        if args.backend != 'csv':
+            subprocess.run([sys.executable, '-c', 'from data_manager import DataManager; DataManager().storage.import_csv()'],
+                           cwd=tmp, env=env, check=True, capture_output=True)
+        port = free_port()
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'api.py'), '--port', str(port)],
+                                  cwd=tmp, env=env, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(300):
+                try:
+                    urllib.request.urlopen(f'http://127.0.0.1:{port}/health')
+                    break
+                except OSError:
+                    time.sleep(0.1)
+
+            print(f"{args.backend}, {args.rows} classes, {args.clients} clients, {args.seconds:g}s each")
+            paths = queries()
+            # Load the classes, rollups and schools every later query shares
+            etags = asyncio.run(collect_etags(port, paths))
+            for name, options in [('cold', {'unique': True}), ('cached', {}), ('revalidate', {'etags': etags})]:
+                rps, (p50, p95, p99) = asyncio.run(load(port, paths, args.clients, args.seconds, **options))
+                print(f"  {name:<10} {rps:8.0f} req/s   p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  p99 {p99:7.2f} ms")
+
+            start = time.perf_counter()
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/classes?start=2022-01-01&end=2022-12-31&format=ndjson') as response:
+                lines = sum(1 for _ in response)
+            seconds = time.perf_counter() - start
+            print(f"  ndjson     {lines:,} classes in {seconds * 1000:.0f} ms ({lines / seconds:,.0f} classes/s)")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Compare the per-class and vectorized Calendar View figure builders.
+
+Run from the repository root:
+
+    python benchmarks/bench_calendar.py
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from charts import build_week_figure
+
+START_OF_WEEK = datetime(2024, 3, 4)
+
+
+def make_week(classes, seed=0):
+    """Return typed classes spread over the week starting on START_OF_WEEK."""
+    rng = np.random.default_rng(seed)
+    class_type = np.where(rng.random(classes) < 0.2, 'Demo', 'Standard')
+    return pd.DataFrame({
+        'date': pd.Timestamp(START_OF_WEEK) + pd.to_timedelta(rng.integers(0, 7, classes), unit='D'),
+        'time': (rng.integers(12, 40, classes) * 30).astype('int16'),
+        'duration': rng.choice([1.0, 1.5, 2.0], classes).astype('float32'),
+        'class_type': pd.Categorical(class_type),
+    })
+
+
+def legacy_week_figure(classes_df, start_of_week):
+    """The previous builder: a trace per day background and per class."""
+    classes_df = classes_df.assign(
+        time=pd.to_datetime(classes_df['time'].astype(int), unit='m').dt.time
+    )
+    dates = [start_of_week + timedelta(days=i) for i in range(7)]
+    time_slots = pd.date_range('06:00', '22:00', freq='30min').time
+    fig = go.Figure()
+    for i, date in enumerate(dates):
+        day_classes = classes_df[classes_df['date'].dt.date == date.date()]
+        fig.add_trace(go.Scatter(
+            x=[date.strftime('%Y-%m-%d')] * len(time_slots),
+            y=[slot.strftime('%H:%M') for slot in time_slots],
+            mode='lines',
+            line=dict(color='rgba(200,200,200,0.3)', width=30),
+            showlegend=False,
+            hoverinfo='skip'
+        ))
+        for _, class_row in day_classes.iterrows():
+            color = '#FFA500' if class_row['class_type'] == 'Demo' else '#2E8B57'
+            fig.add_trace(go.Scatter(
+                x=[date.strftime('%Y-%m-%d')],
+                y=[class_row['time'].strftime('%H:%M')],
+                mode='markers+text',
+                marker=dict(symbol='square', size=40, color=color, opacity=0.7),
+                text=f"{class_row['class_type']}<br>{class_row['time'].strftime('%H:%M')}",
+                textposition="middle center",
+                name=class_row['class_type'],
+                hovertemplate=(
+                    f"<b>{class_row['class_type']} Class</b><br>" +
+                    f"Time: {class_row['time'].strftime('%H:%M')}<br>" +
+                    f"Duration: {class_row['duration']} hours<br>" +
+                    f"<extra></extra>"
+                )
+            ))
+    return fig
+
+
+def measure(build, week):
+    start = time.perf_counter()
+    fig = build(week)
+    build_ms = (time.perf_counter() - start) * 1000
+    return build_ms, len(fig.to_json()) / 1024, len(fig.data)
+
+
+def main():
+    builders = {
+        'per-class': lambda week: legacy_week_figure(week, START_OF_WEEK),
+        'vectorized': lambda week: build_week_figure(week, START_OF_WEEK),
+        'duration blocks': lambda week: build_week_figure(week, START_OF_WEEK, duration_blocks=True),
+    }
+    print(f"{'classes':>8} {'builder':>16} {'build ms':>10} {'payload KB':>11} {'traces':>7}")
+    for classes in (10, 100, 1000):
+        week = make_week(classes)
+        for name, build in builders.items():
+            build_ms, payload_kb, traces = measure(build, week)
+            print(f"{classes:>8} {name:>16} {build_ms:>10.1f} {payload_kb:>11.1f} {traces:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Show that catching up with classes saved by another process costs per new class, not per stored class.
+
+Run from the repository root:
+
+    python benchmarks/bench_changes.py [backend]
+
+For two table sizes another process appends batches of classes; this one
+pulls them in with DataManager.get_changes, which patches the cached frame,
+rollups and slot index, and the time is compared with a full reload. The
+rollups are checked against a recompute at the end.
+
+The pull reads and parses only the new rows. On the CSV backend patching
+the shared classes frame still copies it once, which is the part that
+grows with the table there.
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import aggregates
+import schedule
+import storage
+from data_manager import DataManager
+from benchmarks.synthetic import make_classes, write_dataset
+
+SIZES = [100_000, 1_000_000]
+BATCHES = [1, 100, 1_000]
+
+
+def append_elsewhere(backend, rows):
+    """Save classes from a separate process, which this one only sees on disk."""
+    other = storage.get_storage(backend)
+    other.fsync_writes = False
+    other.append_classes(rows)
+
+
+def main():
+    backend = sys.argv[1] if len(sys.argv) > 1 else 'csv'
+    context = multiprocessing.get_context('fork')
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        for size in SIZES:
+            for name in os.listdir('.'):
+                os.rename(name, f"old-{size}-{name}")
+            write_dataset('.', size, start='2020-01-01', years=5)
+            dm = DataManager(backend=backend)
+            if backend != 'csv':
+                dm.storage.import_csv()
+            dm.load_classes()
+            dm.get_rollups()
+            dm.find_free_slots('2022-01-03')
+            version, _ = dm.get_changes()
+
+            start = time.perf_counter()
+            for _ in range(100):
+                dm.get_changes(version)
+            print(f"{size} classes ({backend}): poll with nothing new {(time.perf_counter() - start) * 10:.3f} ms")
+
+            for batch in BATCHES:
+                rows = make_classes(batch, seed=batch, start='2024-06-01', years=1).to_dict('records')
+                process = context.Process(target=append_elsewhere, args=(backend, rows))
+                process.start()
+                process.join()
+
+                start = time.perf_counter()
+                version, new = dm.get_changes(version)
+                pulled = time.perf_counter() - start
+                dm.get_rollups()
+                dm.find_free_slots('2024-06-03')
+                print(f"  {batch:>5} new classes: pull {pulled * 1000:8.2f} ms, "
+                      f"then rollups and free slots {(time.perf_counter() - start - pulled) * 1000:6.2f} ms ({len(new)} pulled)")
+
+            start = time.perf_counter()
+            dm.storage.release()
+            aggregates.forget(dm.storage)
+            schedule.forget(dm.storage)
+            dm.load_classes()
+            dm.get_rollups()
+            dm.find_free_slots('2024-06-03')
+            print(f"  full reload:       {(time.perf_counter() - start) * 1000:8.2f} ms")
+            print(f"  consistency check: {len(dm.check_rollups())} mismatched rollup rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Time schedule conflict checks and free-slot lookups against a large history.
+
+Run from the repository root:
+
+    python benchmarks/bench_conflicts.py [rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import schedule
+from storage import _coerce_classes
+from benchmarks.synthetic import make_classes
+
+
+def per_call(fn, calls):
+    start = time.perf_counter()
+    for args in calls:
+        fn(*args)
+    return (time.perf_counter() - start) / len(calls) * 1e6
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(0)
+    days = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, 1000), unit='D')
+    calls = [(day, int(minute), 1.0) for day, minute in zip(days, rng.integers(6 * 60, 21 * 60, 1000))]
+
+    # The index should cost the same at any history size; the scan grows with it
+    for size in (rows // 100, rows):
+        classes_df = _coerce_classes(make_classes(size, start='2015-01-01', years=10))
+        start = time.perf_counter()
+        index = schedule.SlotIndex(classes_df)
+        print(f"{size} classes, index build {time.perf_counter() - start:.2f}s")
+
+        starts = classes_df['date'].to_numpy(dtype='datetime64[m]').astype('int64') + classes_df['time'].to_numpy(dtype='int64')
+        ends = starts + np.round(classes_df['duration'].to_numpy(dtype='float64') * 60).astype('int64')
+
+        def scan(day, minute, duration):
+            start = int(np.datetime64(day, 'm').astype('int64')) + minute
+            return classes_df[(starts < start + duration * 60) & (ends > start)]
+
+        print(f"  conflict check: scan {per_call(scan, calls[:50]):10.1f} us  index {per_call(index.conflicts, calls):8.1f} us")
+        print(f"  free slots:     {per_call(index.free_slots, [(day, 1.0) for day, _, _ in calls]):8.1f} us per day")
+
+    saved = [{'date': '2020-06-01', 'time': '07:00', 'duration': 1.0, 'class_type': 'Demo', 'school_id': 1}] * 100
+    print(f"  add 100 classes: {per_call(lambda: index.add(saved), [()] * 10) / 1000:.2f} ms")
+    print(f"  conflict check with {len(index._pending)} classes pending: {per_call(index.conflicts, calls):8.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Time correcting and deleting classes against the size of the history.
+
+Run from the repository root:
+
+    python benchmarks/bench_edits.py [backend] [sizes...]
+
+Every size gets a fresh synthetic store with warm caches: the parsed
+classes, the rollups and the slot index. An edit logs one update or
+tombstone (SQLite changes the row in place) and patches those caches.
+The baseline is what a correction cost before: rewriting the whole
+classes file. Compaction folds the log back into the files, once per
+`compact_bytes` of edits, and the first read after it parses everything
+again.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import parse_size, write_dataset
+from data_manager import DataManager
+
+EDITS = 50
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def run(backend, size):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        write_dataset('.', size, start='2020-01-01', years=5)
+        rewrite_ms, _ = timed(lambda: pd.read_csv('classes.csv', dtype=str, keep_default_na=False).to_csv('rewrite.csv', index=False))
+        dm = DataManager(backend=backend)
+        if backend != 'csv':
+            dm.storage.import_csv()
+        # Compaction is timed on its own below
+        dm.storage.compact_bytes = float('inf')
+        class_ids = dm.load_classes()['class_id'].to_numpy()
+        dm.get_rollups()
+        dm.find_conflicts('2022-01-03', '10:00', 1.0)
+
+        rng = np.random.default_rng(0)
+        latencies = []
+        for i, class_id in enumerate(rng.choice(class_ids, EDITS, replace=False)):
+            if i % 5 == 4:
+                ms, saved = timed(dm.delete_class, int(class_id))
+            else:
+                ms, saved = timed(dm.update_class, int(class_id), {'duration': 1.5, 'notes': f"corrected {i}"})
+            assert saved
+            latencies.append(ms)
+        # The patched rollups must match a recompute
+        assert dm.check_rollups().empty
+
+        compact_ms, _ = timed(getattr(dm.storage, 'compact', lambda: None))
+        reload_ms, classes = timed(dm.load_classes)
+        assert len(classes) == size - EDITS // 5
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{backend} {size:>10,} classes: edit p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  |  "
+              f"full rewrite {rewrite_ms:8.1f} ms  |  compact {compact_ms:8.1f} ms, first read after {reload_ms:8.1f} ms")
+
+
+def main():
+    backend = sys.argv[1] if len(sys.argv) > 1 else 'csv'
+    sizes = [parse_size(size) for size in sys.argv[2:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        run(backend, size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Time invoice and statement exports rendered serially and on a process pool.
+
+Run from the repository root:
+
+    python benchmarks/bench_exports.py [rows] [schools] [workers]
+
+The pool only pays off with more than one core. `workers` defaults to the
+app's TRACKER_EXPORT_WORKERS setting, which renders serially on a single
+core, so there only the serial run is timed.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import invoices
+from data_manager import DataManager
+from benchmarks.synthetic import write_dataset
+
+
+def export(dm, school_ids, months, workers):
+    job = invoices.start_export(dm.storage, school_ids, months, kinds=list(invoices.KINDS),
+                                formats=invoices.FORMATS, workers=workers)
+    job.finished.wait()
+    if job.error:
+        raise RuntimeError(job.error)
+    return job
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    school_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else invoices.WORKERS
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        write_dataset('.', rows, start='2024-01-01', years=1, schools=school_count)
+        dm = DataManager(backend='csv')
+        school_ids = [school['school_id'] for school in dm.get_schools().to_frame().to_dict('records')]
+        months = invoices.months_between('2024-01-01', '2024-12-31')
+
+        timings = {}
+        runs = [('serial', 0)] + ([(f'{workers} workers', workers)] if workers else [])
+        for label, pool in runs:
+            invoices._artifacts.clear()
+            start = time.perf_counter()
+            job = export(dm, school_ids, months, pool)
+            timings[label] = time.perf_counter() - start
+            print(f"  {label:>10}: {len(job.files)} files in {timings[label]:.2f}s")
+
+        start = time.perf_counter()
+        job = export(dm, school_ids, months, 0)
+        print(f"  {'cached':>10}: {job.cached} files reused in {time.perf_counter() - start:.2f}s")
+
+        if workers:
+            serial, pooled = timings.values()
+            print(f"{rows} rows, {school_count} schools, {os.cpu_count()} cores: speedup {serial / pooled:.2f}x")
+        else:
+            print(f"{rows} rows, {school_count} schools, {os.cpu_count()} core: rendering serially, no pool to compare")
+
+
+if __name__ == '__main__':
+    main()
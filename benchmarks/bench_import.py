@@ -0,0 +1,80 @@
+"""Benchmark bulk class imports from CSV and iCalendar files.
+
+Run from the repository root:
+
+    python benchmarks/bench_import.py
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import make_classes
+from data_manager import DataManager
+import importer
+
+ROWS = [10_000, 100_000]
+SCHOOLS = 50
+
+
+def write_csv(path, classes):
+    classes = classes.assign(school=classes['school_id'].map(lambda i: f"School {i}"))
+    classes.drop(columns=['school_id', 'price']).to_csv(path, index=False)
+
+
+def write_ics(path, classes):
+    with open(path, 'w') as f:
+        f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n")
+        for row in classes.itertuples():
+            start = f"{row.date.replace('-', '')}T{row.time.replace(':', '')}00"
+            f.write(
+                "BEGIN:VEVENT\r\n"
+                f"DTSTART:{start}\r\n"
+                f"DURATION:PT{int(row.duration * 60)}M\r\n"
+                f"SUMMARY:{row.class_type} class\r\n"
+                f"LOCATION:School {row.school_id}\r\n"
+                "END:VEVENT\r\n"
+            )
+        f.write("END:VCALENDAR\r\n")
+
+
+def run_import(path, file_format):
+    """Import `path` into empty CSV storage with the synthetic schools registered."""
+    for name in ('classes.csv', 'schools.csv'):
+        if os.path.exists(name):
+            os.remove(name)
+    dm = DataManager(backend='csv')
+    dm.storage.fsync_writes = False
+    for i in range(1, SCHOOLS + 1):
+        dm.save_school({'school_id': i, 'name': f"School {i}", 'address': '', 'contact': ''})
+    return importer.import_classes(dm, path, file_format)
+
+
+def main():
+    print(f"{'format':>6} {'rows':>8} {'seconds':>8} {'rows/sec':>10} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        for rows in ROWS:
+            classes = make_classes(rows, schools=SCHOOLS)
+            for file_format, writer in (('csv', write_csv), ('ics', write_ics)):
+                path = os.path.join(tmp, f"import.{file_format}")
+                writer(path, classes)
+
+                start = time.perf_counter()
+                result = run_import(path, file_format)
+                elapsed = time.perf_counter() - start
+                assert result['imported'] == rows, result
+
+                # tracemalloc slows the import down, so peak memory is a separate run
+                tracemalloc.start()
+                run_import(path, file_format)
+                peak = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+
+                print(f"{file_format:>6} {rows:>8} {elapsed:>8.2f} {rows / elapsed:>10.0f} {peak:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Measure the overhead instrumentation adds to DataManager calls.
+
+Run from the repository root:
+
+    python benchmarks/bench_instrumentation.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import make_classes
+from data_manager import DataManager
+import instrumentation
+
+CALLS = 200_000
+ROWS = 100_000
+
+
+@instrumentation.timed('bench.noop')
+def instrumented_noop():
+    return None
+
+
+def noop():
+    return None
+
+
+def per_call(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    bare = per_call(noop, CALLS)
+    instrumentation.disable()
+    disabled = per_call(instrumented_noop, CALLS)
+    instrumentation.enable()
+    enabled = per_call(instrumented_noop, CALLS)
+    instrumentation.clear()
+    print(f"{'empty function':<28} {'ns/call':>10}")
+    print(f"{'  plain':<28} {bare:>10.0f}")
+    print(f"{'  timed, disabled':<28} {disabled:>10.0f}")
+    print(f"{'  timed, enabled':<28} {enabled:>10.0f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        make_classes(ROWS).to_csv('classes.csv', index=False)
+        dm = DataManager(backend='csv')
+        dm.get_rollups()
+        print(f"{'get_rollups (one week)':<28} {'us/call':>10}")
+        for label, switch in (('  disabled', instrumentation.disable), ('  enabled', instrumentation.enable)):
+            switch()
+            calls = 2_000
+            start = time.perf_counter()
+            for _ in range(calls):
+                dm.get_rollups('2020-01-06', '2020-01-12')
+            print(f"{label:<28} {(time.perf_counter() - start) / calls * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Compare class load times for the CSV and Parquet backends.
+
+Run from the repository root:
+
+    python benchmarks/bench_parquet.py [rows ...]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+from storage import CsvStorage, ParquetStorage
+from benchmarks.synthetic import make_classes
+
+REPORT_COLUMNS = ['date', 'class_type', 'duration', 'price']
+
+
+def best_of(fn, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(result)
+
+
+def run(rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        make_classes(rows).to_csv('classes.csv', index=False)
+        csv_storage = CsvStorage()
+
+        start = time.perf_counter()
+        parquet = ParquetStorage('parquet')
+        parquet.import_csv()
+        print(f"{rows} rows: migrated to Parquet in {time.perf_counter() - start:.1f}s")
+
+        def csv_cold_load():
+            storage._frame_cache.clear()
+            return csv_storage.load_classes()
+
+        month = (date(2020, 3, 1), date(2020, 3, 31))
+        week = (date(2020, 3, 2), date(2020, 3, 8))
+        cases = [
+            ('full load, CSV (uncached)', csv_cold_load),
+            ('full load, Parquet', parquet.load_classes),
+            ('report month, 4 columns', lambda: parquet.query_classes(*month, columns=REPORT_COLUMNS)),
+            ('calendar week', lambda: parquet.query_classes(*week)),
+        ]
+        for label, fn in cases:
+            ms, result_rows = best_of(fn)
+            print(f"  {label:<28} {ms:9.1f} ms  {result_rows:>8} rows")
+
+        parquet.fsync_writes = False
+        added = make_classes(5_000, seed=1, start='2020-03-01', years=0.1).to_dict('records')
+        for i in range(0, len(added), 100):
+            parquet.append_classes(added[i:i + 100])
+        parquet.compact()
+        total = len(parquet.load_classes())
+        print(f"  after 5000 appends and compaction: {total} rows ({'ok' if total == rows + 5_000 else 'MISMATCH'})")
+
+
+def main():
+    for rows in [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]:
+        run(rows)
+
+
+if __name__ == '__main__':
+    main()
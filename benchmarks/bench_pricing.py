@@ -0,0 +1,83 @@
+"""Benchmark pricing whole class histories with rate tables.
+
+Run from the repository root:
+
+    python benchmarks/bench_pricing.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import make_classes
+from data_manager import DataManager
+from pricing import RateTable
+from storage import _coerce_classes
+
+ROWS = 1_000_000
+SCALAR_ROWS = 100_000
+REPRICE_ROWS = 200_000
+
+
+def rate_table():
+    """The default rates plus school and term specific rules."""
+    rules = [RateTable().to_frame()]
+    for school in range(1, 11):
+        rules.append(pd.DataFrame([{
+            'class_type': 'Standard', 'school_id': str(school), 'start': None, 'end': None,
+            'rate': 700.0 + school * 10, 'per_hour': True,
+        }]))
+    for year in range(2015, 2025):
+        rules.append(pd.DataFrame([{
+            'class_type': 'Demo', 'school_id': None, 'start': f"{year}-01-01", 'end': f"{year}-12-31",
+            'rate': 350.0 + (year - 2015) * 10, 'per_hour': False,
+        }]))
+    return RateTable(pd.concat(rules, ignore_index=True))
+
+
+def legacy_price(duration, class_type):
+    """The previous scalar calculate_class_price, kept for comparison."""
+    if class_type == 'Demo':
+        return 400
+    else:
+        return 750 * float(duration)
+
+
+def main():
+    classes = _coerce_classes(make_classes(ROWS))
+    rates = rate_table()
+
+    start = time.perf_counter()
+    prices = rates.price(classes)
+    vectorized = time.perf_counter() - start
+    assert not pd.isna(prices).any()
+
+    sample = classes.head(SCALAR_ROWS)
+    start = time.perf_counter()
+    for duration, class_type in zip(sample['duration'], sample['class_type']):
+        legacy_price(duration, class_type)
+    scalar = (time.perf_counter() - start) * ROWS / SCALAR_ROWS
+
+    print(f"{len(rates.rules)} rules, {ROWS} rows")
+    print(f"  rate table:    {vectorized * 1000:8.1f} ms")
+    print(f"  scalar loop:   {scalar * 1000:8.1f} ms (extrapolated from {SCALAR_ROWS} rows, default rates only)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        for backend in ('csv', 'sqlite', 'parquet'):
+            make_classes(REPRICE_ROWS).to_csv('classes.csv', index=False)
+            dm = DataManager(backend=backend)
+            dm.storage.fsync_writes = False
+            if backend != 'csv':
+                dm.storage.import_csv()
+            start = time.perf_counter()
+            changed = dm.reprice_classes(rates)
+            elapsed = time.perf_counter() - start
+            print(f"  reprice {backend:<8} {elapsed * 1000:8.1f} ms ({changed} of {REPRICE_ROWS} rows changed)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Micro-benchmarks for DataManager.query_classes against a full boolean mask.
+
+Run from the repository root:
+
+    python benchmarks/bench_query.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_manager import DataManager
+from benchmarks.synthetic import make_classes
+
+SIZES = [10_000, 100_000, 1_000_000]
+WEEK = (date(2020, 3, 2), date(2020, 3, 8))
+
+
+def best_of(fn, repeats=7):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    print(f"{'rows':>9} {'mask ms':>9} {'query ms':>9} {'typed query ms':>15} {'insert ms':>10}")
+    for rows in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            # A constant number of classes per week, so k stays fixed while N grows
+            make_classes(rows, years=rows // 10_000).to_csv('classes.csv', index=False)
+            dm = DataManager(backend='csv')
+            dm.storage.fsync_writes = False
+            classes_df = dm.load_classes()
+
+            # The per-page filter this API replaces
+            mask = best_of(lambda: classes_df.loc[
+                (classes_df['date'].dt.date >= WEEK[0]) &
+                (classes_df['date'].dt.date <= WEEK[1]) &
+                (classes_df['class_type'].isin(['Standard', 'Demo']))
+            ], repeats=3)
+            query = best_of(lambda: dm.query_classes(*WEEK))
+            typed = best_of(lambda: dm.query_classes(*WEEK, class_types=['Demo'], school_id=7))
+            # Back-dated rows have to be inserted into the middle of the sorted index
+            backdated = make_classes(10, seed=1, start='2016-01-01', years=1).to_dict('records')
+            insert = best_of(lambda: dm.save_classes(backdated), repeats=3)
+            print(f"{rows:>9} {mask:>9.2f} {query:>9.2f} {typed:>15.2f} {insert:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Time loading recurring class series and expanding their occurrences.
+
+Run from the repository root:
+
+    python benchmarks/bench_recurring.py [series...]
+
+Every series holds two classes a week and started five years ago, so the
+same schedule stored as classes would be about 520 rows per series. The
+series file and its load time should follow the number of series, and an
+expansion the number of classes in the window asked for.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import recurring
+from pricing import RateTable
+
+WEEKDAY_PAIRS = ['MO,WE', 'TU,TH', 'WE,FR', 'MO,TH', 'TU,FR', 'SA,SU']
+
+
+def make_series(count, rng):
+    return [{
+        'series_id': i + 1,
+        'start': str(np.datetime64('2021-01-04') + int(rng.integers(0, 28))),
+        'weekdays': WEEKDAY_PAIRS[i % len(WEEKDAY_PAIRS)],
+        'interval': 1,
+        'time': f"{int(rng.integers(7, 20)):02d}:{int(rng.choice([0, 30])):02d}",
+        'duration': float(rng.choice([1.0, 1.5, 2.0])),
+        'class_type': 'Demo' if i % 10 == 0 else 'Standard',
+        'school_id': int(rng.integers(1, 50)),
+        # A few skipped dates each, like school holidays
+        'exceptions': ';'.join(str(np.datetime64('2025-12-22') + int(day)) for day in range(0, 14, 7)),
+    } for i in range(count)]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    counts = [int(count) for count in sys.argv[1:]] or [10, 100, 1_000, 10_000]
+    rates = RateTable()
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in counts:
+            path = os.path.join(tmp, f"series_{count}.csv")
+            recurring._write(path, recurring.SeriesTable(make_series(count, rng)))
+            load_ms, series = timed(recurring._read, path)
+            week_ms, week = timed(series.occurrences, '2026-03-02', '2026-03-08', rates)
+            year_ms, year = timed(series.occurrences, '2026-01-01', '2026-12-31', rates)
+            history = series.occurrences(None, '2025-12-31')
+            print(f"{count:>7,} series: file {os.path.getsize(path) / 1024:8.1f} KB, load {load_ms:7.1f} ms  |  "
+                  f"week {len(week):>7,} classes {week_ms:6.2f} ms  |  year {len(year):>9,} classes {year_ms:7.1f} ms  |  "
+                  f"{len(history):>10,} classes to date")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Compare dashboard totals from the rollups with a scan of the classes table.
+
+Run from the repository root:
+
+    python benchmarks/bench_rollups.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_manager import DataManager
+from benchmarks.synthetic import make_classes
+
+
+def best_of(fn, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        make_classes(rows).to_csv('classes.csv', index=False)
+        dm = DataManager(backend='csv')
+        dm.storage.fsync_writes = False
+        classes_df = dm.load_classes()
+
+        start = time.perf_counter()
+        dm.get_rollups()
+        print(f"{rows} rows, rollup build {time.perf_counter() - start:.2f}s")
+
+        week = (date(2020, 3, 2), date(2020, 3, 8))
+        year = (date(2020, 1, 1), date(2020, 12, 31))
+        for label, (first, last) in (('week', week), ('year', year)):
+            scan = best_of(lambda: classes_df[
+                (classes_df['date'] >= str(first)) & (classes_df['date'] <= str(last))
+            ].groupby('class_type', observed=True)['price'].sum())
+            lookup = best_of(lambda: dm.get_rollups(first, last).groupby('class_type')['earnings'].sum())
+            print(f"  {label:>4} earnings by type: scan {scan:8.2f} ms  rollups {lookup:8.2f} ms")
+
+        saved = make_classes(100, seed=1).to_dict('records')
+        save = best_of(lambda: dm.save_classes(saved), 3)
+        print(f"  save 100 classes + incremental rollup update: {save:.2f} ms")
+
+        mismatches = dm.check_rollups()
+        print(f"  consistency check: {len(mismatches)} mismatched rollup rows")
+
+
+if __name__ == '__main__':
+    main()
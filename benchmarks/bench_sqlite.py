@@ -0,0 +1,53 @@
+"""Benchmark filtered class queries on the CSV and SQLite backends.
+
+Run from the repository root:
+
+    python benchmarks/bench_sqlite.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import CsvStorage, SqliteStorage
+from benchmarks.synthetic import make_classes
+
+
+def best_of(fn, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(result)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        make_classes(rows).to_csv('classes.csv', index=False)
+        csv_storage = CsvStorage()
+        sqlite_storage = SqliteStorage()
+
+        start = time.perf_counter()
+        sqlite_storage.import_csv()
+        print(f"import {rows} rows into SQLite: {time.perf_counter() - start:.1f}s")
+
+        week = (date(2020, 3, 2), date(2020, 3, 8))
+        month = (date(2020, 3, 1), date(2020, 3, 31))
+        csv_storage.load_classes()  # warm the in-process cache
+        for label, (start_day, end_day), types in (
+            ('week', week, None),
+            ('month, Demo only', month, ['Demo']),
+        ):
+            csv_ms, csv_rows = best_of(lambda: csv_storage.query_classes(start_day, end_day, types))
+            sql_ms, sql_rows = best_of(lambda: sqlite_storage.query_classes(start_day, end_day, types))
+            assert csv_rows == sql_rows
+            print(f"{label:>18}: {sql_rows:>6} rows  cached CSV {csv_ms:8.2f} ms  SQLite {sql_ms:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
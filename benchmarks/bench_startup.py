@@ -0,0 +1,109 @@
+"""Time each page's imports, first run and rerun in fresh processes.
+
+Every page runs headless through Streamlit's AppTest against a synthetic
+class history. Each measurement starts a new Python process so module
+imports are cold, the way they are after a server restart.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--rows 200000] [--repeats 3] [page ...]
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+RERUNS = 5
+
+
+def page_imports(page):
+    """Return the page's top-level import statements as one code object."""
+    with open(page, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return compile(ast.Module(body=imports, type_ignores=[]), page, 'exec')
+
+
+def worker(page, data_dir):
+    """Measure one page in this (fresh) process and print the timings as JSON."""
+    os.chdir(data_dir)
+    start = time.perf_counter()
+    import streamlit  # noqa: F401
+    from streamlit.testing.v1 import AppTest
+    framework = time.perf_counter() - start
+
+    # The page's own imports on top of Streamlit
+    start = time.perf_counter()
+    exec(page_imports(page), {})
+    imports = time.perf_counter() - start
+
+    at = AppTest.from_file(page, default_timeout=120)
+    start = time.perf_counter()
+    at.run()
+    first_run = time.perf_counter() - start
+
+    # The first rerun still pays for some one-off work, so take the typical one
+    reruns = []
+    for _ in range(RERUNS):
+        start = time.perf_counter()
+        at.run()
+        reruns.append(time.perf_counter() - start)
+    rerun = statistics.median(reruns)
+
+    errors = [e.value for e in at.exception]
+    print(json.dumps({
+        'framework': framework, 'imports': imports, 'first_run': first_run, 'rerun': rerun, 'errors': errors,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('pages', nargs='*', help="page file names to time, all pages by default")
+    parser.add_argument('--worker', nargs=2, metavar=('PAGE', 'DATA_DIR'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(*args.worker)
+        return
+
+    from benchmarks.synthetic import make_classes
+
+    pages = [os.path.join(REPO, 'main.py')] + sorted(glob.glob(os.path.join(REPO, 'pages', '*.py')))
+    if args.pages:
+        pages = [page for page in pages if os.path.basename(page) in args.pages]
+    with tempfile.TemporaryDirectory() as data_dir:
+        make_classes(args.rows).to_csv(os.path.join(data_dir, 'classes.csv'), index=False)
+        with open(os.path.join(data_dir, 'schools.csv'), 'w') as f:
+            f.write('school_id,name,address,contact\n')
+            f.writelines(f"{i},School {i},,\n" for i in range(1, 51))
+
+        print(f"{args.rows} classes, median of {args.repeats} cold processes (ms)")
+        print(f"{'page':<28} {'streamlit':>10} {'imports':>8} {'first run':>10} {'rerun':>8}")
+        for page in pages:
+            runs = []
+            for _ in range(args.repeats):
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--worker', page, data_dir],
+                    capture_output=True, text=True, check=True
+                ).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            errors = runs[-1]['errors']
+            median = {key: statistics.median(run[key] for run in runs) * 1000 for key in ('framework', 'imports', 'first_run', 'rerun')}
+            print(
+                f"{os.path.basename(page):<28} {median['framework']:>10.0f} {median['imports']:>8.0f} "
+                f"{median['first_run']:>10.0f} {median['rerun']:>8.0f}" + (f"  errors: {errors}" if errors else '')
+            )
+
+
+if __name__ == '__main__':
+    main()
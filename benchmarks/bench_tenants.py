@@ -0,0 +1,65 @@
+"""Show that cached data follows the educators in use, not the sessions.
+
+Run from the repository root:
+
+    python benchmarks/bench_tenants.py [tenants] [rows per tenant] [max active]
+
+Sessions of a few busy educators are interleaved with visits from many
+others; with the LRU limit the process keeps only the recent educators'
+data loaded.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import aggregates
+import storage
+import tenants
+from benchmarks.synthetic import write_dataset
+
+
+def cached_megabytes():
+    with storage._frame_cache_lock:
+        frames = [frame for _, frame in storage._frame_cache.values()]
+    return sum(frame.memory_usage(deep=True).sum() for frame in frames) / 1024 ** 2
+
+
+def visit(tenant):
+    manager = tenants.get_data_manager(tenant)
+    manager.load_classes()
+    manager.get_rollups()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    max_active = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        names = [f"educator-{i}" for i in range(count)]
+        for i, name in enumerate(names):
+            write_dataset(tenants.tenant_root(name), rows, seed=i, start='2024-01-01', years=1, schools=10)
+
+        # Four busy educators make most requests, the rest drop in now and then
+        rng = np.random.default_rng(0)
+        busy = rng.random(1_000) < 0.8
+        sessions = np.where(busy, rng.integers(0, 4, 1_000), rng.integers(0, count, 1_000))
+
+        for limit in (count, max_active):
+            tenants.MAX_ACTIVE = limit
+            tenants.clear()
+            start = time.perf_counter()
+            for i in sessions:
+                visit(names[i])
+            seconds = time.perf_counter() - start
+            print(f"{count} educators x {rows} rows, {len(sessions)} sessions, at most {limit} loaded:")
+            print(f"  {len(tenants.active())} managers, {len(aggregates._rollup_cache)} rollups, "
+                  f"{cached_megabytes():.1f} MB of cached frames, {seconds / len(sessions) * 1000:.2f} ms per session")
+
+
+if __name__ == '__main__':
+    main()
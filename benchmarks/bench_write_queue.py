@@ -0,0 +1,75 @@
+"""Load test class submissions with and without the write-behind queue.
+
+Run from the repository root:
+
+    python benchmarks/bench_write_queue.py [backend] [sessions] [submits per session]
+
+Every session is a thread submitting single classes in a burst, as at the
+start of term. Direct saves append and fsync inside the submitting
+thread; write-behind hands the class to the queue and returns, and the
+writer commits whatever has piled up in one append. Latency is the time
+the form waits; throughput counts classes until the last one is durable.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import instrumentation
+import write_queue
+from data_manager import DataManager
+from benchmarks.stress_writes import make_row
+
+
+def run(dm, sessions, submits, write_behind):
+    dm.write_behind = write_behind
+    latencies = [[] for _ in range(sessions)]
+    tickets = []
+    start_line = threading.Barrier(sessions)
+
+    def session(n):
+        rng = np.random.default_rng(n)
+        start_line.wait()
+        for i in range(submits):
+            start = time.perf_counter()
+            tickets.append(dm.submit_classes([make_row(f"{write_behind:d}-{n}", i)]))
+            latencies[n].append(time.perf_counter() - start)
+            time.sleep(rng.uniform(0, 0.002))
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    saved = sum(ticket.wait() for ticket in tickets)
+    elapsed = time.perf_counter() - start
+    return np.concatenate(latencies) * 1000, saved, elapsed
+
+
+def main():
+    backend = sys.argv[1] if len(sys.argv) > 1 else 'csv'
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    submits = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    instrumentation.enable()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        dm = DataManager(backend=backend)
+        for label, write_behind in (('direct', False), ('write-behind', True)):
+            instrumentation.clear()
+            latencies, saved, elapsed = run(dm, sessions, submits, write_behind)
+            commits = {entry['operation']: entry['count'] for entry in instrumentation.summary()}
+            appends = commits.get('write_queue.commit', commits.get('data_manager.save_classes', 0))
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"{backend} {label:>12}: submit p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  "
+                  f"{saved / elapsed:7.0f} classes/s durable  {appends} appends for {saved} classes")
+        write_queue.flush_all()
+        print(f"rows on disk: {len(dm.load_classes())} of {2 * sessions * submits}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark class writes as the history file grows.
+
+Run from the repository root:
+
+    python benchmarks/bench_writes.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_manager import DataManager
+
+SIZES = [1_000, 10_000, 100_000]
+REPEATS = 50
+
+
+def make_row(i):
+    return {
+        'date': f"2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}",
+        'time': '09:00',
+        'duration': 1.5,
+        'class_type': 'Standard' if i % 4 else 'Demo',
+        'school_id': i % 20,
+        'price': 1125.0 if i % 4 else 400,
+        'notes': '',
+    }
+
+
+def legacy_save_class(dm, class_data):
+    """The previous read-modify-write path, kept for comparison."""
+    classes_df = pd.read_csv(dm.storage.classes_file)
+    classes_df = pd.concat([classes_df, pd.DataFrame([class_data])], ignore_index=True)
+    classes_df.to_csv(dm.storage.classes_file, index=False)
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for i in range(repeats):
+        fn(i)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    print(f"{'rows':>8} {'rewrite ms':>12} {'append ms':>10} {'bulk ms/row':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        for size in SIZES:
+            dm = DataManager(backend='csv')
+            dm.storage.fsync_writes = False
+            pd.DataFrame([make_row(i) for i in range(size)]).to_csv(dm.storage.classes_file, index=False)
+
+            rewrite = timed(lambda i: legacy_save_class(dm, make_row(i)), max(REPEATS // 10, 3))
+            append = timed(lambda i: dm.save_class(make_row(i)), REPEATS)
+            batch = [make_row(i) for i in range(1_000)]
+            bulk = timed(lambda i: dm.save_classes(batch), 5) / len(batch)
+
+            print(f"{size:>8} {rewrite:>12.2f} {append:>10.3f} {bulk:>12.4f}")
+            os.remove(dm.storage.classes_file)
+
+
+if __name__ == '__main__':
+    main()
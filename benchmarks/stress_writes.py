@@ -0,0 +1,84 @@
+"""Append classes from many threads and processes at once and check none are lost.
+
+Run from the repository root:
+
+    python benchmarks/stress_writes.py [backend]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import Process
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_manager import DataManager
+
+THREADS = 8
+PROCESSES = 4
+WRITES = 200
+
+
+def make_row(writer, i):
+    return {
+        'date': '2024-03-04',
+        'time': '09:00',
+        'duration': 1.0,
+        'class_type': 'Standard',
+        'school_id': 1,
+        'price': 750.0,
+        'notes': f"{writer}-{i}",
+    }
+
+
+def write_rows(backend, writer):
+    dm = DataManager(backend=backend)
+    for i in range(WRITES):
+        if not dm.save_class(make_row(writer, i)):
+            raise RuntimeError(f"save failed for {writer}-{i}")
+
+
+def read_while_writing(backend, stop, reads):
+    dm = DataManager(backend=backend)
+    while not stop.is_set():
+        dm.load_classes()
+        reads.append(1)
+
+
+def main():
+    backend = sys.argv[1] if len(sys.argv) > 1 else 'csv'
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        DataManager(backend=backend)
+
+        stop = threading.Event()
+        reads = []
+        reader = threading.Thread(target=read_while_writing, args=(backend, stop, reads))
+        threads = [threading.Thread(target=write_rows, args=(backend, f"t{i}")) for i in range(THREADS)]
+        processes = [Process(target=write_rows, args=(backend, f"p{i}")) for i in range(PROCESSES)]
+
+        start = time.perf_counter()
+        reader.start()
+        for worker in processes + threads:
+            worker.start()
+        for worker in processes + threads:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        reader.join()
+
+        notes = DataManager(backend=backend).load_classes()['notes']
+        expected = {f"{w}{n}-{i}" for w, count in (('t', THREADS), ('p', PROCESSES))
+                    for n in range(count) for i in range(WRITES)}
+        missing = expected - set(notes)
+        total = (THREADS + PROCESSES) * WRITES
+
+        print(f"{backend}: {total} appends from {THREADS} threads and {PROCESSES} processes in {elapsed:.2f}s "
+              f"({total / elapsed:.0f} writes/s), {len(reads)} concurrent reads")
+        print(f"rows on disk: {len(notes)}, missing: {len(missing)}, duplicates: {len(notes) - notes.nunique()}")
+        if missing or len(notes) != total:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""Time the dashboard's data paths headless and store the results as JSON.
+
+Each case runs the same DataManager calls and chart builds as a page,
+without Streamlit, against a seeded synthetic history ending today:
+
+    load_classes_cold     first load after a restart (caches dropped)
+    load_classes_warm     load served from the in-process cache
+    save_class            append one class
+    weekly_stats          dashboard metrics from the rollups
+    rollups_build         rollups rebuilt from the classes table
+    class_filter          Class Management totals and two pages of a year's classes
+    calendar_week         Calendar View query, week figure and totals
+    financial_reports     Financial Reports summary, trend, schools, months and projection rows for a year
+
+Run from the repository root:
+
+    python benchmarks/suite.py [--sizes 10k,100k,1M] [--backend csv] [--repeats 5] [--output results.json]
+
+Sizes go up to 10M; generated datasets can be kept between runs with
+--data-dir. Compare two result files, flagging cases whose median got
+slower than the threshold (exit status 1 if any did):
+
+    python benchmarks/suite.py --compare old.json new.json [--threshold 0.1]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import storage
+from benchmarks.synthetic import parse_size, write_dataset
+from charts import build_week_figure
+from data_manager import DataManager, format_time
+
+YEARS = 10
+RESULTS_DIR = os.path.join(REPO, 'benchmarks', 'results')
+
+
+def drop_caches():
+    """Forget every in-process frame and rollup cache, as after a restart."""
+    with storage._frame_cache_lock:
+        storage._frame_cache.clear()
+    with aggregates._rollup_cache_lock:
+        aggregates._rollup_cache.clear()
+
+
+def measure(fn, repeats, setup=None):
+    """Return the wall times of `repeats` calls of fn in milliseconds."""
+    times = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def cases(dm):
+    """Return (name, fn, setup) for every benchmarked data path."""
+    today = date.today()
+    start_of_week = today - timedelta(days=today.weekday())
+    end_of_week = start_of_week + timedelta(days=6)
+    year_ago = today - timedelta(days=365)
+    new_class = {
+        'date': today.strftime('%Y-%m-%d'), 'time': '10:00', 'duration': 1.0,
+        'class_type': 'Standard', 'school_id': 1, 'price': 750.0, 'notes': '',
+    }
+
+    def class_filter():
+        totals = dm.get_rollups(year_ago, today)
+        totals[totals['class_type'].isin(['Standard', 'Demo'])]['classes'].sum()
+        page, cursor = dm.query_page(year_ago, today, ['Standard', 'Demo'], limit=50)
+        page, _ = dm.query_page(year_ago, today, ['Standard', 'Demo'], before=cursor, limit=50)
+        return page.assign(time=format_time(page['time']))
+
+    def calendar_week():
+        week_classes = dm.query_classes(start_of_week, end_of_week)
+        build_week_figure(week_classes, datetime.combine(start_of_week, datetime.min.time()))
+        totals = dm.get_rollups(start_of_week, end_of_week)
+        totals.groupby('class_type')['classes'].sum()
+        totals.pivot_table(index='date', columns='class_type', values='classes', aggfunc='sum', fill_value=0)
+
+    def financial_reports():
+        dm.get_class_date_range()
+        dm.get_period_totals(year_ago, today, None, ['class_type'])
+        dm.get_period_totals(year_ago, today, 'day', [])
+        by_school = dm.get_period_totals(year_ago, today, None, ['school_id'])
+        dm.get_school_names(by_school['school_id'])
+        dm.get_period_totals(year_ago, today, 'month', ['school_id', 'class_type'])
+        dm.query_classes(year_ago, today, columns=['date', 'class_type', 'school_id', 'duration', 'price'])
+
+    return [
+        ('load_classes_cold', dm.load_classes, drop_caches),
+        ('load_classes_warm', dm.load_classes, None),
+        ('save_class', lambda: dm.save_class(new_class), None),
+        ('weekly_stats', dm.get_weekly_stats, None),
+        ('rollups_build', dm.get_weekly_stats, drop_caches),
+        ('class_filter', class_filter, None),
+        ('calendar_week', calendar_week, None),
+        ('financial_reports', financial_reports, None),
+    ]
+
+
+def dataset(data_dir, rows, seed):
+    """Return a directory holding the synthetic CSV files, generating them if needed."""
+    start = (date.today() - timedelta(days=int(365 * YEARS))).strftime('%Y-%m-%d')
+    path = os.path.join(data_dir, f"classes-{rows}-seed{seed}-{start}")
+    if not os.path.exists(os.path.join(path, 'classes.csv')):
+        write_dataset(path + '.partial', rows, seed=seed, start=start, years=YEARS)
+        os.replace(path + '.partial', path)
+    return path
+
+
+def run_size(source, rows, backend, repeats):
+    """Benchmark every case on a private copy of one dataset."""
+    with tempfile.TemporaryDirectory() as work:
+        for name in ('classes.csv', 'schools.csv'):
+            shutil.copy(os.path.join(source, name), work)
+        cwd = os.getcwd()
+        os.chdir(work)
+        try:
+            drop_caches()
+            dm = DataManager(backend=backend)
+            dm.storage.fsync_writes = False
+            if backend != 'csv':
+                dm.storage.import_csv()
+            # Prime the caches so warm cases measure steady state
+            dm.load_classes()
+            dm.get_rollups()
+
+            results = []
+            for name, fn, setup in cases(dm):
+                times = measure(fn, repeats, setup)
+                results.append({
+                    'case': name,
+                    'rows': rows,
+                    'backend': backend,
+                    'repeats': repeats,
+                    'min_ms': min(times),
+                    'median_ms': statistics.median(times),
+                    'stdev_ms': statistics.stdev(times) if len(times) > 1 else 0.0,
+                })
+                print(f"{rows:>10} {name:<20} {results[-1]['median_ms']:>10.2f} {results[-1]['min_ms']:>10.2f} "
+                      f"{results[-1]['stdev_ms']:>8.2f}")
+            return results
+        finally:
+            os.chdir(cwd)
+            drop_caches()
+
+
+def environment(backend):
+    """Describe the commit and interpreter the results were taken on."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO, capture_output=True, text=True
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'backend': backend,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+    }
+
+
+def compare(old_file, new_file, threshold):
+    """Print median changes between two result files; return True if any case regressed."""
+    with open(old_file) as f:
+        old = {(r['case'], r['rows'], r['backend']): r for r in json.load(f)['results']}
+    with open(new_file) as f:
+        new = json.load(f)['results']
+
+    regressed = False
+    print(f"{'rows':>10} {'case':<20} {'old ms':>10} {'new ms':>10} {'change':>8}")
+    for result in new:
+        before = old.get((result['case'], result['rows'], result['backend']))
+        if before is None:
+            continue
+        change = result['median_ms'] / before['median_ms'] - 1 if before['median_ms'] else 0.0
+        flag = '  REGRESSION' if change > threshold else ''
+        regressed |= bool(flag)
+        print(f"{result['rows']:>10} {result['case']:<20} {before['median_ms']:>10.2f} "
+              f"{result['median_ms']:>10.2f} {change:>+8.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10k,100k,1M', help="comma-separated row counts, e.g. 10k,100k,1M,10M")
+    parser.add_argument('--backend', default='csv', choices=['csv', 'sqlite', 'parquet'])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help="keep generated datasets here and reuse them on later runs")
+    parser.add_argument('--output', help="results file, benchmarks/results/<commit>-<backend>.json by default")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two result files instead of running")
+    parser.add_argument('--threshold', type=float, default=0.1, help="slowdown flagged as a regression (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    env = environment(args.backend)
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        data_dir = args.data_dir or scratch
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"{args.backend} backend, {args.repeats} repeats (ms)")
+        print(f"{'rows':>10} {'case':<20} {'median':>10} {'min':>10} {'stdev':>8}")
+        for rows in sizes:
+            results.extend(run_size(dataset(data_dir, rows, args.seed), rows, args.backend, args.repeats))
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{(env['commit'] or 'unknown')[:12]}-{args.backend}.json")
+    with open(output, 'w') as f:
+        json.dump({'environment': env, 'results': results}, f, indent=2)
+    print(f"Wrote {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Seeded synthetic schools and class histories for the benchmarks.
+
+Write a dataset the app can open, for example a million classes:
+
+    python benchmarks/synthetic.py 1000000 --out data
+    cd data && streamlit run ../main.py
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+
+_PLACES = ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret', 'Thika', 'Machakos', 'Nyeri', 'Kericho', 'Malindi']
+_KINDS = ['Academy', 'Primary School', 'High School', 'Preparatory', 'International School', 'Girls School']
+
+# Weight of each weekday (Monday first) and each hour from 06:00 to 21:00;
+# most classes are weekday afternoons
+_WEEKDAY_WEIGHTS = np.array([1.0, 1.0, 1.0, 1.0, 0.9, 0.35, 0.1])
+_HOUR_WEIGHTS = np.array([0.1, 0.4, 0.8, 1.0, 1.0, 0.9, 0.7, 0.9, 1.0, 1.0, 0.9, 0.6, 0.3, 0.15, 0.1, 0.05])
+
+
+def parse_size(value):
+    """Turn '10k', '1M' or a plain number into a row count."""
+    return SIZES.get(value) or int(float(value.lower().replace('k', 'e3').replace('m', 'e6')))
+
+
+def make_schools(count=50, seed=0):
+    """Return `count` schools with IDs 1..count, in the on-disk CSV format."""
+    rng = np.random.default_rng(seed)
+    names = [
+        f"{_PLACES[i % len(_PLACES)]} {_KINDS[(i // len(_PLACES)) % len(_KINDS)]}"
+        + (f" {i // (len(_PLACES) * len(_KINDS)) + 1}" if i >= len(_PLACES) * len(_KINDS) else '')
+        for i in range(count)
+    ]
+    return pd.DataFrame({
+        'school_id': np.arange(1, count + 1),
+        'name': names,
+        'address': [f"{rng.integers(1, 400)} {_PLACES[i % len(_PLACES)]} Road" for i in range(count)],
+        'contact': [f"07{rng.integers(10_000_000, 99_999_999)}" for _ in range(count)],
+    })
+
+
+def make_classes(rows, seed=0, start='2015-01-01', years=10, schools=50, sort=False):
+    """Return `rows` classes spread over `years` years, in the on-disk CSV format.
+
+    Classes fall mostly on weekday afternoons, a fifth are Demo classes,
+    and a few larger schools get most of the bookings. With `sort` the
+    rows come in date order, the way the app appends them.
+    """
+    rng = np.random.default_rng(seed)
+    span = max(int(365 * years), 1)
+
+    # Draw more days than needed and thin them by weekday so the mix of days is realistic
+    first_weekday = pd.Timestamp(start).weekday()
+    candidates = rng.integers(0, span, int(rows * 1.6) + 16)
+    keep = rng.random(len(candidates)) < _WEEKDAY_WEIGHTS[(candidates + first_weekday) % 7]
+    days = candidates[keep][:rows]
+    if len(days) < rows:
+        days = np.concatenate([days, rng.integers(0, span, rows - len(days))])
+    if sort:
+        days.sort()
+
+    class_type = np.where(rng.random(rows) < 0.2, 'Demo', 'Standard')
+    duration = np.where(class_type == 'Demo', 1.0, rng.choice([1.0, 1.5, 2.0], rows, p=[0.5, 0.3, 0.2]))
+    hours = rng.choice(np.arange(6, 22), rows, p=_HOUR_WEIGHTS / _HOUR_WEIGHTS.sum())
+    minutes = hours * 60 + rng.choice([0, 30], rows)
+    # Zipf-like school popularity
+    popularity = 1 / np.arange(1, schools + 1)
+    school_id = rng.choice(np.arange(1, schools + 1), rows, p=popularity / popularity.sum())
+    notes = np.where(rng.random(rows) < 0.1, 'Bring the robotics kits', '')
+
+    return pd.DataFrame({
+        'date': (np.datetime64(start) + days).astype(str),
+        'time': pd.Series(minutes // 60).astype(str).str.zfill(2) + ':' + pd.Series(minutes % 60).astype(str).str.zfill(2),
+        'duration': duration,
+        'class_type': class_type,
+        'school_id': school_id,
+        'price': np.where(class_type == 'Demo', 400, 750 * duration),
+        'notes': notes,
+    })
+
+
+def write_dataset(directory, rows, seed=0, start='2015-01-01', years=10, schools=50, chunk_rows=1_000_000):
+    """Write schools.csv and a date-ordered classes.csv into `directory`.
+
+    Classes are generated one slice of the date range at a time, so even
+    10M rows never sit in memory at once.
+    """
+    os.makedirs(directory, exist_ok=True)
+    make_schools(schools, seed).to_csv(os.path.join(directory, 'schools.csv'), index=False)
+
+    chunks = max(-(-rows // chunk_rows), 1)
+    span = max(int(365 * years), 1)
+    classes_file = os.path.join(directory, 'classes.csv')
+    written = 0
+    for i in range(chunks):
+        chunk_start = pd.Timestamp(start) + pd.Timedelta(days=span * i // chunks)
+        chunk_days = span * (i + 1) // chunks - span * i // chunks
+        count = rows // chunks + (1 if i < rows % chunks else 0)
+        classes = make_classes(
+            count, seed=seed * 1_000 + i, start=chunk_start.strftime('%Y-%m-%d'),
+            years=chunk_days / 365, schools=schools, sort=True
+        )
+        # Number the classes the way the app does, in file order
+        classes['class_id'] = np.arange(written + 1, written + count + 1)
+        written += count
+        classes.to_csv(classes_file, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic classes.csv and schools.csv.")
+    parser.add_argument('rows', type=parse_size, help="number of classes, e.g. 100000 or 1M")
+    parser.add_argument('--out', default='.', help="directory to write the CSV files to")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', default='2015-01-01')
+    parser.add_argument('--years', type=float, default=10)
+    parser.add_argument('--schools', type=int, default=50)
+    args = parser.parse_args()
+
+    write_dataset(args.out, args.rows, args.seed, args.start, args.years, args.schools)
+    print(f"Wrote {args.rows} classes and {args.schools} schools to {args.out}")
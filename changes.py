@@ -0,0 +1,144 @@
+import pandas as pd
+import os
+import threading
+
+import streamlit as st
+
+import aggregates
+import instrumentation
+import schedule
+
+# Classes kept for sessions catching up; older sessions just rerun in full
+MAX_ROWS = 10_000
+
+# Seconds between checks for new classes while auto-refresh is on
+REFRESH_SECONDS = float(os.environ.get('TRACKER_REFRESH_SECONDS', 5))
+
+# Change logs shared by every session in the process, keyed on the storage location
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+class ChangeLog:
+    """Classes added to one store, numbered in the order this process noticed them.
+
+    The version counts the classes seen so far, so the classes newer than
+    a version are the tail of the log. Changes that aren't plain appends,
+    like repricing, bump the version once and drop the log: sessions older
+    than that have to read everything again.
+    """
+
+    def __init__(self, signature):
+        # Storage signature the log is up to date with
+        self.signature = signature
+        self.version = 0
+        # Version of the first class still kept, and (version after, classes) batches
+        self._start = 0
+        self._batches = []
+        self.lock = threading.Lock()
+
+    def append(self, classes, signature):
+        self.signature = signature
+        if classes.empty:
+            return
+        self.version += len(classes)
+        self._batches.append((self.version, classes))
+        while self._batches and self.version - self._batches[0][0] + len(self._batches[0][1]) > MAX_ROWS:
+            self._start = self._batches.pop(0)[0]
+
+    def reset(self, signature):
+        self.signature = signature
+        self.version += 1
+        self._start = self.version
+        self._batches = []
+
+    def since(self, version):
+        """Return the classes added after `version`, or None if the log no longer reaches back that far."""
+        if version is None or version < self._start or version > self.version:
+            return None
+        frames = [
+            classes.iloc[max(0, version - (end - len(classes))):]
+            for end, classes in self._batches if end > version
+        ]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+
+
+def get_log(storage):
+    """Return the process-wide change log of a storage backend, starting it at the current data."""
+    key = storage.cache_key()
+    with _logs_lock:
+        log = _logs.get(key)
+        if log is None:
+            log = _logs[key] = ChangeLog(storage.signature())
+        return log
+
+
+def forget(storage):
+    """Drop the change log of a storage backend."""
+    with _logs_lock:
+        _logs.pop(storage.cache_key(), None)
+
+
+def _pull(log, storage):
+    """Bring a log up to date with its storage; the caller holds the log's lock."""
+    if storage.signature() == log.signature:
+        return
+    with instrumentation.span('changes.sync') as span:
+        before = log.signature
+        new, current = storage.read_changes(before)
+        if new is None:
+            log.reset(current)
+            return
+        rows = new.to_dict('records')
+        aggregates.record_append(storage, rows, before, current)
+        schedule.record_append(storage, rows, before, current)
+        log.append(new, current)
+        span.rows = len(new)
+
+
+def sync(storage):
+    """Pull classes saved since the last sync into the log and the shared caches; returns the version.
+
+    When nothing changed this costs one signature check. Otherwise only
+    the new classes are read, and the cached frames, rollups and slot
+    index are patched with them instead of being rebuilt.
+    """
+    log = get_log(storage)
+    with log.lock:
+        _pull(log, storage)
+        return log.version
+
+
+def changes_since(storage, version):
+    """Sync, then return the current version and the classes added after `version` (None if unknown)."""
+    log = get_log(storage)
+    with log.lock:
+        _pull(log, storage)
+        return log.version, log.since(version)
+
+
+def auto_refresh(key='auto_refresh'):
+    """Sidebar toggle that reruns the page when classes are saved from elsewhere.
+
+    Every full run records the version it shows. While the toggle is on, a
+    fragment checks for a newer one every REFRESH_SECONDS and reruns the
+    page when there is one; the check draws nothing.
+    """
+    data_manager = st.session_state.data_manager
+    st.session_state[f"{key}_version"] = data_manager.get_changes()[0]
+    if not st.sidebar.toggle("Auto-refresh", key=key, help="Show classes added in other sessions as they are saved"):
+        return
+
+    @st.fragment(run_every=REFRESH_SECONDS)
+    def poll():
+        seen = st.session_state[f"{key}_version"]
+        version, new = data_manager.get_changes(seen)
+        if version == seen:
+            return
+        if new is not None:
+            st.toast(f"{len(new)} new class{'es' if len(new) != 1 else ''} added")
+        st.rerun()
+
+    poll()
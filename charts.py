@@ -0,0 +1,120 @@
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+from datetime import timedelta
+import instrumentation
+from data_manager import format_time
+from schedule import DAY_START, DAY_END, SLOT_MINUTES
+
+CLASS_COLORS = {'Demo': '#FFA500', 'Standard': '#2E8B57'}
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def _minutes_label(minutes):
+    """Format an array of minutes since midnight as HH:MM strings."""
+    return format_time(pd.Series(minutes)).to_numpy()
+
+
+@instrumentation.timed('chart.week_figure')
+def build_week_figure(week_classes, start_of_week, duration_blocks=False):
+    """Build the weekly schedule figure with one trace per class type.
+
+    `week_classes` holds the typed classes of the week starting on
+    `start_of_week`. With `duration_blocks` each class is drawn as a bar
+    spanning its start and end time instead of a marker at its start.
+    Rows with a `series_id` are upcoming classes of a recurring series and
+    are drawn fainter than recorded ones.
+    """
+    instrumentation.add_rows(len(week_classes))
+    dates = [(start_of_week + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]
+    slots = np.arange(DAY_START, DAY_END + 1, SLOT_MINUTES)
+
+    fig = go.Figure()
+
+    # Day column backgrounds as a single trace, with a gap after each day
+    fig.add_trace(go.Scatter(
+        x=np.array([[day] * len(slots) + [None] for day in dates], dtype=object).ravel(),
+        y=np.tile(np.append(slots, np.nan), len(dates)),
+        mode='lines',
+        line=dict(color='rgba(200,200,200,0.3)', width=30),
+        showlegend=False,
+        hoverinfo='skip'
+    ))
+
+    if not week_classes.empty:
+        x = week_classes['date'].dt.strftime('%Y-%m-%d').to_numpy()
+        start = week_classes['time'].to_numpy(dtype=int)
+        duration = week_classes['duration'].to_numpy(dtype=float)
+        class_type = week_classes['class_type'].astype(str).to_numpy()
+        start_label = _minutes_label(start)
+        end_label = _minutes_label(start + np.round(duration * 60))
+        text = (pd.Series(class_type) + '<br>' + start_label).to_numpy()
+        customdata = np.column_stack([class_type, start_label, end_label, duration])
+        opacity = np.full(len(week_classes), 0.7)
+        if 'series_id' in week_classes:
+            opacity[week_classes['series_id'].notna().to_numpy()] = 0.35
+        hovertemplate = (
+            "<b>%{customdata[0]} Class</b><br>"
+            "Time: %{customdata[1]} - %{customdata[2]}<br>"
+            "Duration: %{customdata[3]} hours<br>"
+            "<extra></extra>"
+        )
+
+        for name in pd.unique(class_type):
+            rows = class_type == name
+            color = CLASS_COLORS.get(name, '#1f77b4')
+            if duration_blocks:
+                fig.add_trace(go.Bar(
+                    x=x[rows],
+                    y=duration[rows] * 60,
+                    base=start[rows],
+                    marker=dict(color=color, opacity=opacity[rows]),
+                    text=text[rows],
+                    textposition='inside',
+                    insidetextanchor='start',
+                    name=name,
+                    customdata=customdata[rows],
+                    hovertemplate=hovertemplate
+                ))
+            else:
+                fig.add_trace(go.Scatter(
+                    x=x[rows],
+                    y=start[rows],
+                    mode='markers+text',
+                    marker=dict(symbol='square', size=40, color=color, opacity=opacity[rows]),
+                    text=text[rows],
+                    textposition='middle center',
+                    name=name,
+                    customdata=customdata[rows],
+                    hovertemplate=hovertemplate
+                ))
+
+    fig.update_layout(
+        title="Weekly Schedule",
+        height=800,
+        showlegend=True,
+        barmode='overlay',
+        plot_bgcolor='rgba(255,255,255,0.9)',
+        paper_bgcolor='rgba(255,255,255,0.9)',
+        xaxis=dict(
+            type='category',
+            categoryorder='array',
+            categoryarray=dates,
+            ticktext=DAYS,
+            tickvals=dates,
+            tickangle=0,
+            gridcolor='rgba(200,200,200,0.2)',
+            showgrid=True,
+            fixedrange=True
+        ),
+        yaxis=dict(
+            range=[DAY_START - SLOT_MINUTES, DAY_END + SLOT_MINUTES],
+            tickvals=slots,
+            ticktext=_minutes_label(slots),
+            gridcolor='rgba(200,200,200,0.2)',
+            showgrid=True,
+            fixedrange=True
+        ),
+        margin=dict(l=40, r=40, t=40, b=40)
+    )
+    return fig
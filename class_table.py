@@ -0,0 +1,101 @@
+import streamlit as st
+import data_manager
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def _older(key, cursor):
+    st.session_state[f"{key}_cursors"].append(cursor)
+
+
+def _newer(key):
+    st.session_state[f"{key}_cursors"].pop()
+
+
+def _save_edits(key, class_ids):
+    """Save the changes made in the class grid, by class ID, and start the grid afresh."""
+    editor_key = f"{key}_editor_{st.session_state.get(f'{key}_editor_version', 0)}"
+    changes = st.session_state.get(editor_key, {})
+    data_manager = st.session_state.data_manager
+    updates = {}
+    for row, values in changes.get('edited_rows', {}).items():
+        values = dict(values)
+        if 'school' in values:
+            values['school_id'] = data_manager.get_school_id(values.pop('school'))
+        updates[class_ids[int(row)]] = values
+    deletes = [class_ids[int(row)] for row in changes.get('deleted_rows', [])]
+    if data_manager.edit_classes(updates, deletes):
+        st.session_state[f"{key}_editor_version"] = st.session_state.get(f"{key}_editor_version", 0) + 1
+        st.toast(f"✅ Saved {len(updates)} change(s) and {len(deletes)} deletion(s)")
+
+
+def show_class_editor(key, page, column_config=None):
+    """Show a page of classes as an editable grid with a Save button.
+
+    Cells can be changed and rows deleted; nothing is stored until Save,
+    which sends only the changed cells, keyed by class ID.
+    """
+    schools = st.session_state.data_manager.get_schools()
+    grid = page.assign(school=st.session_state.data_manager.get_school_names(page['school_id'])).drop(columns='school_id')
+    column_config = {
+        **(column_config or {}),
+        'class_id': st.column_config.NumberColumn("ID", disabled=True),
+        'class_type': st.column_config.SelectboxColumn("Type", options=['Standard', 'Demo'], required=True),
+        'school': st.column_config.SelectboxColumn("School", options=schools.names(), required=True),
+        'time': st.column_config.TextColumn("Time", validate=r'^\d{2}:\d{2}$', required=True),
+    }
+    editor_key = f"{key}_editor_{st.session_state.get(f'{key}_editor_version', 0)}"
+    column_order = ['class_id', 'date', 'time', 'duration', 'class_type', 'school', 'price', 'notes']
+    st.data_editor(grid, key=editor_key, num_rows='delete', use_container_width=True, hide_index=True,
+                   column_config=column_config, column_order=[column for column in column_order if column in grid])
+    changes = st.session_state.get(editor_key, {})
+    pending = len(changes.get('edited_rows', {})) + len(changes.get('deleted_rows', []))
+    st.button(f"Save {pending} change(s)" if pending else "Save changes", key=f"{key}_save", type='primary',
+              disabled=not pending, on_click=_save_edits, args=(key, page['class_id'].tolist()))
+
+
+def show_class_page(key, start, end, class_types=None, columns=None, total=None, column_config=None, editable=False):
+    """Show one page of the classes in a date range, newest first, with Newer/Older buttons.
+
+    Only the visible page is loaded and sent to the browser. The cursors of
+    the pages visited so far are kept in session state under `key`, and
+    start over whenever the filters or the page size change. `total` is
+    the number of matching classes, for the position caption. With
+    `editable` the page is an editable grid, see show_class_editor.
+    """
+    page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_page_size")
+
+    # Start from the newest page whenever the filters change
+    filters = (str(start), str(end), tuple(class_types) if class_types is not None else None, tuple(columns or ()), page_size)
+    if st.session_state.get(f"{key}_filters") != filters:
+        st.session_state[f"{key}_filters"] = filters
+        st.session_state[f"{key}_cursors"] = []
+    cursors = st.session_state[f"{key}_cursors"]
+
+    if editable:
+        # Edits are saved by class ID
+        columns = [column for column in columns or st.session_state.data_manager.classes_columns if column != 'class_id'] + ['class_id']
+    page, next_cursor = st.session_state.data_manager.query_page(
+        start, end, class_types, columns=columns, before=cursors[-1] if cursors else None, limit=page_size
+    )
+    if 'time' in page:
+        page = page.assign(time=data_manager.format_time(page['time']))
+    if editable:
+        show_class_editor(key, page, column_config)
+    else:
+        st.dataframe(page, use_container_width=True, hide_index=True, column_config=column_config)
+
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        st.button("← Newer", key=f"{key}_newer", disabled=not cursors, on_click=_newer, args=(key,),
+                  use_container_width=True)
+    with col2:
+        first = len(cursors) * page_size
+        position = f"Classes {first + 1:,}–{first + len(page):,}" if len(page) else "No classes"
+        if total is not None:
+            position += f" of {total:,}"
+        st.caption(position)
+    with col3:
+        st.button("Older →", key=f"{key}_older", disabled=next_cursor is None, on_click=_older,
+                  args=(key, next_cursor), use_container_width=True)
+    return page
@@ -1,93 +1,479 @@
 import pandas as pd
+import numpy as np
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import streamlit as st
+import aggregates
+import changes
+import instrumentation
+import recurring
+import schedule
+import schools
+import write_queue
+from aggregates import ROLLUP_COLUMNS
+from pricing import RATE_COLUMNS, RateTable
+from storage import CLASSES_COLUMNS, SCHOOLS_COLUMNS, get_storage
+
+def format_time(minutes):
+    """Format minutes since midnight, as a number or a Series, as HH:MM."""
+    if isinstance(minutes, pd.Series):
+        minutes = minutes.astype(int)
+        return (minutes // 60).astype(str).str.zfill(2) + ':' + (minutes % 60).astype(str).str.zfill(2)
+    return f"{int(minutes) // 60:02d}:{int(minutes) % 60:02d}"
 
 class DataManager:
-    def __init__(self):
-        # Initialize data files if they don't exist
-        self.classes_file = 'classes.csv'
-        self.schools_file = 'schools.csv'
+    def __init__(self, backend=None, root=None):
+        # Pick the storage backend (CSV files unless TRACKER_BACKEND says otherwise),
+        # inside `root` when each educator has a data directory of their own
+        self.storage = get_storage(backend, root)
 
-        # Define column structures
-        self.classes_columns = ['date', 'time', 'duration', 'class_type', 'school_id', 'price', 'notes']
-        self.schools_columns = ['school_id', 'name', 'address', 'contact']
+        # Price rules on top of the built-in Demo and Standard rates
+        self.rates_file = os.environ.get('TRACKER_RATES', 'rates.csv') if root is None else os.path.join(root, 'rates.csv')
 
-        # Initialize files with headers if they don't exist
-        if not os.path.exists(self.classes_file):
-            self._create_empty_df(self.classes_file, self.classes_columns)
+        # Weekly recurring classes, one row per series
+        self.series_file = os.environ.get('TRACKER_SERIES', 'series.csv') if root is None else os.path.join(root, 'series.csv')
 
-        if not os.path.exists(self.schools_file):
-            self._create_empty_df(self.schools_file, self.schools_columns)
+        # Queue class saves for a background writer instead of saving before the form returns
+        self.write_behind = write_queue.WRITE_BEHIND
 
-    def _create_empty_df(self, file_path, columns):
-        """Create an empty DataFrame with specified columns and save it to CSV."""
-        df = pd.DataFrame(columns=columns)
-        df.to_csv(file_path, index=False)
+        # Define column structures
+        self.classes_columns = list(CLASSES_COLUMNS)
+        self.schools_columns = list(SCHOOLS_COLUMNS)
 
+    @instrumentation.timed('data_manager.load_classes')
     def load_classes(self):
         """Load classes with error handling."""
         try:
-            return pd.read_csv(self.classes_file)
-        except pd.errors.EmptyDataError:
-            return pd.DataFrame(columns=self.classes_columns)
+            return self.storage.load_classes()
         except Exception as e:
+            instrumentation.mark_error(e)
             st.error(f"Error loading classes: {str(e)}")
             return pd.DataFrame(columns=self.classes_columns)
 
+    @instrumentation.timed('data_manager.load_schools')
     def load_schools(self):
         """Load schools with error handling."""
         try:
-            return pd.read_csv(self.schools_file)
-        except pd.errors.EmptyDataError:
-            return pd.DataFrame(columns=self.schools_columns)
+            return self.storage.load_schools()
         except Exception as e:
+            instrumentation.mark_error(e)
             st.error(f"Error loading schools: {str(e)}")
             return pd.DataFrame(columns=self.schools_columns)
 
+    @instrumentation.timed('data_manager.query_classes')
+    def query_classes(self, start=None, end=None, class_types=None, school_id=None, columns=None):
+        """Load date-sorted classes in an inclusive date range, optionally of some types or one school, with error handling."""
+        try:
+            return self.storage.query_classes(start, end, class_types, school_id, columns)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error loading classes: {str(e)}")
+            return pd.DataFrame(columns=self.classes_columns)
+
+    @instrumentation.timed('data_manager.query_page')
+    def query_page(self, start=None, end=None, class_types=None, school_id=None, columns=None, before=None, limit=50):
+        """Load one page of matching classes, newest first, and the cursor of the next page, with error handling."""
+        try:
+            return self.storage.query_page(start, end, class_types, school_id, columns, before, limit)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error loading classes: {str(e)}")
+            return pd.DataFrame(columns=columns or self.classes_columns), None
+
+    @instrumentation.timed('data_manager.get_changes')
+    def get_changes(self, since=None):
+        """Pull in classes saved elsewhere and return the current version and the classes added after `since`, with error handling.
+
+        The classes are None when `since` is unknown or too old, or the data
+        was rewritten, and everything should be read again.
+        """
+        try:
+            return changes.changes_since(self.storage, since)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error checking for new classes: {str(e)}")
+            return since, None
+
+    @instrumentation.timed('data_manager.get_class_date_range')
+    def get_class_date_range(self):
+        """Return the first and last class dates, or None when no classes are recorded."""
+        try:
+            return self.storage.date_bounds()
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error loading classes: {str(e)}")
+            return None
+
+    @instrumentation.timed('data_manager.save_class')
     def save_class(self, class_data):
         """Save class with error handling."""
+        return self.save_classes([class_data])
+
+    @instrumentation.timed('data_manager.save_classes')
+    def save_classes(self, classes):
+        """Save many classes in a single append with error handling."""
         try:
-            classes_df = self.load_classes()
-            classes_df = pd.concat([classes_df, pd.DataFrame([class_data])], ignore_index=True)
-            classes_df.to_csv(self.classes_file, index=False)
+            classes = list(classes)
+            instrumentation.add_rows(len(classes))
+            before, after = self.storage.append_classes(classes)
+            aggregates.record_append(self.storage, classes, before, after)
+            schedule.record_append(self.storage, classes, before, after)
             return True
         except Exception as e:
+            instrumentation.mark_error(e)
             st.error(f"Error saving class: {str(e)}")
             return False
 
-    def save_school(self, school_data):
-        """Save school with error handling."""
+    @instrumentation.timed('data_manager.submit_classes')
+    def submit_classes(self, classes):
+        """Save classes, in the background when write-behind is on, with error handling.
+
+        Returns a write_queue.Ticket whose `done` event is set once the
+        classes are durable; without write-behind that has already happened.
+        Returns None if the classes could not be submitted.
+        """
+        try:
+            classes = list(classes)
+            if self.write_behind:
+                return write_queue.get_queue(self.storage).submit(classes)
+            ticket = write_queue.Ticket(classes)
+            ticket.finish(None if self.save_classes(classes) else "Error saving class")
+            return ticket
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error saving class: {str(e)}")
+            return None
+
+    @instrumentation.timed('data_manager.edit_classes')
+    def edit_classes(self, updates=None, deletes=()):
+        """Change and delete classes by ID with error handling.
+
+        `updates` maps class IDs to the new values of some columns. A class
+        whose date, duration, type or school changes is repriced at the
+        current rates unless the update sets a price. The change is logged
+        rather than rewriting the stored history. Returns True on success.
+        """
         try:
-            schools_df = self.load_schools()
-            schools_df = pd.concat([schools_df, pd.DataFrame([school_data])], ignore_index=True)
-            schools_df.to_csv(self.schools_file, index=False)
+            updates, deletes = dict(updates or {}), list(deletes)
+            if not updates and not deletes:
+                return True
+            rates = self.load_rates()
+
+            def reprice(classes_df):
+                # Keep the recorded price of classes no rule covers
+                prices = rates.price(classes_df)
+                return np.where(np.isnan(prices), classes_df['price'], prices)
+
+            instrumentation.add_rows(len(updates) + len(deletes))
+            before, after, removed, added = self.storage.edit_classes(updates, deletes, reprice)
+            removed, added = removed.to_dict('records'), added.to_dict('records')
+            aggregates.record_edit(self.storage, removed, added, before, after)
+            schedule.record_edit(self.storage, removed, added, before, after)
             return True
         except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error editing classes: {str(e)}")
+            return False
+
+    def update_class(self, class_id, changes):
+        """Change some columns of one class; see edit_classes."""
+        return self.edit_classes({class_id: changes})
+
+    def delete_class(self, class_id):
+        """Delete one class; see edit_classes."""
+        return self.edit_classes(deletes=[class_id])
+
+    @instrumentation.timed('data_manager.save_school')
+    def save_school(self, school_data):
+        """Save school with a unique name and, unless it has one, the next compact ID, with error handling.
+
+        Returns the saved school record, or None if it could not be saved.
+        """
+        try:
+            return schools.add_school(self.storage, school_data)
+        except Exception as e:
+            instrumentation.mark_error(e)
             st.error(f"Error saving school: {str(e)}")
+            return None
+
+    @instrumentation.timed('data_manager.update_school')
+    def update_school(self, school_id, changes):
+        """Change the name, address or contact of a school, keeping names unique, with error handling.
+
+        Returns the updated school record, or None if it could not be saved.
+        """
+        try:
+            return schools.update_school(self.storage, school_id, changes)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error updating school: {str(e)}")
+            return None
+
+    @instrumentation.timed('data_manager.get_schools')
+    def get_schools(self):
+        """Load the school registry with error handling."""
+        try:
+            return schools.get_registry(self.storage)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error loading schools: {str(e)}")
+            return schools.SchoolRegistry()
+
+    def get_school_id(self, name):
+        """Return the ID of the school with this name, or None."""
+        return self.get_schools().id_for_name(name)
+
+    def get_school_names(self, school_ids, default=None):
+        """Return the school name of every ID in a column, as an array."""
+        return self.get_schools().names_for(school_ids, default)
+
+    def load_rates(self):
+        """Load the rate table with error handling."""
+        try:
+            return RateTable.from_csv(self.rates_file)
+        except Exception as e:
+            st.error(f"Error loading rates: {str(e)}")
+            return RateTable()
+
+    def save_rates(self, rates):
+        """Save the rate rules with error handling."""
+        try:
+            pd.DataFrame(rates, columns=RATE_COLUMNS).to_csv(self.rates_file, index=False)
+            return True
+        except Exception as e:
+            st.error(f"Error saving rates: {str(e)}")
             return False
 
-    def calculate_class_price(self, duration, class_type):
+    def calculate_class_price(self, duration, class_type, school_id=None, date=None):
         """Calculate class price based on type and duration."""
-        if class_type == 'Demo':
-            return 400
-        else:
-            return 750 * float(duration)
+        return self.load_rates().price_one(duration, class_type, school_id, date)
+
+    def calculate_class_prices(self, durations, class_types, school_ids=None, dates=None, rates=None):
+        """Calculate prices for whole columns of classes at once."""
+        if rates is None:
+            rates = self.load_rates()
+        return rates.price(pd.DataFrame({
+            'duration': np.asarray(durations, dtype=float),
+            'class_type': np.asarray(class_types),
+            'school_id': None if school_ids is None else np.asarray(school_ids),
+            'date': pd.Timestamp.now() if dates is None else pd.to_datetime(np.asarray(dates)),
+        }))
+
+    def project_earnings(self, classes_df, rates):
+        """Return the classes with a `projected_price` column priced at the given rates.
+
+        Classes no rule covers keep their recorded price.
+        """
+        prices = rates.price(classes_df)
+        return classes_df.assign(projected_price=np.where(np.isnan(prices), classes_df['price'], prices))
+
+    @instrumentation.timed('data_manager.reprice_classes')
+    def reprice_classes(self, rates=None, start=None, end=None):
+        """Reprice stored classes in an inclusive date range with error handling.
+
+        Returns the number of classes whose price changed, or None on error.
+        """
+        if rates is None:
+            rates = self.load_rates()
+
+        def reprice(classes_df):
+            # Keep the recorded price of classes no rule covers
+            prices = rates.price(classes_df)
+            return np.where(np.isnan(prices), classes_df['price'], prices)
+
+        try:
+            return self.storage.update_prices(reprice, start, end)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error repricing classes: {str(e)}")
+            return None
+
+    @instrumentation.timed('data_manager.get_rollups')
+    def get_rollups(self, start=None, end=None, scheduled=False):
+        """Load daily totals by class type and school for an inclusive date range, with error handling.
+
+        With `scheduled` the upcoming classes of recurring series in the
+        range are counted too; that needs an `end` date.
+        """
+        try:
+            rollups = aggregates.get_rollups(self.storage).range(start, end)
+            if scheduled:
+                upcoming = self._expand_series(start, end)
+                if not upcoming.empty:
+                    rollups = aggregates.combine(
+                        [rollups, aggregates.Rollups.from_classes(upcoming).range()], ['date', 'class_type', 'school_id']
+                    )
+            return rollups
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error loading class totals: {str(e)}")
+            return pd.DataFrame(columns=ROLLUP_COLUMNS)
 
+    @instrumentation.timed('data_manager.get_period_totals')
+    def get_period_totals(self, start=None, end=None, period='month', by=('school_id',), scheduled=False):
+        """Load totals per day, week, month or quarter and the `by` columns for an inclusive date range, with error handling.
+
+        With `scheduled` the upcoming classes of recurring series in the
+        range are counted too; that needs an `end` date.
+        """
+        try:
+            totals = aggregates.get_rollups(self.storage).totals(start, end, period, by)
+            if scheduled:
+                upcoming = self._expand_series(start, end)
+                if not upcoming.empty:
+                    totals = aggregates.combine(
+                        [totals, aggregates.Rollups.from_classes(upcoming).totals(start, end, period, by)],
+                        ([] if period is None else ['period']) + list(by)
+                    )
+            return totals
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error loading class totals: {str(e)}")
+            return pd.DataFrame(columns=([] if period is None else ['period']) + list(by) + aggregates.MEASURES)
+
+    def export_invoices(self, school_ids, start, end, kinds=('invoice',), formats=('pdf',)):
+        """Start rendering invoices or statements per school and month in the background, with error handling.
+
+        Returns an invoices.ExportJob to poll for progress and files, or None.
+        """
+        import invoices
+
+        try:
+            return invoices.start_export(self.storage, school_ids, invoices.months_between(start, end), kinds, formats)
+        except Exception as e:
+            st.error(f"Error starting export: {str(e)}")
+            return None
+
+    @instrumentation.timed('data_manager.find_conflicts')
+    def find_conflicts(self, date, time, duration):
+        """Return the classes overlapping a class on `date` at `time` lasting `duration` hours, with error handling."""
+        try:
+            return schedule.get_index(self.storage).conflicts(date, time, duration)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error checking the schedule: {str(e)}")
+            return pd.DataFrame(columns=schedule.CONFLICT_COLUMNS)
+
+    @instrumentation.timed('data_manager.find_free_slots')
+    def find_free_slots(self, date, duration=0.5):
+        """Return the calendar slots on `date`, as minutes since midnight, with room for a class of `duration` hours, with error handling."""
+        try:
+            return schedule.get_index(self.storage).free_slots(date, duration)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error checking the schedule: {str(e)}")
+            return []
+
+    @instrumentation.timed('data_manager.load_series')
+    def load_series(self):
+        """Load the recurring class series with error handling."""
+        try:
+            return recurring.load_series(self.series_file)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error loading recurring classes: {str(e)}")
+            return recurring.SeriesTable()
+
+    @instrumentation.timed('data_manager.save_series')
+    def save_series(self, series_data):
+        """Save a weekly recurring class as one record, with error handling.
+
+        `series_data` has the class values plus `start`, an optional `end`,
+        `weekdays`, `interval` in weeks and `exceptions`. Returns the saved
+        record, or None if it could not be saved.
+        """
+        try:
+            with recurring.editing(self.series_file) as series:
+                return series.add(series_data)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error saving recurring class: {str(e)}")
+            return None
+
+    @instrumentation.timed('data_manager.update_series')
+    def update_series(self, series_id, changes):
+        """Change a recurring class from its next unrecorded occurrence on, with error handling.
+
+        Returns the updated record, or None if it could not be saved.
+        """
+        try:
+            with recurring.editing(self.series_file) as series:
+                return series.update(series_id, changes)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error updating recurring class: {str(e)}")
+            return None
+
+    @instrumentation.timed('data_manager.delete_series')
+    def delete_series(self, series_id):
+        """Stop a recurring class, keeping the classes already recorded from it, with error handling."""
+        try:
+            with recurring.editing(self.series_file) as series:
+                series.remove(series_id)
+            return True
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error deleting recurring class: {str(e)}")
+            return False
+
+    def _expand_series(self, start, end):
+        return self.load_series().occurrences(start, end, self.load_rates())
+
+    @instrumentation.timed('data_manager.get_occurrences')
+    def get_occurrences(self, start, end):
+        """Expand the upcoming classes of recurring series in an inclusive date range, priced at the current rates, with error handling."""
+        try:
+            return self._expand_series(start, end)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error loading recurring classes: {str(e)}")
+            return pd.DataFrame(columns=self.classes_columns + ['series_id'])
+
+    @instrumentation.timed('data_manager.record_series_classes')
+    def record_series_classes(self, through=None):
+        """Save the occurrences of recurring series up to `through` (today) as classes, with error handling.
+
+        The classes are saved in one append and each series remembers how
+        far it has been recorded, so no occurrence is saved twice. Returns
+        the number of classes saved, or None on error.
+        """
+        try:
+            through = pd.Timestamp(through if through is not None else datetime.now().date())
+            with recurring.editing(self.series_file) as series:
+                taught = series.occurrences(None, through, self.load_rates())
+                rows = taught.assign(
+                    date=taught['date'].dt.strftime('%Y-%m-%d'),
+                    time=format_time(taught['time']),
+                    class_type=taught['class_type'].astype(str),
+                    school_id=taught['school_id'].astype('int64'),
+                )[self.classes_columns].to_dict('records')
+                if rows and not self.save_classes(rows):
+                    return None
+                series.mark_recorded(through)
+            return len(rows)
+        except Exception as e:
+            instrumentation.mark_error(e)
+            st.error(f"Error recording recurring classes: {str(e)}")
+            return None
+
+    def check_rollups(self):
+        """Compare the rollups against a full recompute and return the rows that disagree."""
+        return aggregates.get_rollups(self.storage).compare(self.storage.load_classes())
+
+    @instrumentation.timed('data_manager.get_weekly_stats')
     def get_weekly_stats(self):
         """Get weekly statistics with error handling."""
         try:
-            classes_df = self.load_classes()
-            if len(classes_df) == 0:
-                return 0, 0  # Return total_classes and total_earnings
-
-            current_week = datetime.now().isocalendar()[1]
-            classes_df['date'] = pd.to_datetime(classes_df['date'])
-            weekly_classes = classes_df[classes_df['date'].dt.isocalendar().week == current_week]
+            today = datetime.now().date()
+            start_of_week = today - timedelta(days=today.weekday())
+            weekly = aggregates.get_rollups(self.storage).range(start_of_week, start_of_week + timedelta(days=6))
+            # Classes of recurring series this week that are not recorded yet
+            upcoming = self._expand_series(start_of_week, start_of_week + timedelta(days=6))
 
-            total_classes = len(weekly_classes)
-            total_earnings = weekly_classes['price'].sum()
+            total_classes = int(weekly['classes'].sum()) + len(upcoming)
+            total_earnings = weekly['earnings'].sum() + float(upcoming['price'].sum())
             return total_classes, total_earnings
         except Exception as e:
+            instrumentation.mark_error(e)
             st.error(f"Error calculating weekly stats: {str(e)}")
-            return 0, 0
\ No newline at end of file
+            return 0, 0
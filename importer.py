@@ -0,0 +1,213 @@
+import pandas as pd
+import numpy as np
+import argparse
+import re
+from contextlib import ExitStack
+from datetime import datetime
+
+CLASS_TYPES = ['Standard', 'Demo']
+MIN_DURATION = 0.5
+MAX_DURATION = 8.0
+
+# Only the first few rejected rows are kept so memory stays bounded
+MAX_ERRORS = 100
+
+_ICS_DURATION = re.compile(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?')
+
+
+def _school_lookup(data_manager):
+    """Map school names and IDs to school IDs, built once per import."""
+    registry = data_manager.get_schools()
+    # IDs are matched as text since hashed IDs don't survive a float round trip
+    return registry.by_name, registry.by_id
+
+
+def prepare_chunk(chunk, data_manager, schools_by_name, schools_by_id, rates=None):
+    """Validate and price a chunk of raw class rows.
+
+    Returns the rows ready for save_classes and a frame of rejected rows
+    with the reason each was rejected.
+    """
+    missing = [column for column in ('date', 'time', 'duration', 'class_type') if column not in chunk]
+    if 'school' not in chunk and 'school_id' not in chunk:
+        missing.append('school or school_id')
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    dates = pd.to_datetime(chunk['date'], format='ISO8601', errors='coerce')
+    times = pd.to_datetime(chunk['time'].astype(str).str.strip(), format='%H:%M', errors='coerce')
+    durations = pd.to_numeric(chunk['duration'], errors='coerce')
+    class_types = chunk['class_type'].astype(str).str.strip().str.title()
+
+    if 'school_id' in chunk:
+        school_keys, schools = chunk['school_id'].astype(str).str.strip(), schools_by_id
+    else:
+        school_keys, schools = chunk['school'].astype(str).str.strip().str.lower(), schools_by_name
+
+    reasons = np.select(
+        [
+            dates.isna(),
+            times.isna(),
+            durations.isna() | (durations < MIN_DURATION) | (durations > MAX_DURATION),
+            ~class_types.isin(CLASS_TYPES),
+            ~school_keys.isin(schools.keys()),
+        ],
+        [
+            'invalid date',
+            'invalid time',
+            f"duration must be between {MIN_DURATION} and {MAX_DURATION} hours",
+            f"class type must be one of {', '.join(CLASS_TYPES)}",
+            'unknown school',
+        ],
+        default=''
+    )
+    valid = reasons == ''
+
+    notes = chunk['notes'] if 'notes' in chunk else pd.Series('', index=chunk.index)
+    # Only valid keys are mapped so hashed IDs never pass through a float column
+    school_ids = school_keys[valid].map(schools)
+    rows = pd.DataFrame({
+        'date': dates[valid].dt.strftime('%Y-%m-%d'),
+        'time': times[valid].dt.strftime('%H:%M'),
+        'duration': durations[valid],
+        'class_type': class_types[valid],
+        'school_id': school_ids,
+        'price': data_manager.calculate_class_prices(
+            durations[valid], class_types[valid], school_ids, dates[valid], rates
+        ),
+        'notes': notes[valid].fillna(''),
+    })
+    rejected = chunk.loc[~valid].assign(reason=reasons[~valid])
+    return rows, rejected
+
+
+def read_csv_chunks(source, chunksize):
+    """Stream a classes CSV in chunks of raw rows."""
+    return pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=False)
+
+
+def _unfold(lines):
+    """Join iCalendar continuation lines onto the line they continue."""
+    current = None
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _ics_datetime(value):
+    """Parse a DTSTART/DTEND value, ignoring any time zone."""
+    value = value.rstrip('Z')
+    if 'T' in value:
+        return datetime.strptime(value[:15], '%Y%m%dT%H%M%S')
+    return datetime.strptime(value[:8], '%Y%m%d')
+
+
+def _ics_hours(value):
+    """Convert an iCalendar DURATION such as PT1H30M to hours."""
+    match = _ICS_DURATION.fullmatch(value)
+    if match is None:
+        return None
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return days * 24 + hours + minutes / 60 + seconds / 3600
+
+
+def _ics_event(fields):
+    """Turn the fields of one VEVENT into a raw class row."""
+    start = _ics_datetime(fields['DTSTART']) if 'DTSTART' in fields else None
+    hours = None
+    if start is not None and 'DTEND' in fields:
+        hours = (_ics_datetime(fields['DTEND']) - start).total_seconds() / 3600
+    elif 'DURATION' in fields:
+        hours = _ics_hours(fields['DURATION'])
+    summary = fields.get('SUMMARY', '')
+    return {
+        'date': start.strftime('%Y-%m-%d') if start else '',
+        'time': start.strftime('%H:%M') if start else '',
+        'duration': hours if hours is not None else '',
+        # Events titled or tagged as demos are Demo classes, everything else Standard
+        'class_type': 'Demo' if 'demo' in (summary + fields.get('CATEGORIES', '')).lower() else 'Standard',
+        'school': fields.get('LOCATION', ''),
+        'notes': fields.get('DESCRIPTION', '').replace('\\n', '\n').replace('\\,', ','),
+    }
+
+
+def read_ics_chunks(source, chunksize):
+    """Stream the VEVENTs of an iCalendar file in chunks of raw class rows."""
+    rows = []
+    fields = None
+    for line in _unfold(source):
+        if line == 'BEGIN:VEVENT':
+            fields = {}
+        elif line == 'END:VEVENT' and fields is not None:
+            try:
+                rows.append(_ics_event(fields))
+            except ValueError:
+                rows.append({'date': '', 'time': '', 'duration': '', 'class_type': '', 'school': '', 'notes': ''})
+            fields = None
+            if len(rows) >= chunksize:
+                yield pd.DataFrame(rows)
+                rows = []
+        elif fields is not None and ':' in line:
+            name, value = line.split(':', 1)
+            # Drop parameters such as DTSTART;TZID=Africa/Nairobi
+            fields[name.split(';', 1)[0].upper()] = value
+    if rows:
+        yield pd.DataFrame(rows)
+
+
+def import_classes(data_manager, source, file_format='csv', chunksize=10_000, progress=None):
+    """Import classes from a CSV or iCalendar file, committing one batch per chunk.
+
+    `source` is a path or a binary file object. `progress` is called with the
+    running totals after each batch. Returns the number of imported and
+    rejected rows and the first rejected rows.
+    """
+    schools_by_name, schools_by_id = _school_lookup(data_manager)
+    rates = data_manager.load_rates()
+    result = {'imported': 0, 'rejected': 0, 'errors': []}
+    # Files opened here are closed when the import ends, even if it fails
+    with ExitStack() as stack:
+        if file_format == 'ics':
+            if isinstance(source, str):
+                source = stack.enter_context(open(source, 'rb'))
+            chunks = read_ics_chunks(source, chunksize)
+        else:
+            chunks = stack.enter_context(read_csv_chunks(source, chunksize))
+
+        for chunk in chunks:
+            rows, rejected = prepare_chunk(chunk, data_manager, schools_by_name, schools_by_id, rates)
+            if not rows.empty and not data_manager.save_classes(rows.to_dict('records')):
+                raise IOError("Saving a batch of imported classes failed")
+            result['imported'] += len(rows)
+            result['rejected'] += len(rejected)
+            if len(result['errors']) < MAX_ERRORS:
+                result['errors'].extend(rejected.head(MAX_ERRORS - len(result['errors'])).to_dict('records'))
+            if progress is not None:
+                progress(result)
+    return result
+
+
+if __name__ == '__main__':
+    from tenants import get_data_manager
+
+    parser = argparse.ArgumentParser(description="Bulk import classes from a CSV or iCalendar file.")
+    parser.add_argument('file')
+    parser.add_argument('--format', choices=['csv', 'ics'], help="defaults to the file extension")
+    parser.add_argument('--chunksize', type=int, default=10_000)
+    parser.add_argument('--tenant', help="educator whose data directory to import into")
+    args = parser.parse_args()
+
+    file_format = args.format or ('ics' if args.file.lower().endswith('.ics') else 'csv')
+    result = import_classes(get_data_manager(args.tenant), args.file, file_format, args.chunksize)
+    print(f"Imported {result['imported']} classes, rejected {result['rejected']}")
+    for error in result['errors']:
+        print(f"  {error['reason']}: {error}")
@@ -0,0 +1,242 @@
+import numpy as np
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Timings are only recorded when TRACKER_INSTRUMENT=1 or after enable();
+# while disabled, an instrumented call costs one flag check
+_enabled = os.environ.get('TRACKER_INSTRUMENT', '') == '1'
+
+# The most recent operations, oldest dropped first
+BUFFER_SIZE = int(os.environ.get('TRACKER_INSTRUMENT_BUFFER', 10_000))
+_records = deque(maxlen=BUFFER_SIZE)
+
+# Running totals per operation since the process started, for counters
+_totals = {}
+_totals_lock = threading.Lock()
+
+# Spans open on each thread, innermost last
+_local = threading.local()
+
+RECORD_FIELDS = ['timestamp', 'operation', 'seconds', 'rows', 'bytes', 'error']
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def clear():
+    """Drop every recorded operation and total."""
+    _records.clear()
+    with _totals_lock:
+        _totals.clear()
+
+
+class _Span:
+    """One timed operation; code running inside it can add rows and bytes."""
+
+    __slots__ = ('operation', 'rows', 'bytes', 'error', 'start')
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.rows = 0
+        self.bytes = 0
+        self.error = None
+
+    def __enter__(self):
+        stack = getattr(_local, 'spans', None)
+        if stack is None:
+            stack = _local.spans = []
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        _local.spans.pop()
+        if exc_type is not None and self.error is None:
+            self.error = exc_type.__name__
+        _record(self.operation, seconds, self.rows, self.bytes, self.error)
+        return False
+
+
+class _NoSpan:
+    """Stand-in returned while instrumentation is disabled."""
+
+    __slots__ = ()
+    rows = bytes = 0
+    error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(operation):
+    """Context manager timing a block of code as `operation`."""
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(operation)
+
+
+def timed(operation):
+    """Decorator timing every call of a function as `operation`.
+
+    Rows default to the length of a returned DataFrame; the function can
+    report rows, bytes and handled errors with add_rows, add_bytes and
+    mark_error instead.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(operation) as current:
+                result = fn(*args, **kwargs)
+                if not current.rows and hasattr(result, 'shape') and hasattr(result, 'columns'):
+                    current.rows = len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def _current():
+    stack = getattr(_local, 'spans', None)
+    return stack[-1] if stack else None
+
+
+def add_rows(rows):
+    """Count rows touched by the innermost open span."""
+    if _enabled:
+        current = _current()
+        if current is not None:
+            current.rows += int(rows)
+
+
+def add_bytes(size):
+    """Count bytes read by the innermost open span."""
+    if _enabled:
+        current = _current()
+        if current is not None:
+            current.bytes += int(size)
+
+
+def mark_error(exc):
+    """Flag the innermost open span as failed by an exception that was handled."""
+    if _enabled:
+        current = _current()
+        if current is not None:
+            current.error = type(exc).__name__
+
+
+def _record(operation, seconds, rows, size, error):
+    _records.append((time.time(), operation, seconds, rows, size, error))
+    with _totals_lock:
+        totals = _totals.get(operation)
+        if totals is None:
+            totals = _totals[operation] = [0, 0.0, 0, 0, 0]
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] += rows
+        totals[3] += size
+        totals[4] += error is not None
+
+
+def records():
+    """Return the buffered operations, oldest first, as dicts."""
+    return [dict(zip(RECORD_FIELDS, record)) for record in list(_records)]
+
+
+def summary():
+    """Return per-operation timing percentiles over the buffered operations.
+
+    Each entry has the operation count, p50/p95/max in milliseconds, rows,
+    bytes and errors, sorted by total time spent.
+    """
+    by_operation = {}
+    for _, operation, seconds, rows, size, error in list(_records):
+        entry = by_operation.setdefault(operation, ([], [0, 0, 0]))
+        entry[0].append(seconds)
+        entry[1][0] += rows
+        entry[1][1] += size
+        entry[1][2] += error is not None
+
+    result = []
+    for operation, (seconds, (rows, size, errors)) in by_operation.items():
+        seconds = np.array(seconds) * 1000
+        p50, p95 = np.percentile(seconds, [50, 95])
+        result.append({
+            'operation': operation,
+            'count': len(seconds),
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'max_ms': float(seconds.max()),
+            'total_ms': float(seconds.sum()),
+            'rows': rows,
+            'bytes': size,
+            'errors': errors,
+        })
+    return sorted(result, key=lambda entry: entry['total_ms'], reverse=True)
+
+
+def to_json():
+    """Export the summary and the buffered operations as a JSON document."""
+    return json.dumps({'enabled': _enabled, 'summary': summary(), 'records': records()})
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus():
+    """Export the metrics in the Prometheus text exposition format.
+
+    Quantiles cover the buffered operations; counts and sums cover
+    everything recorded since the process started or clear() was called.
+    """
+    with _totals_lock:
+        totals = {operation: list(values) for operation, values in _totals.items()}
+    quantiles = {entry['operation']: entry for entry in summary()}
+
+    lines = [
+        '# HELP tracker_operation_seconds Wall time of instrumented operations.',
+        '# TYPE tracker_operation_seconds summary',
+    ]
+    for operation, (count, seconds, _, _, _) in sorted(totals.items()):
+        label = f'operation="{_label(operation)}"'
+        if operation in quantiles:
+            lines.append(f'tracker_operation_seconds{{{label},quantile="0.5"}} {quantiles[operation]["p50_ms"] / 1000:.6f}')
+            lines.append(f'tracker_operation_seconds{{{label},quantile="0.95"}} {quantiles[operation]["p95_ms"] / 1000:.6f}')
+        lines.append(f'tracker_operation_seconds_sum{{{label}}} {seconds:.6f}')
+        lines.append(f'tracker_operation_seconds_count{{{label}}} {count}')
+    for name, index, help_text in (
+        ('tracker_operation_rows_total', 2, 'Rows touched by instrumented operations.'),
+        ('tracker_operation_bytes_total', 3, 'Bytes read by instrumented operations.'),
+        ('tracker_operation_errors_total', 4, 'Instrumented operations that failed.'),
+    ):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for operation, values in sorted(totals.items()):
+            lines.append(f'{name}{{operation="{_label(operation)}"}} {values[index]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,315 @@
+import pandas as pd
+import numpy as np
+import io
+import itertools
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import xlsxwriter
+from fpdf import FPDF
+
+import instrumentation
+import schools
+
+KINDS = {'invoice': 'Invoice', 'statement': 'Earnings Statement'}
+FORMATS = ['xlsx', 'pdf']
+
+# Worker processes for rendering; 0 renders on the export thread instead, the
+# default on a single core, where a pool only adds process start-up and pickling
+WORKERS = int(os.environ.get('TRACKER_EXPORT_WORKERS', os.cpu_count() if (os.cpu_count() or 1) > 1 else 0))
+
+# Finished files shared by every session, keyed on the data version they were built from
+MAX_CACHED_FILES = 5_000
+_artifacts = OrderedDict()
+_artifacts_lock = threading.Lock()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the shared worker pool, starting it on first use.
+
+    Workers are spawned rather than forked since the Streamlit server is
+    multi-threaded.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _money(value):
+    return f"ksh.{value:,.2f}"
+
+
+def _slug(name):
+    return re.sub(r'[^a-z0-9]+', '-', str(name).lower()).strip('-') or 'school'
+
+
+def _document(kind, school, month, classes):
+    """Lay out one invoice or statement as heading lines, a table and total lines."""
+    period = pd.Period(month, 'M')
+    heading = [
+        f"{KINDS[kind]} - {school['name']}",
+        f"Period: {period.strftime('%B %Y')}",
+    ]
+    if kind == 'invoice':
+        heading.append(f"Invoice number: INV-{school['school_id']}-{period.strftime('%Y%m')}")
+    for field in ('address', 'contact'):
+        if isinstance(school.get(field), str) and school[field].strip():
+            heading.append(school[field].strip().replace('\n', ', '))
+
+    classes = classes.sort_values(['date', 'time'], kind='stable')
+    if kind == 'invoice':
+        columns = ['Date', 'Time', 'Class Type', 'Hours', 'Amount']
+        minutes = classes['time'].to_numpy(dtype='int64')
+        rows = list(zip(
+            classes['date'].dt.strftime('%Y-%m-%d'),
+            [f"{m // 60:02d}:{m % 60:02d}" for m in minutes],
+            classes['class_type'].astype(str),
+            classes['duration'].astype(float).round(2),
+            classes['price'].astype(float).round(2),
+        ))
+    else:
+        columns = ['Week Starting', 'Class Type', 'Classes', 'Hours', 'Earnings']
+        weeks = classes['date'] - pd.to_timedelta(classes['date'].dt.weekday, unit='D')
+        grouped = classes.astype({'duration': float, 'price': float}).groupby(
+            [weeks.dt.strftime('%Y-%m-%d'), classes['class_type'].astype(str)]
+        ).agg(classes=('price', 'size'), hours=('duration', 'sum'), earnings=('price', 'sum'))
+        rows = [(week, class_type, int(n), round(h, 2), round(e, 2)) for (week, class_type), (n, h, e) in grouped.iterrows()]
+
+    total = float(classes['price'].astype(float).sum())
+    footer = [
+        f"Classes: {len(classes)}    Hours: {float(classes['duration'].astype(float).sum()):,.1f}",
+        f"Total due: {_money(total)}" if kind == 'invoice' else f"Total earnings: {_money(total)}",
+    ]
+    return heading, columns, rows, footer
+
+
+def _xlsx(title, heading, columns, rows, footer):
+    """Write a single-sheet XLSX workbook; numbers stay numbers so totals can be re-checked in Excel."""
+    buffer = io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {'in_memory': True})
+    bold = workbook.add_format({'bold': True})
+    sheet = workbook.add_worksheet(title[:31])
+    row_number = itertools.count()
+    for line in heading:
+        sheet.write_string(next(row_number), 0, line, bold)
+    next(row_number)
+    sheet.write_row(next(row_number), 0, columns, bold)
+    for row in rows:
+        sheet.write_row(next(row_number), 0, row)
+    next(row_number)
+    for line in footer:
+        sheet.write_string(next(row_number), 0, line, bold)
+    workbook.close()
+    return buffer.getvalue()
+
+
+def _pdf(title, heading, columns, rows, footer):
+    """Write a plain A4 PDF in Helvetica, continuing the table over as many pages as it needs."""
+    def text(value):
+        # The core fonts only cover Latin-1
+        return str(value).encode('latin-1', 'replace').decode('latin-1')
+
+    def table_cells(values):
+        positions = np.cumsum([50, 110, 70, 130, 80])
+        return [(x, f"{value:,.2f}" if isinstance(value, float) else value) for x, value in zip(positions, values)]
+
+    header = table_cells(columns)
+    lines = [('B', 14, [(50, heading[0])], False)]
+    lines += [('', 10, [(50, line)], False) for line in heading[1:]]
+    lines += [None, ('B', 10, header, False)]
+    lines += [('', 10, table_cells(row), True) for row in rows]
+    lines += [None] + [('B', 10, [(50, line)], False) for line in footer]
+
+    pdf = FPDF(unit='pt', format='A4')
+    pdf.set_title(text(title))
+    pdf.add_page()
+    # y counts down from the top of the page, as PDF coordinates count up from the bottom
+    y = 42
+    for line in lines:
+        if line is None:
+            y += 10
+            continue
+        style, size, cells, in_table = line
+        if y > 792:
+            pdf.add_page()
+            y = 42
+            # Repeat the column headings on every page the table continues on
+            if in_table:
+                pdf.set_font('Helvetica', 'B', 10)
+                for x, value in header:
+                    pdf.text(x, y, text(value))
+                y += 14
+        pdf.set_font('Helvetica', style, size)
+        for x, value in cells:
+            pdf.text(x, y, text(value))
+        y += size + 4
+    return bytes(pdf.output())
+
+
+def render(kind, file_format, school, month, classes):
+    """Render one school's invoice or statement for a month ('YYYY-MM') as XLSX or PDF bytes."""
+    heading, columns, rows, footer = _document(kind, school, month, classes)
+    title = f"{KINDS[kind]} {month}"
+    if file_format == 'xlsx':
+        return _xlsx(title, heading, columns, rows, footer)
+    if file_format == 'pdf':
+        return _pdf(title, heading, columns, rows, footer)
+    raise ValueError(f"Unknown export format: {file_format}")
+
+
+def file_name(kind, file_format, school, month):
+    return f"{kind}-{_slug(school['name'])}-{month}.{file_format}"
+
+
+def _render_school(school, classes, months, kinds, formats):
+    """Render every requested file for one school; runs in a worker process."""
+    by_month = dict(tuple(classes.groupby(classes['date'].dt.strftime('%Y-%m'))))
+    files = {}
+    for month, kind, file_format in itertools.product(months, kinds, formats):
+        if month in by_month:
+            files[(month, kind, file_format)] = render(kind, file_format, school, month, by_month[month])
+    return files
+
+
+class ExportJob:
+    """A batch of invoices and statements rendered in the background.
+
+    `done` and `total` count schools; `files` maps file names to bytes and
+    fills in as schools finish.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.done = 0
+        self.files = {}
+        self.cached = 0
+        self.error = None
+        self.finished = threading.Event()
+
+    @property
+    def progress(self):
+        return 1.0 if not self.total else self.done / self.total
+
+    def zip_bytes(self):
+        """Bundle every finished file into one zip archive."""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, content in sorted(self.files.items()):
+                archive.writestr(name, content)
+        return buffer.getvalue()
+
+
+def _cache_get(key):
+    with _artifacts_lock:
+        content = _artifacts.get(key)
+        if content is not None:
+            _artifacts.move_to_end(key)
+        return content
+
+
+def _cache_put(key, content):
+    with _artifacts_lock:
+        _artifacts[key] = content
+        _artifacts.move_to_end(key)
+        while len(_artifacts) > MAX_CACHED_FILES:
+            _artifacts.popitem(last=False)
+
+
+def forget(storage):
+    """Drop the cached files rendered from a storage backend."""
+    key = storage.cache_key()
+    with _artifacts_lock:
+        for artifact in [artifact for artifact in _artifacts if artifact[0][0] == key]:
+            del _artifacts[artifact]
+
+
+def _run(job, storage, school_ids, months, kinds, formats, workers):
+    try:
+        with instrumentation.span('invoices.export') as span:
+            # Files are reused for as long as neither the classes nor the schools change
+            version = (storage.cache_key(), storage.signature(), storage.schools_signature())
+            registry = schools.get_registry(storage)
+            first, last = pd.Period(months[0], 'M'), pd.Period(months[-1], 'M')
+            classes = storage.query_classes(
+                first.start_time, last.end_time.normalize(),
+                columns=['date', 'time', 'duration', 'class_type', 'school_id', 'price']
+            )
+            span.rows = len(classes)
+            by_school = dict(tuple(classes.groupby(classes['school_id'].astype(str), observed=True)))
+
+            pending = []
+            for school_id in school_ids:
+                school = registry.get(school_id)
+                school_classes = by_school.get(str(school_id))
+                if school is None or school_classes is None:
+                    continue
+                wanted = [(month, kind, file_format) for month, kind, file_format in itertools.product(months, kinds, formats)]
+                cached = {item: _cache_get((version, str(school_id)) + item) for item in wanted}
+                for (month, kind, file_format), content in cached.items():
+                    if content is not None:
+                        job.files[file_name(kind, file_format, school, month)] = content
+                        job.cached += 1
+                missing_months = sorted({month for (month, _, _), content in cached.items() if content is None})
+                if missing_months:
+                    pending.append((school, school_classes, missing_months))
+            job.total = len(pending)
+
+            def finish(school, files):
+                for (month, kind, file_format), content in files.items():
+                    _cache_put((version, str(school['school_id']), month, kind, file_format), content)
+                    job.files[file_name(kind, file_format, school, month)] = content
+                job.done += 1
+
+            if workers == 0 or (workers is None and WORKERS == 0):
+                for school, school_classes, missing_months in pending:
+                    finish(school, _render_school(school, school_classes, missing_months, kinds, formats))
+            else:
+                executor = _get_executor() if workers is None else ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+                )
+                try:
+                    futures = {
+                        executor.submit(_render_school, school, school_classes, missing_months, kinds, formats): school
+                        for school, school_classes, missing_months in pending
+                    }
+                    for future in as_completed(futures):
+                        finish(futures[future], future.result())
+                finally:
+                    if workers is not None:
+                        executor.shutdown()
+            span.bytes = sum(len(content) for content in job.files.values())
+    except Exception as e:
+        job.error = str(e)
+    finally:
+        job.finished.set()
+
+
+def months_between(start, end):
+    """Return the months from `start` to `end` inclusive as 'YYYY-MM' strings."""
+    return [str(month) for month in pd.period_range(pd.Timestamp(start), pd.Timestamp(end), freq='M')]
+
+
+def start_export(storage, school_ids, months, kinds=('invoice',), formats=('pdf',), workers=None):
+    """Render files for every school and month on a background thread and return the job right away.
+
+    `workers` None uses the shared process pool (or renders serially when
+    WORKERS is 0), 0 renders serially on the background thread, and any
+    other number a pool of that size.
+    """
+    job = ExportJob()
+    thread = threading.Thread(
+        target=_run, args=(job, storage, list(school_ids), sorted(months), list(kinds), list(formats), workers),
+        daemon=True
+    )
+    thread.start()
+    return job
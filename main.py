@@ -1,7 +1,8 @@
 import streamlit as st
-from data_manager import DataManager
-import plotly.express as px
-import pandas as pd
+from data_manager import format_time
+import instrumentation
+import tenants
+import changes
 from datetime import datetime, timedelta
 
 st.set_page_config(
@@ -11,9 +12,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize session state
-if 'data_manager' not in st.session_state:
-    st.session_state.data_manager = DataManager()
+# Initialize session state; sessions of the same educator share one DataManager
+st.session_state.data_manager = tenants.session_data_manager()
 
 # Sidebar with navigation instructions
 with st.sidebar:
@@ -27,6 +27,9 @@ with st.sidebar:
     - 💰 Track finances
     """)
 
+# Rerun when classes are saved from other sessions, if the sidebar toggle is on
+changes.auto_refresh()
+
 # Main dashboard
 st.title("🎓 STEM Educator Dashboard")
 st.markdown("""
@@ -76,43 +79,50 @@ with col3:
 
 # Recent Activity
 st.subheader("📚 Recent Activity")
-classes_df = st.session_state.data_manager.load_classes()
-
-if not classes_df.empty:
-    # Convert date to datetime
-    classes_df['date'] = pd.to_datetime(classes_df['date'])
-
-    # Last 7 days statistics
-    today = datetime.now()
-    last_week = today - timedelta(days=7)
-    recent_classes = classes_df[classes_df['date'] >= last_week]
-
-    # Create activity chart
-    fig = px.bar(
-        recent_classes,
-        x='date',
-        y='price',
-        color='class_type',
-        title='Last 7 Days Activity',
-        labels={'price': 'Earnings (ksh.)', 'date': 'Date', 'class_type': 'Class Type'},
-        color_discrete_map={'Demo': '#FFA500', 'Standard': '#2E8B57'}
-    )
-    fig.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        margin=dict(t=50, l=0, r=0, b=0)
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Recent classes table
-    st.subheader("📋 Recent Classes")
-    recent_df = classes_df.sort_values('date', ascending=False).head(5)
-    recent_df['date'] = recent_df['date'].dt.strftime('%Y-%m-%d')
-    st.dataframe(
-        recent_df[['date', 'time', 'class_type', 'duration', 'price']],
-        use_container_width=True,
-        hide_index=True
+if st.session_state.data_manager.get_class_date_range() is not None:
+    # Only the selected tab runs, so the chart is built when it is opened
+    recent_tab, activity_tab = st.tabs(
+        ["📋 Recent Classes", "📈 Last 7 Days Activity"], key="dashboard_tab", on_change="rerun"
     )
+
+    if recent_tab.open:
+        with recent_tab:
+            recent_df, _ = st.session_state.data_manager.query_page(limit=5)
+            recent_df['date'] = recent_df['date'].dt.strftime('%Y-%m-%d')
+            recent_df['time'] = format_time(recent_df['time'])
+            st.dataframe(
+                recent_df[['date', 'time', 'class_type', 'duration', 'price']],
+                use_container_width=True,
+                hide_index=True
+            )
+
+    if activity_tab.open:
+        with activity_tab:
+            import plotly.express as px
+
+            with instrumentation.span('chart.dashboard_activity'):
+                # Last 7 days statistics
+                today = datetime.now()
+                last_week = today - timedelta(days=7)
+                recent_totals = st.session_state.data_manager.get_rollups(start=last_week)
+                recent_totals = recent_totals.groupby(['date', 'class_type'], as_index=False)['earnings'].sum()
+
+                # Create activity chart
+                fig = px.bar(
+                    recent_totals,
+                    x='date',
+                    y='earnings',
+                    color='class_type',
+                    title='Last 7 Days Activity',
+                    labels={'earnings': 'Earnings (ksh.)', 'date': 'Date', 'class_type': 'Class Type'},
+                    color_discrete_map={'Demo': '#FFA500', 'Standard': '#2E8B57'}
+                )
+                fig.update_layout(
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    margin=dict(t=50, l=0, r=0, b=0)
+                )
+                st.plotly_chart(fig, use_container_width=True)
 else:
     st.info("👋 Welcome! Start by adding your first class in the Class Management page.")
 
@@ -1,12 +1,14 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime, timedelta
 import data_manager as data_manager 
+import tenants
+from recurring import WEEKDAYS
+from class_table import show_class_page
 
 st.set_page_config(page_title="Class Management", page_icon="📚", layout="wide")
 
-if "data_manager" not in st.session_state:
-    st.session_state.data_manager = data_manager.DataManager()
+# Sessions of the same educator share one DataManager
+st.session_state.data_manager = tenants.session_data_manager()
 
 # Page header with description
 st.title("📚 Class Management")
@@ -14,11 +16,47 @@ st.markdown("""
 Manage your classes efficiently. Add new classes, view existing ones, and keep track of your schedule.
 """)
 
-# Initialize tabs for better organization
-tab1, tab2 = st.tabs(["Add New Class", "View Classes"])
+# Initialize tabs for better organization; only the selected tab runs
+tab1, tab2, tab3 = st.tabs(["Add New Class", "View Classes", "Recurring Classes"], key="class_tab", on_change="rerun")
 
-with tab1:
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def show_conflicts(conflicts, date, duration):
+    """Warn about the classes a new class overlaps and suggest free slots that day."""
+    school_names = st.session_state.data_manager.get_school_names(conflicts['school_id'], default='Unknown school')
+    lines = [
+        f"- {data_manager.format_time(start)}–{data_manager.format_time(end % 1440)} {class_type} class at {name}"
+        for start, end, class_type, name in zip(conflicts['time'], conflicts['end'], conflicts['class_type'], school_names)
+    ]
+    st.warning("⚠️ This class overlaps:\n" + "\n".join(lines))
+
+    free_slots = st.session_state.data_manager.find_free_slots(date, duration)
+    if free_slots:
+        st.info("🕒 Free slots that day: " + ", ".join(data_manager.format_time(slot) for slot in free_slots))
+    else:
+        st.info("No free slot that day fits a class this long.")
+
+
+def show_queued_saves():
+    """Report classes from this session that the background writer has finished with."""
+    tickets = st.session_state.get("queued_classes", [])
+    for ticket in tickets:
+        if ticket.done.is_set():
+            row = ticket.rows[0]
+            if ticket.error:
+                st.error(f"Could not save the class on {row['date']} at {row['time']}: {ticket.error}")
+            else:
+                st.toast(f"✅ Class on {row['date']} at {row['time']} saved")
+    st.session_state.queued_classes = [ticket for ticket in tickets if not ticket.done.is_set()]
+    if st.session_state.queued_classes:
+        st.caption(f"⏳ {len(st.session_state.queued_classes)} class(es) still saving…")
+
+
+def show_add_class():
     st.subheader("Add New Class")
+    st.caption("Teaching the same slot every week? Add it once under Recurring Classes.")
+    show_queued_saves()
 
     with st.form("class_form", clear_on_submit=True):
         col1, col2 = st.columns(2)
@@ -46,10 +84,9 @@ with tab1:
             class_type = st.selectbox(
                 "Class Type",
                 ["Standard", "Demo"],
-                help="Demo classes are fixed at ksh.400. Standard classes are ksh.750 per hour"
+                help="Demo classes are ksh.400 flat and Standard classes ksh.750 per hour, unless the rate table says otherwise"
             )
-            schools_df = st.session_state.data_manager.load_schools()
-            school_options = schools_df['name'].tolist() if not schools_df.empty else ['No schools added']
+            school_options = st.session_state.data_manager.get_schools().names() or ['No schools added']
             school = st.selectbox(
                 "School",
                 school_options,
@@ -62,7 +99,8 @@ with tab1:
             )
 
         # Calculate and display preview
-        price = st.session_state.data_manager.calculate_class_price(duration, class_type)
+        school_id = st.session_state.data_manager.get_school_id(school)
+        price = st.session_state.data_manager.calculate_class_price(duration, class_type, school_id, date)
         st.info(f"💰 Estimated earnings for this class: ksh.{price:,.2f}")
 
         submit = st.form_submit_button("Add Class", use_container_width=True)
@@ -71,8 +109,10 @@ with tab1:
             if school == 'No schools added':
                 st.error("Please add a school first in the School Management page!")
             else:
-                school_id = schools_df[schools_df['name'] == school]['school_id'].iloc[0]
-
+                # Overlaps are saved too, but the educator hears about them along with free slots
+                conflicts = st.session_state.data_manager.find_conflicts(date, time, duration)
+                if not conflicts.empty:
+                    show_conflicts(conflicts, date, duration)
                 class_data = {
                     'date': date.strftime('%Y-%m-%d'),
                     'time': time.strftime('%H:%M'),
@@ -83,11 +123,19 @@ with tab1:
                     'notes': notes
                 }
 
-                st.session_state.data_manager.save_class(class_data)
-                st.success("✅ Class added successfully!")
-                st.balloons()
+                ticket = st.session_state.data_manager.submit_classes([class_data])
+                if ticket is not None and not ticket.done.is_set():
+                    # Write-behind: the class is saved in the background
+                    st.session_state.setdefault("queued_classes", []).append(ticket)
+                    st.success("✅ Class received! It will show up in your classes in a moment.")
+                elif ticket is not None and ticket.status == 'saved':
+                    st.success("✅ Class added successfully!")
+                    st.balloons()
+
 
-with tab2:
+# Changing the filters reruns only the class list
+@st.fragment
+def show_classes():
     st.subheader("Existing Classes")
 
     # Add filters
@@ -106,22 +154,24 @@ with tab2:
             help="Select class types to display"
         )
 
-    # Load and filter classes
-    classes_df = st.session_state.data_manager.load_classes()
-    if not classes_df.empty:
-        classes_df['date'] = pd.to_datetime(classes_df['date'])
-        mask = (
-            (classes_df['date'].dt.date >= filter_date[0]) &
-            (classes_df['date'].dt.date <= filter_date[1]) &
-            (classes_df['class_type'].isin(filter_type))
-        )
-        filtered_df = classes_df.loc[mask].sort_values('date', ascending=False)
+    editable = st.toggle("Edit classes", key="edit_classes",
+                         help="Correct or delete classes on this page; changes are saved when you click Save")
 
-        if not filtered_df.empty:
-            st.dataframe(
-                filtered_df,
-                use_container_width=True,
-                hide_index=True,
+    # Load only the visible page of classes matching the filters
+    if st.session_state.data_manager.get_class_date_range() is not None:
+        # Totals come from the daily rollups, so they cost the same for any date range
+        totals = st.session_state.data_manager.get_rollups(filter_date[0], filter_date[1])
+        totals = totals[totals['class_type'].isin(filter_type)]
+        total_classes = int(totals['classes'].sum())
+
+        if total_classes:
+            show_class_page(
+                "class_list",
+                filter_date[0],
+                filter_date[1],
+                filter_type,
+                total=total_classes,
+                editable=editable,
                 column_config={
                     "price": st.column_config.NumberColumn(
                         "Price",
@@ -140,9 +190,8 @@ with tab2:
 
             # Summary statistics
             st.subheader("Summary")
-            total_classes = len(filtered_df)
-            total_earnings = filtered_df['price'].sum()
-            avg_duration = filtered_df['duration'].mean()
+            total_earnings = totals['earnings'].sum()
+            avg_duration = totals['hours'].sum() / total_classes
 
             col1, col2, col3 = st.columns(3)
             col1.metric("Total Classes", total_classes)
@@ -151,4 +200,146 @@ with tab2:
         else:
             st.info("No classes found for the selected filters.")
     else:
-        st.info("No classes recorded yet.")
\ No newline at end of file
+        st.info("No classes recorded yet.")
+
+
+def save_series_edits(series_ids):
+    """Save the recurring classes changed or deleted in the grid, one update per series."""
+    editor_key = f"series_editor_{st.session_state.get('series_editor_version', 0)}"
+    changes = st.session_state.get(editor_key, {})
+    manager = st.session_state.data_manager
+    saved = failed = 0
+    for row, values in changes.get('edited_rows', {}).items():
+        values = dict(values)
+        if 'school' in values:
+            values['school_id'] = manager.get_school_id(values.pop('school'))
+        if manager.update_series(series_ids[int(row)], values) is None:
+            failed += 1
+        else:
+            saved += 1
+    for row in changes.get('deleted_rows', []):
+        if manager.delete_series(series_ids[int(row)]):
+            saved += 1
+        else:
+            failed += 1
+    if not failed:
+        st.session_state.series_editor_version = st.session_state.get('series_editor_version', 0) + 1
+    if saved:
+        st.toast(f"✅ Saved {saved} recurring class change(s)")
+
+
+def record_taught(through):
+    """Save the classes of every recurring series up to `through` as classes."""
+    recorded = st.session_state.data_manager.record_series_classes(through)
+    if recorded is not None:
+        st.toast(f"✅ Recorded {recorded} class(es)")
+
+
+def show_recurring():
+    st.subheader("Recurring Classes")
+    st.markdown("""
+    A weekly class is stored once. Its upcoming classes show on the calendar and in the reports,
+    and are saved as classes when you record them after teaching.
+    """)
+
+    with st.form("series_form", clear_on_submit=True):
+        col1, col2 = st.columns(2)
+
+        with col1:
+            start = st.date_input("Starts", help="The class repeats from this date")
+            end = st.date_input("Ends", value=None, help="Last date of the class; leave empty to repeat until you stop it")
+            weekdays = st.multiselect("On", DAY_NAMES, help="Weekdays the class is held on")
+            interval = st.number_input("Every how many weeks", min_value=1, max_value=8, value=1, step=1)
+            time = st.time_input("Class Time")
+            duration = st.number_input("Duration (hours)", min_value=0.5, max_value=8.0, value=1.0, step=0.5)
+
+        with col2:
+            class_type = st.selectbox("Class Type", ["Standard", "Demo"])
+            school_options = st.session_state.data_manager.get_schools().names() or ['No schools added']
+            school = st.selectbox("School", school_options)
+            notes = st.text_area("Notes", placeholder="Add any additional notes about the class...", height=100)
+
+        submit = st.form_submit_button("Add Recurring Class", use_container_width=True)
+
+        if submit:
+            if school == 'No schools added':
+                st.error("Please add a school first in the School Management page!")
+            elif not weekdays:
+                st.error("Pick at least one weekday.")
+            else:
+                series_data = {
+                    'start': start.strftime('%Y-%m-%d'),
+                    'end': end.strftime('%Y-%m-%d') if end else None,
+                    'weekdays': [DAY_NAMES.index(day) for day in weekdays],
+                    'interval': interval,
+                    'time': time.strftime('%H:%M'),
+                    'duration': duration,
+                    'class_type': class_type,
+                    'school_id': st.session_state.data_manager.get_school_id(school),
+                    'notes': notes,
+                }
+                if st.session_state.data_manager.save_series(series_data):
+                    st.success("✅ Recurring class added!")
+
+    series_df = st.session_state.data_manager.load_series().to_frame()
+    if series_df.empty:
+        st.info("No recurring classes yet.")
+        return
+
+    # Occurrences up to today are the ones already taught
+    today = datetime.today().date()
+    taught = len(st.session_state.data_manager.get_occurrences(None, today))
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.caption(f"{taught} class(es) up to today have not been recorded yet." if taught else "All taught classes are recorded.")
+    with col2:
+        st.button("Record Taught Classes", disabled=not taught, use_container_width=True, on_click=record_taught,
+                  args=(today,), help="Save every class of these series up to today as a class")
+
+    # Changes apply from the next class that has not been recorded
+    editor_key = f"series_editor_{st.session_state.get('series_editor_version', 0)}"
+    grid = series_df.assign(
+        school=st.session_state.data_manager.get_school_names(series_df['school_id'], default='Unknown school')
+    ).drop(columns='school_id')
+    weekday = '(' + '|'.join(WEEKDAYS) + ')'
+    st.data_editor(
+        grid,
+        key=editor_key,
+        num_rows='delete',
+        use_container_width=True,
+        hide_index=True,
+        column_order=['series_id', 'start', 'end', 'weekdays', 'interval', 'time', 'duration',
+                      'class_type', 'school', 'notes', 'exceptions', 'recorded_through'],
+        column_config={
+            "series_id": st.column_config.NumberColumn("ID", disabled=True),
+            "start": st.column_config.TextColumn("Starts", disabled=True),
+            "end": st.column_config.TextColumn("Ends", validate=r'^(\d{4}-\d{2}-\d{2})?$'),
+            "weekdays": st.column_config.TextColumn("On", validate=f'^{weekday}(,{weekday})*$', required=True,
+                                                    help="MO, TU, WE, TH, FR, SA, SU separated by commas"),
+            "interval": st.column_config.NumberColumn("Every N Weeks", min_value=1, step=1, required=True),
+            "time": st.column_config.TextColumn("Time", validate=r'^\d{2}:\d{2}$', required=True),
+            "duration": st.column_config.NumberColumn("Duration (hours)", min_value=0.5, step=0.5, required=True),
+            "class_type": st.column_config.SelectboxColumn("Type", options=['Standard', 'Demo'], required=True),
+            "school": st.column_config.SelectboxColumn("School", options=st.session_state.data_manager.get_schools().names(), required=True),
+            "notes": "Notes",
+            "exceptions": st.column_config.TextColumn("Skipped Dates", help="Dates without a class, YYYY-MM-DD separated by semicolons"),
+            "recorded_through": st.column_config.TextColumn("Recorded Through", disabled=True),
+        }
+    )
+    changes = st.session_state.get(editor_key, {})
+    pending = len(changes.get('edited_rows', {})) + len(changes.get('deleted_rows', []))
+    st.button(f"Save {pending} change(s)" if pending else "Save changes", key="series_save", type='primary',
+              disabled=not pending, on_click=save_series_edits, args=(series_df['series_id'].tolist(),))
+
+
+if tab1.open:
+    with tab1:
+        show_add_class()
+
+if tab2.open:
+    with tab2:
+        show_classes()
+
+if tab3.open:
+    with tab3:
+        show_recurring()
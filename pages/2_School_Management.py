@@ -1,9 +1,9 @@
 import streamlit as st
-import pandas as pd
 import data_manager as data_manager 
+import tenants
 
-if "data_manager" not in st.session_state:
-    st.session_state.data_manager = data_manager.DataManager()
+# Sessions of the same educator share one DataManager
+st.session_state.data_manager = tenants.session_data_manager()
 
 st.title("🏫 School Management")
 
@@ -24,23 +24,53 @@ with st.form("school_form"):
     
     if submit:
         if school_name:
+            # The registry gives the school the next free ID and rejects duplicate names
             school_data = {
-                'school_id': pd.util.hash_pandas_object(pd.Series([school_name])).iloc[0],
                 'name': school_name,
                 'address': address,
                 'contact': contact
             }
             
-            st.session_state.data_manager.save_school(school_data)
-            st.success("School added successfully!")
+            if st.session_state.data_manager.save_school(school_data):
+                st.success("School added successfully!")
         else:
             st.error("School name is required!")
 
-# Display existing schools
+
+def save_school_edits(school_ids):
+    """Save the schools changed in the grid, one update per school."""
+    editor_key = f"school_editor_{st.session_state.get('school_editor_version', 0)}"
+    edited_rows = st.session_state.get(editor_key, {}).get('edited_rows', {})
+    saved = sum(
+        st.session_state.data_manager.update_school(school_ids[int(row)], changes) is not None
+        for row, changes in edited_rows.items()
+    )
+    if saved == len(edited_rows):
+        st.session_state.school_editor_version = st.session_state.get('school_editor_version', 0) + 1
+    if saved:
+        st.toast(f"✅ Updated {saved} school(s)")
+
+
+# Display existing schools; names, addresses and contacts can be corrected in place
 st.subheader("Existing Schools")
-schools_df = st.session_state.data_manager.load_schools()
+schools_df = st.session_state.data_manager.get_schools().to_frame()
 
 if not schools_df.empty:
-    st.dataframe(schools_df, use_container_width=True)
+    editor_key = f"school_editor_{st.session_state.get('school_editor_version', 0)}"
+    st.data_editor(
+        schools_df.fillna({'address': '', 'contact': ''}).astype({'address': str, 'contact': str}),
+        key=editor_key,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "school_id": st.column_config.NumberColumn("ID", disabled=True),
+            "name": st.column_config.TextColumn("School Name", required=True),
+            "address": "Address",
+            "contact": "Contact Information",
+        }
+    )
+    pending = len(st.session_state.get(editor_key, {}).get('edited_rows', {}))
+    st.button(f"Save {pending} change(s)" if pending else "Save changes", type='primary', disabled=not pending,
+              on_click=save_school_edits, args=(schools_df['school_id'].tolist(),))
 else:
     st.info("No schools added yet.")
@@ -1,75 +1,252 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from datetime import datetime
+import data_manager as data_manager
+import tenants
+import instrumentation
+from class_table import show_class_page
+
+# Sessions of the same educator share one DataManager
+st.session_state.data_manager = tenants.session_data_manager()
 
 st.title("💰 Financial Reports")
 
-# Load classes
-classes_df = st.session_state.data_manager.load_classes()
-if not classes_df.empty:
-    classes_df['date'] = pd.to_datetime(classes_df['date'])
 
-    # Date range selector
+def show_projection(filtered_df, start_date, end_date):
+    """What-if pricing of the selected range."""
+    from pricing import RateTable
+
+    st.caption(
+        "Each rule prices a class type, optionally for one school and an inclusive date range. "
+        "School and date specific rules take precedence over general ones."
+    )
+    rates = st.data_editor(
+        st.session_state.data_manager.load_rates().to_frame(),
+        num_rows="dynamic",
+        use_container_width=True,
+        key="rates_editor",
+        column_config={
+            "class_type": st.column_config.SelectboxColumn("Class Type", options=["Standard", "Demo"], required=True),
+            "school_id": st.column_config.TextColumn("School ID"),
+            "start": st.column_config.TextColumn("From (YYYY-MM-DD)"),
+            "end": st.column_config.TextColumn("To (YYYY-MM-DD)"),
+            "rate": st.column_config.NumberColumn("Rate (ksh.)", min_value=0.0, required=True),
+            "per_hour": st.column_config.CheckboxColumn("Per Hour"),
+        }
+    )
+    rates = rates.dropna(subset=['class_type', 'rate'])
+
+    try:
+        projection = st.session_state.data_manager.project_earnings(filtered_df, RateTable(rates))
+    except Exception as e:
+        st.error(f"Invalid rates: {str(e)}")
+        return
+
+    recorded_total = projection['price'].sum()
+    projected_total = projection['projected_price'].sum()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Recorded Earnings", f"ksh.{recorded_total:,.2f}")
+    with col2:
+        st.metric("Projected Earnings", f"ksh.{projected_total:,.2f}")
+    with col3:
+        st.metric("Difference", f"ksh.{projected_total - recorded_total:,.2f}")
+
+    by_type = projection.groupby('class_type', observed=True)[['price', 'projected_price']].sum()
+    st.dataframe(
+        by_type.rename(columns={'price': 'Recorded', 'projected_price': 'Projected'}),
+        use_container_width=True
+    )
+
     col1, col2 = st.columns(2)
     with col1:
-        start_date = st.date_input("Start Date", min_value=classes_df['date'].min())
+        if st.button("Save Rates", help="Price new classes with these rates"):
+            if st.session_state.data_manager.save_rates(rates):
+                st.success("Rates saved!")
     with col2:
-        end_date = st.date_input("End Date", max_value=classes_df['date'].max())
+        if st.button("Reprice Classes in Range", help="Overwrite the recorded prices of the selected date range"):
+            changed = st.session_state.data_manager.reprice_classes(RateTable(rates), start_date, end_date)
+            if changed is not None:
+                st.success(f"Repriced {changed} classes.")
+
+
+def show_schools(start_date, end_date, scheduled=False):
+    """Earnings per school for the range, with the top schools charted."""
+    import plotly.express as px
+
+    by_school = st.session_state.data_manager.get_period_totals(start_date, end_date, None, ['school_id'], scheduled=scheduled)
+    if by_school.empty:
+        st.info("No classes in the selected range.")
+        return
+    # School names are looked up per row from the registry, no merge needed
+    by_school.insert(0, 'school', st.session_state.data_manager.get_school_names(
+        by_school['school_id'], default='Unknown school'
+    ))
+    by_school = by_school.sort_values('earnings', ascending=False)
+
+    top_n = st.number_input("Top schools", min_value=1, max_value=len(by_school),
+                            value=min(10, len(by_school)), key="top_schools")
+    with instrumentation.span('chart.top_schools'):
+        fig = px.bar(by_school.head(top_n), x='school', y='earnings',
+                     title=f'Top {top_n} Schools by Earnings',
+                     labels={'earnings': 'Earnings (ksh.)', 'school': 'School'})
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(
+        by_school,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "school": "School",
+            "school_id": "School ID",
+            "classes": "Classes",
+            "hours": st.column_config.NumberColumn("Hours", format="%.1f"),
+            "earnings": st.column_config.NumberColumn("Earnings", format="ksh.%.2f"),
+        }
+    )
+
+
+def show_periods(start_date, end_date, scheduled=False):
+    """Earnings per week, month or quarter, compared with the period before, for all schools or one."""
+    import plotly.express as px
 
-    # Filter data based on date range
-    mask = (classes_df['date'].dt.date >= start_date) & (classes_df['date'].dt.date <= end_date)
-    filtered_df = classes_df.loc[mask]
+    col1, col2 = st.columns(2)
+    with col1:
+        period = st.selectbox("Period", ["week", "month", "quarter"], index=1, format_func=str.title, key="report_period")
+    with col2:
+        school_names = st.session_state.data_manager.get_schools().names()
+        school = st.selectbox("School", ["All schools"] + school_names, key="report_period_school")
+
+    totals = st.session_state.data_manager.get_period_totals(
+        start_date, end_date, period, ['school_id', 'class_type'], scheduled=scheduled
+    )
+    if school != "All schools":
+        totals = totals[totals['school_id'].astype(str) == str(st.session_state.data_manager.get_school_id(school))]
+    if totals.empty:
+        st.info("No classes in the selected range.")
+        return
+
+    with instrumentation.span('chart.period_earnings'):
+        by_type = totals.groupby(['period', 'class_type'], as_index=False)['earnings'].sum()
+        fig = px.bar(by_type, x='period', y='earnings', color='class_type',
+                     title=f'Earnings per {period.title()}',
+                     labels={'earnings': 'Earnings (ksh.)', 'period': period.title(), 'class_type': 'Type'},
+                     color_discrete_map={'Demo': '#FFA500', 'Standard': '#2E8B57'})
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Periods at either end of the range may be partial
+    by_period = totals.groupby('period')[['classes', 'hours', 'earnings']].sum()
+    by_period['change'] = by_period['earnings'].pct_change() * 100
+    st.dataframe(
+        by_period.reset_index().iloc[::-1],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "period": st.column_config.DateColumn(period.title(), format="YYYY-MM-DD"),
+            "classes": "Classes",
+            "hours": st.column_config.NumberColumn("Hours", format="%.1f"),
+            "earnings": st.column_config.NumberColumn("Earnings", format="ksh.%.2f"),
+            "change": st.column_config.NumberColumn(f"vs. Previous {period.title()}", format="%+.1f%%"),
+        }
+    )
+    st.caption("The first and last periods only count the days inside the selected range.")
+
+
+# Changing the date range reruns only this section
+@st.fragment
+def show_reports(date_range):
+    scheduled = st.toggle(
+        "Include upcoming recurring classes", key="include_scheduled",
+        help="Count the classes your recurring series will hold in the range, at the current rates, until they are recorded"
+    )
+
+    # Date range selector; upcoming classes can lie past the last recorded one
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("Start Date", min_value=date_range[0] if date_range is not None else None)
+    with col2:
+        end_date = st.date_input("End Date", max_value=date_range[1] if date_range is not None and not scheduled else None)
+
+    # Totals by class type for the range, from the cached earnings cube
+    by_type = st.session_state.data_manager.get_period_totals(start_date, end_date, None, ['class_type'], scheduled=scheduled)
+    by_type = by_type.set_index('class_type')
+    earnings_by_type = by_type['earnings']
 
     # Financial summary
     st.subheader("Financial Summary")
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        total_earnings = filtered_df['price'].sum()
+        total_earnings = earnings_by_type.sum()
         st.metric("Total Earnings", f"ksh.{total_earnings:,.2f}")
 
     with col2:
-        demo_earnings = filtered_df[filtered_df['class_type'] == 'Demo']['price'].sum()
+        demo_earnings = earnings_by_type.get('Demo', 0)
         st.metric("Demo Class Earnings", f"ksh.{demo_earnings:,.2f}")
 
     with col3:
-        standard_earnings = filtered_df[filtered_df['class_type'] == 'Standard']['price'].sum()
+        standard_earnings = earnings_by_type.get('Standard', 0)
         st.metric("Standard Class Earnings", f"ksh.{standard_earnings:,.2f}")
 
-    # Earnings trend
-    st.subheader("Earnings Trend")
-    daily_earnings = filtered_df.groupby('date')['price'].sum().reset_index()
-    fig = px.line(daily_earnings, x='date', y='price',
-                  title='Daily Earnings',
-                  labels={'price': 'Earnings (ksh.)', 'date': 'Date'})
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Class type distribution
-    st.subheader("Class Type Distribution")
-    class_type_counts = filtered_df['class_type'].value_counts()
-    fig = px.pie(values=class_type_counts.values,
-                 names=class_type_counts.index,
-                 title='Class Type Distribution')
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Detailed financial records
-    st.subheader("Detailed Financial Records")
-    st.dataframe(filtered_df[['date', 'class_type', 'duration', 'price']], use_container_width=True)
-
+    # Only the selected tab runs, so charts and class rows load on demand
+    trend_tab, types_tab, schools_tab, periods_tab, records_tab, projection_tab = st.tabs(
+        ["📈 Earnings Trend", "🥧 Class Types", "🏫 Schools", "📅 Periods", "📋 Detailed Records", "🔮 Projected Earnings"],
+        key="report_tab",
+        on_change="rerun"
+    )
+
+    if trend_tab.open:
+        with trend_tab:
+            import plotly.express as px
+
+            with instrumentation.span('chart.earnings_trend'):
+                daily_earnings = st.session_state.data_manager.get_period_totals(start_date, end_date, 'day', [], scheduled=scheduled)
+                fig = px.line(daily_earnings, x='period', y='earnings',
+                              title='Daily Earnings',
+                              labels={'earnings': 'Earnings (ksh.)', 'period': 'Date'})
+                st.plotly_chart(fig, use_container_width=True)
+
+    if types_tab.open:
+        with types_tab:
+            import plotly.express as px
+
+            with instrumentation.span('chart.class_types'):
+                class_type_counts = by_type['classes']
+                fig = px.pie(values=class_type_counts.values,
+                             names=class_type_counts.index,
+                             title='Class Type Distribution')
+                st.plotly_chart(fig, use_container_width=True)
+
+    if schools_tab.open:
+        with schools_tab:
+            show_schools(start_date, end_date, scheduled)
+
+    if periods_tab.open:
+        with periods_tab:
+            show_periods(start_date, end_date, scheduled)
+
+    if records_tab.open:
+        with records_tab:
+            # Only the visible page of records is loaded; upcoming classes are not records yet
+            recorded = st.session_state.data_manager.get_period_totals(start_date, end_date, None, []) if scheduled else by_type
+            show_class_page(
+                "report_records",
+                start_date,
+                end_date,
+                columns=['date', 'class_type', 'school_id', 'duration', 'price'],
+                total=int(recorded['classes'].sum())
+            )
+
+    if projection_tab.open:
+        with projection_tab:
+            # Load only the classes in the selected date range
+            filtered_df = st.session_state.data_manager.query_classes(
+                start_date, end_date, columns=['date', 'class_type', 'school_id', 'duration', 'price']
+            )
+            show_projection(filtered_df, start_date, end_date)
+
+
+# Load the recorded date range
+date_range = st.session_state.data_manager.get_class_date_range()
+if date_range is not None or len(st.session_state.data_manager.load_series()):
+    show_reports(date_range)
 else:
     st.info("No financial data available yet. Add classes to see financial reports.")
-
-
-
-
-
-
-
-
-
-
-
-
-
-
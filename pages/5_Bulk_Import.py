@@ -0,0 +1,41 @@
+import streamlit as st
+import pandas as pd
+import data_manager as data_manager
+import tenants
+import importer
+
+st.set_page_config(page_title="Bulk Import", page_icon="📥", layout="wide")
+
+# Sessions of the same educator share one DataManager
+st.session_state.data_manager = tenants.session_data_manager()
+
+st.title("📥 Bulk Import")
+st.markdown("""
+Import a whole term of classes at once from a CSV file or an iCalendar (.ics) export.
+CSV files need `date`, `time`, `duration`, `class_type` and either `school` (the school name) or `school_id` columns, plus optional `notes`.
+Calendar events are imported with their location as the school, and events with "demo" in the title as Demo classes.
+""")
+
+uploaded_file = st.file_uploader("Schedule file", type=['csv', 'ics'])
+
+if uploaded_file is not None and st.button("Import Classes", type="primary"):
+    file_format = 'ics' if uploaded_file.name.lower().endswith('.ics') else 'csv'
+    # Rough row count from the file size, only used to move the progress bar
+    expected_rows = max(uploaded_file.size // 60, 1)
+    progress_bar = st.progress(0.0, text="Importing...")
+
+    def show_progress(result):
+        done = result['imported'] + result['rejected']
+        progress_bar.progress(min(done / expected_rows, 1.0), text=f"Processed {done} rows...")
+
+    try:
+        result = importer.import_classes(
+            st.session_state.data_manager, uploaded_file, file_format, progress=show_progress
+        )
+        progress_bar.progress(1.0, text="Import finished")
+        st.success(f"Imported {result['imported']} classes.")
+        if result['rejected']:
+            st.warning(f"Rejected {result['rejected']} rows. The first ones are listed below.")
+            st.dataframe(pd.DataFrame(result['errors']), use_container_width=True)
+    except Exception as e:
+        st.error(f"Error importing classes: {str(e)}")
@@ -0,0 +1,79 @@
+import streamlit as st
+import pandas as pd
+import instrumentation
+
+st.set_page_config(page_title="Diagnostics", page_icon="🩺", layout="wide")
+
+st.title("🩺 Diagnostics")
+
+if not instrumentation.enabled():
+    st.info(
+        "Instrumentation is off. Start the app with `TRACKER_INSTRUMENT=1` to record timings from startup, "
+        "or turn it on for this server process until it restarts."
+    )
+    if st.button("Enable Instrumentation"):
+        instrumentation.enable()
+        st.rerun()
+    st.stop()
+
+st.markdown("""
+Timings of data loads, saves and chart builds across every session of this server process.
+Percentiles cover the most recent operations kept in memory.
+""")
+
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    if st.button("Refresh", use_container_width=True):
+        st.rerun()
+with col2:
+    if st.button("Clear", use_container_width=True):
+        instrumentation.clear()
+        st.rerun()
+with col3:
+    st.download_button(
+        "Export JSON",
+        instrumentation.to_json(),
+        file_name="tracker-metrics.json",
+        mime="application/json",
+        use_container_width=True
+    )
+with col4:
+    st.download_button(
+        "Export Prometheus",
+        instrumentation.to_prometheus(),
+        file_name="tracker-metrics.prom",
+        mime="text/plain",
+        use_container_width=True
+    )
+
+summary = pd.DataFrame(instrumentation.summary())
+if summary.empty:
+    st.info("Nothing recorded yet. Open the other pages to collect timings.")
+    st.stop()
+
+st.subheader("Operations")
+st.dataframe(
+    summary,
+    use_container_width=True,
+    hide_index=True,
+    column_config={
+        "operation": "Operation",
+        "count": "Calls",
+        "p50_ms": st.column_config.NumberColumn("p50 (ms)", format="%.1f"),
+        "p95_ms": st.column_config.NumberColumn("p95 (ms)", format="%.1f"),
+        "max_ms": st.column_config.NumberColumn("Max (ms)", format="%.1f"),
+        "total_ms": st.column_config.NumberColumn("Total (ms)", format="%.0f"),
+        "rows": "Rows",
+        "bytes": "Bytes Read",
+        "errors": "Errors",
+    }
+)
+
+with st.expander("Recent Operations"):
+    recent = pd.DataFrame(instrumentation.records()[-200:][::-1], columns=instrumentation.RECORD_FIELDS)
+    recent['timestamp'] = pd.to_datetime(recent['timestamp'], unit='s')
+    recent['seconds'] = recent['seconds'] * 1000
+    st.dataframe(recent.rename(columns={'seconds': 'ms'}), use_container_width=True, hide_index=True)
+
+with st.expander("Prometheus Text"):
+    st.code(instrumentation.to_prometheus(), language="text")
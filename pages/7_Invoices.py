@@ -0,0 +1,80 @@
+import streamlit as st
+import data_manager as data_manager
+import tenants
+from invoices import KINDS
+
+st.set_page_config(page_title="Invoices", page_icon="🧾", layout="wide")
+
+# Sessions of the same educator share one DataManager
+st.session_state.data_manager = tenants.session_data_manager()
+
+st.title("🧾 Invoices")
+st.markdown("""
+Build monthly invoices and earnings statements for your schools as PDF or Excel files.
+Files are generated in the background, so you can keep using the app while a large export runs.
+""")
+
+date_range = st.session_state.data_manager.get_class_date_range()
+if date_range is None:
+    st.info("No classes recorded yet. Add classes to invoice your schools.")
+    st.stop()
+
+registry = st.session_state.data_manager.get_schools()
+
+with st.form("export_form"):
+    col1, col2 = st.columns(2)
+    with col1:
+        start_month = st.date_input("From month", value=date_range[1].replace(day=1),
+                                    min_value=date_range[0], max_value=date_range[1])
+        end_month = st.date_input("To month", value=date_range[1], min_value=date_range[0], max_value=date_range[1])
+    with col2:
+        school_names = st.multiselect("Schools", registry.names(), help="Leave empty to include every school")
+        kinds = st.multiselect("Documents", list(KINDS), default=["invoice"], format_func=KINDS.get)
+        formats = st.multiselect("Formats", ["pdf", "xlsx"], default=["pdf"], format_func=str.upper)
+
+    submit = st.form_submit_button("Generate", use_container_width=True)
+
+    if submit:
+        if not kinds or not formats:
+            st.error("Pick at least one document and one format!")
+        elif start_month > end_month:
+            st.error("The first month must not be after the last one!")
+        else:
+            school_ids = [registry.id_for_name(name) for name in school_names] or [
+                school['school_id'] for school in registry.to_frame().to_dict('records')
+            ]
+            st.session_state.export_job = st.session_state.data_manager.export_invoices(
+                school_ids, start_month, end_month, kinds, formats
+            )
+
+
+def show_export():
+    job = st.session_state.export_job
+    if not job.finished.is_set():
+        st.progress(job.progress, text=f"Rendering schools: {job.done} of {job.total}")
+        return
+    if st.session_state.export_polling:
+        # Rerun the whole page once so this section stops polling
+        st.session_state.export_polling = False
+        st.rerun()
+    if job.error:
+        st.error(f"Export failed: {job.error}")
+        return
+    if not job.files:
+        st.info("No classes to invoice for the selected schools and months.")
+        return
+
+    st.success(f"✅ {len(job.files)} files ready ({job.cached} reused from earlier exports).")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Download All (.zip)", job.zip_bytes(), file_name="invoices.zip",
+                           mime="application/zip", use_container_width=True)
+    with col2:
+        name = st.selectbox("Single file", sorted(job.files), label_visibility="collapsed")
+        st.download_button("Download File", job.files[name], file_name=name, use_container_width=True)
+
+
+if st.session_state.get("export_job") is not None:
+    # Poll once a second while the export runs
+    st.session_state.export_polling = not st.session_state.export_job.finished.is_set()
+    st.fragment(show_export, run_every=1 if st.session_state.export_polling else None)()
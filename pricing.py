@@ -0,0 +1,115 @@
+import pandas as pd
+import numpy as np
+import os
+
+RATE_COLUMNS = ['class_type', 'school_id', 'start', 'end', 'rate', 'per_hour']
+
+# The built-in prices: Demo classes are a flat ksh.400, Standard ksh.750 per hour
+DEFAULT_RATES = pd.DataFrame([
+    {'class_type': 'Standard', 'school_id': None, 'start': None, 'end': None, 'rate': 750.0, 'per_hour': True},
+    {'class_type': 'Demo', 'school_id': None, 'start': None, 'end': None, 'rate': 400.0, 'per_hour': False},
+], columns=RATE_COLUMNS)
+
+
+def _blank(value):
+    return value is None or (isinstance(value, float) and np.isnan(value)) or value == ''
+
+
+class RateTable:
+    """Price rules by class type, optionally limited to one school and an inclusive date range.
+
+    A rule charges `rate` per hour when `per_hour` is set and a flat `rate`
+    per class otherwise. When several rules match a class, rules for a single
+    school beat rules for every school, dated rules beat open-ended ones, and
+    among equally specific rules the later one wins.
+    """
+
+    def __init__(self, rates=None):
+        rates = DEFAULT_RATES if rates is None else pd.DataFrame(rates)
+        rules = []
+        for rule in rates.to_dict('records'):
+            rules.append({
+                'class_type': str(rule['class_type']),
+                'school_id': None if _blank(rule.get('school_id')) else str(rule['school_id']),
+                'start': None if _blank(rule.get('start')) else np.datetime64(pd.Timestamp(rule['start']).normalize(), 'ns'),
+                'end': None if _blank(rule.get('end')) else np.datetime64(pd.Timestamp(rule['end']).normalize(), 'ns'),
+                'rate': float(rule['rate']),
+                'per_hour': str(rule.get('per_hour')).strip().lower() in ('true', '1', 'yes'),
+            })
+        # Drop repeated rules, such as the defaults saved back into a rates file
+        rules = list({tuple(rule.values()): rule for rule in rules}.values())
+        # Apply general rules first so more specific ones overwrite them
+        self.rules = sorted(
+            rules, key=lambda rule: (rule['school_id'] is not None, rule['start'] is not None or rule['end'] is not None)
+        )
+
+    @classmethod
+    def from_csv(cls, file_path):
+        """Load the default rates overlaid with the rules in a rates CSV file, if it exists."""
+        if not os.path.exists(file_path):
+            return cls()
+        rates = pd.read_csv(file_path, dtype={'school_id': str}, keep_default_na=False)
+        return cls(pd.concat([DEFAULT_RATES, rates[RATE_COLUMNS]], ignore_index=True))
+
+    def to_frame(self):
+        """Return the rules as a frame with one row per rule."""
+        rules = pd.DataFrame(self.rules, columns=RATE_COLUMNS)
+        for column in ('start', 'end'):
+            rules[column] = pd.to_datetime(rules[column]).dt.strftime('%Y-%m-%d')
+        return rules
+
+    def to_csv(self, file_path):
+        self.to_frame().to_csv(file_path, index=False)
+
+    def price(self, classes_df):
+        """Price every row of a classes frame at once and return the prices as a float array.
+
+        The frame needs `duration` and `class_type` columns, plus `school_id`
+        and `date` when any rule is limited to a school or a date range.
+        Rows no rule matches get NaN.
+        """
+        rows = len(classes_df)
+        rule_index = np.full(rows, -1, dtype=np.int16)
+        types = pd.Categorical(classes_df['class_type'])
+        type_names = types.categories.astype(str)
+        schools = dates = None
+
+        for i, rule in enumerate(self.rules):
+            # Compare category codes rather than strings
+            position = type_names.get_indexer([rule['class_type']])[0]
+            if position < 0:
+                continue
+            mask = types.codes == position
+            if rule['school_id'] is not None:
+                if schools is None:
+                    schools = pd.Categorical(classes_df['school_id'])
+                    school_names = schools.categories.astype(str)
+                position = school_names.get_indexer([rule['school_id']])[0]
+                if position < 0:
+                    continue
+                mask &= schools.codes == position
+            if rule['start'] is not None or rule['end'] is not None:
+                if dates is None:
+                    dates = pd.to_datetime(classes_df['date']).to_numpy(dtype='datetime64[ns]')
+                if rule['start'] is not None:
+                    mask &= dates >= rule['start']
+                if rule['end'] is not None:
+                    # Inclusive end date, so anything before the following midnight
+                    mask &= dates < rule['end'] + np.timedelta64(1, 'D')
+            rule_index[mask] = i
+
+        rates = np.array([rule['rate'] for rule in self.rules] + [np.nan])
+        per_hour = np.array([rule['per_hour'] for rule in self.rules] + [False])
+        # -1 picks the trailing NaN rate for unmatched rows
+        rate = rates[rule_index]
+        durations = np.asarray(classes_df['duration'], dtype=np.float64)
+        return np.where(per_hour[rule_index], rate * durations, rate)
+
+    def price_one(self, duration, class_type, school_id=None, date=None):
+        """Price a single class."""
+        return float(self.price(pd.DataFrame({
+            'duration': [duration],
+            'class_type': [class_type],
+            'school_id': [school_id],
+            'date': [pd.Timestamp(date) if date is not None else pd.Timestamp.now()],
+        }))[0])
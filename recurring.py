@@ -0,0 +1,342 @@
+import pandas as pd
+import numpy as np
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time
+
+from storage import file_lock
+
+SERIES_COLUMNS = [
+    'series_id', 'start', 'end', 'weekdays', 'interval', 'time', 'duration',
+    'class_type', 'school_id', 'notes', 'exceptions', 'recorded_through',
+]
+
+# RRULE BYDAY codes, Monday first like datetime.weekday()
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+# Stands in for the end date of series that repeat indefinitely
+_OPEN_END = np.iinfo(np.int32).max
+
+# Dates are handled as day numbers, days since 1970-01-01
+_EPOCH = date(1970, 1, 1).toordinal()
+
+# Exceptions are looked up as series position * _EXCEPTION_KEY + day number
+_EXCEPTION_KEY = 1 << 32
+
+# First line of a series file, recording the ID the next new series gets
+_NEXT_ID_PREFIX = '# next_series_id='
+
+# Parsed series files shared by every session in the process, keyed on
+# absolute path and tagged with the file's modification time, size and inode
+_series_cache = {}
+_series_cache_lock = threading.Lock()
+
+# Serializes changes to a series file within the process
+_write_lock = threading.Lock()
+
+
+def _blank(value):
+    return value is None or (isinstance(value, float) and np.isnan(value)) or str(value).strip() == ''
+
+
+def _day(value):
+    """Format a date as YYYY-MM-DD, or return '' for a blank one."""
+    if _blank(value):
+        return ''
+    if isinstance(value, str):
+        # Stored dates parse without going through pandas
+        return date.fromisoformat(value.strip()[:10]).isoformat()
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def _day_number(value):
+    """Days since 1970-01-01 of a date."""
+    return date.fromisoformat(_day(value)).toordinal() - _EPOCH
+
+
+def _clean(series):
+    """Check a series record and normalize its values to the stored text form."""
+    record = {column: series.get(column) for column in SERIES_COLUMNS}
+    if _blank(record['start']):
+        raise ValueError("A recurring class needs a start date")
+    record['start'], record['end'] = _day(record['start']), _day(record['end'])
+    if record['end'] and record['end'] < record['start']:
+        raise ValueError("A recurring class cannot end before it starts")
+
+    weekdays = record['weekdays']
+    if isinstance(weekdays, str):
+        weekdays = weekdays.replace(';', ',').split(',')
+    codes = set()
+    for weekday in weekdays if weekdays is not None else []:
+        if isinstance(weekday, (int, np.integer)):
+            weekday = WEEKDAYS[weekday]
+        code = str(weekday).strip().upper()[:2]
+        if code not in WEEKDAYS:
+            raise ValueError(f"Unknown weekday: {weekday}")
+        codes.add(code)
+    if not codes:
+        raise ValueError("Pick at least one weekday")
+    record['weekdays'] = ','.join(code for code in WEEKDAYS if code in codes)
+
+    record['interval'] = 1 if _blank(record['interval']) else int(record['interval'])
+    if record['interval'] < 1:
+        raise ValueError("A recurring class repeats every one or more weeks")
+    if isinstance(record['time'], dt_time):
+        record['time'] = record['time'].strftime('%H:%M')
+    record['time'] = datetime.strptime(str(record['time']).strip()[:5], '%H:%M').strftime('%H:%M')
+    record['duration'] = float(record['duration'])
+    if not record['duration'] > 0:
+        raise ValueError("The duration must be positive")
+    if _blank(record['class_type']) or _blank(record['school_id']):
+        raise ValueError("A recurring class needs a class type and a school")
+    record['class_type'] = str(record['class_type'])
+    record['school_id'] = int(record['school_id'])
+    record['notes'] = '' if _blank(record['notes']) else str(record['notes'])
+
+    exceptions = record['exceptions']
+    if isinstance(exceptions, str) or _blank(exceptions):
+        exceptions = [] if _blank(exceptions) else exceptions.replace(',', ';').split(';')
+    record['exceptions'] = ';'.join(sorted({_day(day) for day in exceptions if not _blank(day)}))
+    record['recorded_through'] = _day(record['recorded_through'])
+    return record
+
+
+class SeriesTable:
+    """Weekly class series, each stored as one record however many classes it stands for.
+
+    A series repeats on some weekdays (RRULE BYDAY codes such as "MO,TH")
+    every `interval` weeks from `start` to an inclusive `end`, or
+    indefinitely when `end` is blank, skipping the dates in `exceptions`.
+    Occurrences up to `recorded_through` have been saved as classes and are
+    not expanded again. The records are kept as arrays, so the occurrences
+    in a date range are expanded in a few vectorized steps.
+
+    IDs are never reused: `next_id` only grows, so a page still holding the
+    ID of a removed series can't change a newer one.
+    """
+
+    def __init__(self, series=None, next_id=None):
+        self._records = []
+        if series is not None:
+            for record in pd.DataFrame(series, columns=SERIES_COLUMNS).to_dict('records'):
+                self._records.append({**_clean(record), 'series_id': int(record['series_id'])})
+        # Files written before next_id was stored continue after their largest ID
+        self.next_id = max([int(next_id or 1)] + [record['series_id'] + 1 for record in self._records])
+        # Bumped on every change, so callers can tell if there is anything to write
+        self.version = 0
+        self._build_arrays()
+
+    def _build_arrays(self):
+        records = self._records
+        self._ids = np.array([record['series_id'] for record in records], dtype=np.int64)
+        self._starts = np.array([_day_number(record['start']) for record in records], dtype=np.int64)
+        self._ends = np.array(
+            [_day_number(record['end']) if record['end'] else _OPEN_END for record in records], dtype=np.int64
+        )
+        self._recorded = np.array(
+            [_day_number(record['recorded_through']) if record['recorded_through'] else -_OPEN_END for record in records],
+            dtype=np.int64
+        )
+        self._intervals = np.array([record['interval'] for record in records], dtype=np.int64)
+        self._times = np.array(
+            [int(record['time'][:2]) * 60 + int(record['time'][3:]) for record in records], dtype=np.int16
+        )
+        self._durations = np.array([record['duration'] for record in records], dtype=np.float32)
+        self._types = np.array([record['class_type'] for record in records], dtype=object)
+        self._schools = np.array([record['school_id'] for record in records], dtype=np.int64)
+        self._notes = np.array([record['notes'] for record in records], dtype=object)
+        # Monday of the week each series starts in; day 0 was a Thursday
+        self._weeks = self._starts - (self._starts + 3) % 7
+
+        # One pair per series and weekday it repeats on
+        pairs = [
+            (position, WEEKDAYS.index(code))
+            for position, record in enumerate(records)
+            for code in record['weekdays'].split(',')
+        ]
+        self._pair_series = np.array([series for series, _ in pairs], dtype=np.int64)
+        self._pair_days = np.array([weekday for _, weekday in pairs], dtype=np.int64)
+
+        self._exceptions = np.sort(np.array([
+            position * _EXCEPTION_KEY + _day_number(day)
+            for position, record in enumerate(records)
+            for day in (record['exceptions'].split(';') if record['exceptions'] else [])
+        ], dtype=np.int64))
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, series_id):
+        """Return the record of a series, or None."""
+        for record in self._records:
+            if record['series_id'] == int(series_id):
+                return record
+        return None
+
+    def to_frame(self):
+        return pd.DataFrame(self._records, columns=SERIES_COLUMNS)
+
+    def occurrences(self, start, end, rates=None):
+        """Expand the classes the series still stand for in an inclusive date range.
+
+        Returns a typed classes frame, sorted by date and time, with a
+        `series_id` column. Only occurrences after `recorded_through` are
+        included, since earlier ones are stored as classes already. With
+        `rates` (a RateTable) every class is priced; otherwise `price` is NaN.
+        """
+        if end is None:
+            raise ValueError("Recurring classes can only be expanded up to an end date")
+        first = np.maximum(self._starts, self._recorded + 1)
+        if start is not None:
+            first = np.maximum(first, _day_number(start))
+        last = np.minimum(self._ends, _day_number(end))
+
+        # Occurrence k of a pair falls on anchor + k * step; find the first and last k in range
+        series = self._pair_series
+        anchor = self._weeks[series] + self._pair_days
+        step = 7 * self._intervals[series]
+        first_k = -((anchor - first[series]) // step)
+        last_k = (last[series] - anchor) // step
+        counts = np.maximum(last_k - first_k + 1, 0)
+
+        pair = np.repeat(np.arange(len(counts)), counts)
+        k = first_k[pair] + np.arange(len(pair)) - np.repeat(np.cumsum(counts) - counts, counts)
+        days = anchor[pair] + k * step[pair]
+        positions = series[pair]
+        if len(self._exceptions):
+            keep = ~np.isin(positions * _EXCEPTION_KEY + days, self._exceptions)
+            days, positions = days[keep], positions[keep]
+        order = np.lexsort((self._times[positions], days))
+        days, positions = days[order], positions[order]
+
+        occurrences = pd.DataFrame({
+            'date': days.astype('datetime64[D]').astype('datetime64[ns]'),
+            'time': self._times[positions],
+            'duration': self._durations[positions],
+            'class_type': pd.Categorical(self._types[positions]),
+            'school_id': pd.Categorical(self._schools[positions]),
+            'price': np.full(len(days), np.nan, dtype=np.float32),
+            'notes': self._notes[positions],
+            'series_id': self._ids[positions],
+        })
+        if rates is not None and len(occurrences):
+            # Classes no rule covers are counted as unpaid
+            occurrences['price'] = np.nan_to_num(rates.price(occurrences)).astype(np.float32)
+        return occurrences
+
+    def add(self, series):
+        """Check a new series, give it the next ID and add it; returns the record."""
+        record = {**_clean(series), 'series_id': self.next_id}
+        record['recorded_through'] = ''
+        self.next_id += 1
+        self._records.append(record)
+        self._changed()
+        return record
+
+    def update(self, series_id, changes):
+        """Change some values of a series; returns the updated record.
+
+        Only occurrences that have not been recorded yet follow the change.
+        """
+        record = self.get(series_id)
+        if record is None:
+            raise ValueError(f"No recurring class with ID {series_id}")
+        changes = {column: value for column, value in changes.items() if column not in ('series_id', 'recorded_through')}
+        updated = {**_clean({**record, **changes}), 'series_id': record['series_id']}
+        self._records[self._records.index(record)] = updated
+        self._changed()
+        return updated
+
+    def remove(self, series_id):
+        """Stop a series; the classes already recorded from it are kept."""
+        record = self.get(series_id)
+        if record is None:
+            raise ValueError(f"No recurring class with ID {series_id}")
+        self._records.remove(record)
+        self._changed()
+
+    def mark_recorded(self, through):
+        """Note that the occurrences of every series up to `through` are stored as classes."""
+        through = _day(through)
+        for record in self._records:
+            if record['recorded_through'] < through:
+                record['recorded_through'] = through
+        self._changed()
+
+    def _changed(self):
+        self.version += 1
+        self._build_arrays()
+
+
+def _signature(file_path):
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def _read(file_path):
+    if not os.path.exists(file_path):
+        return SeriesTable()
+    with open(file_path, newline='') as f:
+        next_id = None
+        first = f.readline()
+        if first.startswith(_NEXT_ID_PREFIX):
+            next_id = int(first[len(_NEXT_ID_PREFIX):])
+        else:
+            f.seek(0)
+        return SeriesTable(pd.read_csv(f, dtype=str, keep_default_na=False), next_id)
+
+
+def _write(file_path, table):
+    """Write the whole table through a temp file and swap it in with os.replace."""
+    directory, name = os.path.split(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', newline='') as f:
+            f.write(f"{_NEXT_ID_PREFIX}{table.next_id}\n")
+            table.to_frame().to_csv(f, index=False)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_series(file_path):
+    """Return the process-wide series table of a series file, reading it again if the file changed."""
+    key = os.path.abspath(file_path)
+    signature = _signature(file_path)
+    with _series_cache_lock:
+        cached = _series_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    table = _read(file_path)
+    with _series_cache_lock:
+        _series_cache[key] = (signature, table)
+    return table
+
+
+def forget(file_path):
+    """Drop the cached series table of a series file."""
+    with _series_cache_lock:
+        _series_cache.pop(os.path.abspath(file_path), None)
+
+
+@contextmanager
+def editing(file_path):
+    """Yield a private copy of a series file's table and write it back if it changed.
+
+    The file is locked until the block ends, so changes made by other
+    sessions and processes are not lost.
+    """
+    with _write_lock, file_lock(file_path):
+        table = _read(file_path)
+        version = table.version
+        yield table
+        if table.version != version:
+            _write(file_path, table)
+            with _series_cache_lock:
+                _series_cache[os.path.abspath(file_path)] = (_signature(file_path), table)
@@ -0,0 +1,212 @@
+import pandas as pd
+import numpy as np
+import threading
+from datetime import time as dt_time
+
+import instrumentation
+
+# The calendar grid runs from 06:00 to 22:00 in 30 minute slots
+DAY_START = 6 * 60
+DAY_END = 22 * 60
+SLOT_MINUTES = 30
+
+CONFLICT_COLUMNS = ['date', 'time', 'end', 'duration', 'class_type', 'school_id']
+
+# Classes added since the arrays were last rebuilt are checked one by one
+# until there are this many of them
+MAX_PENDING = 1_024
+
+# Slot indexes shared by every session in the process, keyed on the storage
+# location and tagged with the storage signature they were built from
+_index_cache = {}
+_index_cache_lock = threading.Lock()
+
+
+def to_minutes(value):
+    """Return a class time, as minutes since midnight, 'HH:MM' text or a time, as minutes."""
+    if isinstance(value, dt_time):
+        return value.hour * 60 + value.minute
+    if isinstance(value, str):
+        hours, minutes = value.split(':')[:2]
+        return int(hours) * 60 + int(minutes)
+    return int(value)
+
+
+def _day_number(dates):
+    """Days since 1970-01-01 of a date column or a single date."""
+    if np.ndim(dates):
+        return pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[D]').astype('int64')
+    return int(np.datetime64(pd.Timestamp(dates).normalize(), 'D').astype('int64'))
+
+
+class SlotIndex:
+    """Start and end minutes of every class, for overlap checks.
+
+    Times are counted in minutes from 1970-01-01, so classes that run past
+    midnight need no special case. Intervals are kept sorted by start with
+    a running maximum of the ends: every class starting before some time is
+    a prefix of the arrays, and the classes in that prefix still running at
+    another time all come after the last running maximum at or before it.
+    A check is two binary searches plus a slice of the classes running
+    around that time.
+    """
+
+    def __init__(self, classes_df=None):
+        if classes_df is None or classes_df.empty:
+            classes_df = pd.DataFrame(columns=['date', 'time', 'duration', 'class_type', 'school_id'])
+        starts = _day_number(classes_df['date']) * 1440 + classes_df['time'].to_numpy(dtype='int64')
+        ends = starts + np.round(classes_df['duration'].to_numpy(dtype='float64') * 60).astype('int64')
+        order = np.argsort(starts, kind='stable')
+        self._starts = starts[order]
+        self._ends = ends[order]
+        self._types = classes_df['class_type'].to_numpy(dtype=object)[order]
+        self._schools = classes_df['school_id'].to_numpy(dtype=object)[order]
+        self._max_ends = np.maximum.accumulate(self._ends) if len(self._ends) else self._ends
+        # (start, end, class_type, school_id) of classes added since the arrays were built
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._starts) + len(self._pending)
+
+    def add(self, rows):
+        """Add newly saved class rows to the index."""
+        with self._lock:
+            for row in rows:
+                start = _day_number(row['date']) * 1440 + to_minutes(row['time'])
+                end = start + int(round(float(row['duration']) * 60))
+                self._pending.append((start, end, row['class_type'], row['school_id']))
+            if len(self._pending) > MAX_PENDING:
+                self._flush()
+
+    def remove(self, rows):
+        """Drop edited or deleted class rows, as they were, from the index."""
+        with self._lock:
+            drop = []
+            for row in rows:
+                start = _day_number(row['date']) * 1440 + to_minutes(row['time'])
+                entry = (start, start + int(round(float(row['duration']) * 60)), row['class_type'], row['school_id'])
+                if entry in self._pending:
+                    self._pending.remove(entry)
+                    continue
+                # Any class with the same interval, type and school will do; they are interchangeable here
+                lo, hi = np.searchsorted(self._starts, [start, start + 1])
+                for position in range(lo, hi):
+                    if (position not in drop and self._ends[position] == entry[1]
+                            and self._types[position] == entry[2] and self._schools[position] == entry[3]):
+                        drop.append(position)
+                        break
+            if drop:
+                self._starts = np.delete(self._starts, drop)
+                self._ends = np.delete(self._ends, drop)
+                self._types = np.delete(self._types, drop)
+                self._schools = np.delete(self._schools, drop)
+                self._max_ends = np.maximum.accumulate(self._ends) if len(self._ends) else self._ends
+
+    def _flush(self):
+        """Merge pending classes into the sorted arrays; the caller holds the lock."""
+        if not self._pending:
+            return
+        self._pending.sort(key=lambda entry: entry[0])
+        starts, ends, types, schools = (np.array(values) for values in zip(*self._pending))
+        # Insert the few new classes into place rather than sorting everything again
+        positions = np.searchsorted(self._starts, starts, side='right')
+        self._starts = np.insert(self._starts, positions, starts.astype('int64'))
+        self._ends = np.insert(self._ends, positions, ends.astype('int64'))
+        self._types = np.insert(self._types, positions, types.astype(object))
+        self._schools = np.insert(self._schools, positions, schools.astype(object))
+        self._max_ends = np.maximum.accumulate(self._ends)
+        self._pending = []
+
+    def _overlapping(self, start, end):
+        """Positions and pending entries of the classes overlapping [start, end); the caller holds the lock."""
+        # Classes before `first` all end by `start`; those from `last` on start at or after `end`
+        first = int(np.searchsorted(self._max_ends, start, side='right'))
+        last = int(np.searchsorted(self._starts, end, side='left'))
+        positions = np.arange(first, max(first, last))
+        positions = positions[self._ends[positions] > start]
+        pending = [entry for entry in self._pending if entry[0] < end and entry[1] > start]
+        return positions, pending
+
+    def conflicts(self, date, time, duration):
+        """Return the classes that overlap a class on `date` at `time` lasting `duration` hours."""
+        start = _day_number(date) * 1440 + to_minutes(time)
+        end = start + int(round(float(duration) * 60))
+        with self._lock:
+            positions, pending = self._overlapping(start, end)
+            starts = np.concatenate([self._starts[positions], np.array([entry[0] for entry in pending], dtype='int64')])
+            ends = np.concatenate([self._ends[positions], np.array([entry[1] for entry in pending], dtype='int64')])
+            types = list(self._types[positions]) + [entry[2] for entry in pending]
+            schools = list(self._schools[positions]) + [entry[3] for entry in pending]
+        return pd.DataFrame({
+            'date': (starts // 1440).astype('datetime64[D]').astype('datetime64[ns]'),
+            'time': starts % 1440,
+            'end': ends - starts // 1440 * 1440,
+            'duration': (ends - starts) / 60,
+            'class_type': types,
+            'school_id': schools,
+        })
+
+    def free_slots(self, date, duration=SLOT_MINUTES / 60):
+        """Return the start minutes of the calendar slots on `date` where a class of `duration` hours fits.
+
+        Candidate starts are the 30 minute slots between 06:00 and 22:00,
+        and the class has to end by 22:00.
+        """
+        day = _day_number(date) * 1440
+        length = int(round(float(duration) * 60))
+        slots = np.arange(DAY_START, DAY_END - length + 1, SLOT_MINUTES)
+        if not len(slots):
+            return []
+        with self._lock:
+            positions, pending = self._overlapping(day + DAY_START, day + DAY_END)
+            starts = np.concatenate([self._starts[positions], np.array([entry[0] for entry in pending], dtype='int64')]) - day
+            ends = np.concatenate([self._ends[positions], np.array([entry[1] for entry in pending], dtype='int64')]) - day
+        busy = (slots[:, None] < ends) & (slots[:, None] + length > starts)
+        return slots[~busy.any(axis=1)].tolist()
+
+def get_index(storage):
+    """Return the process-wide slot index for a storage backend, rebuilding it if the data changed."""
+    key = storage.cache_key()
+    signature = storage.signature()
+    with _index_cache_lock:
+        cached = _index_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    with instrumentation.span('schedule.rebuild') as span:
+        classes = storage.query_classes(columns=['date', 'time', 'duration', 'class_type', 'school_id'])
+        index = SlotIndex(classes)
+        span.rows = len(classes)
+    with _index_cache_lock:
+        _index_cache[key] = (signature, index)
+    return index
+
+
+def forget(storage):
+    """Drop the cached slot index of a storage backend."""
+    with _index_cache_lock:
+        _index_cache.pop(storage.cache_key(), None)
+
+
+def record_append(storage, rows, signature_before, signature_after):
+    """Update the cached slot index after `rows` were appended to `storage`.
+
+    If the cache no longer matches the data the append started from it is
+    dropped and rebuilt on the next check instead.
+    """
+    record_edit(storage, [], rows, signature_before, signature_after)
+
+
+def record_edit(storage, removed, added, signature_before, signature_after):
+    """Update the cached slot index after the `removed` class rows were replaced by the `added` ones."""
+    key = storage.cache_key()
+    with _index_cache_lock:
+        cached = _index_cache.get(key)
+        if cached is None or cached[0] == signature_after:
+            return
+        if cached[0] != signature_before:
+            del _index_cache[key]
+            return
+        cached[1].remove(removed)
+        cached[1].add(added)
+        _index_cache[key] = (signature_after, cached[1])
@@ -0,0 +1,183 @@
+import pandas as pd
+import numpy as np
+import threading
+
+from storage import SCHOOLS_COLUMNS
+
+# Registries shared by every session in the process, keyed on the storage
+# location and tagged with the schools signature they were built from
+_registry_cache = {}
+_registry_cache_lock = threading.Lock()
+
+# Serializes ID assignment and the append that follows it within the process
+_insert_lock = threading.Lock()
+
+
+def normalize_name(name):
+    """Key a school name the way users type it: trimmed and case-insensitive."""
+    return str(name).strip().lower()
+
+
+class SchoolRegistry:
+    """Schools with dict lookups by ID and by name.
+
+    New schools get compact integer IDs, one past the largest compact ID so
+    far. IDs hashed from names by older versions are kept as they are.
+    Every school also has a dense position, so a column of school IDs turns
+    into names with one array take instead of a merge.
+    """
+
+    # IDs at or above this are legacy 64-bit name hashes
+    COMPACT_LIMIT = 2 ** 31
+
+    def __init__(self, schools=None):
+        self._records = []
+        self._by_key = {}
+        self._by_name = {}
+        self._next_id = 1
+        if schools is not None:
+            for record in pd.DataFrame(schools, columns=SCHOOLS_COLUMNS).to_dict('records'):
+                if pd.isna(record['school_id']):
+                    continue
+                # The first row wins if older versions stored a school twice
+                if str(record['school_id']) not in self._by_key and normalize_name(record['name']) not in self._by_name:
+                    self._add(record)
+        self._build_arrays()
+
+    def _add(self, record):
+        school_id = int(record['school_id'])
+        record = {**record, 'school_id': school_id}
+        self._by_key[str(school_id)] = len(self._records)
+        self._by_name[normalize_name(record['name'])] = school_id
+        self._records.append(record)
+        if school_id < self.COMPACT_LIMIT:
+            self._next_id = max(self._next_id, school_id + 1)
+
+    def _build_arrays(self):
+        self._keys = pd.Index(list(self._by_key))
+        self._names = np.array([record['name'] for record in self._records] + [None], dtype=object)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, school_id):
+        return str(school_id) in self._by_key
+
+    @property
+    def by_name(self):
+        """Map of normalized school name to school ID."""
+        return self._by_name
+
+    @property
+    def by_id(self):
+        """Map of school ID, as text, to school ID."""
+        return {key: self._records[position]['school_id'] for key, position in self._by_key.items()}
+
+    def names(self):
+        """School names in the order they were added."""
+        return [record['name'] for record in self._records]
+
+    def id_for_name(self, name):
+        """Return the ID of the school with this name, or None."""
+        return self._by_name.get(normalize_name(name))
+
+    def get(self, school_id):
+        """Return the school record for an ID, or None."""
+        position = self._by_key.get(str(school_id))
+        return None if position is None else self._records[position]
+
+    def next_id(self):
+        return self._next_id
+
+    def check_new(self, school):
+        """Raise ValueError if a school with this name or ID is already registered."""
+        if not str(school.get('name') or '').strip():
+            raise ValueError("School name is required")
+        if normalize_name(school['name']) in self._by_name:
+            raise ValueError(f"A school named {school['name'].strip()} already exists")
+        if school.get('school_id') is not None and str(school['school_id']) in self._by_key:
+            raise ValueError(f"School ID {school['school_id']} is already taken")
+
+    def register(self, school):
+        """Check a new school, give it the next compact ID if it has none, and add it."""
+        self.check_new(school)
+        record = {column: school.get(column) for column in SCHOOLS_COLUMNS}
+        record['name'] = str(record['name']).strip()
+        if record['school_id'] is None:
+            record['school_id'] = self._next_id
+        self._add(record)
+        self._build_arrays()
+        return self._records[-1]
+
+    def to_frame(self):
+        return pd.DataFrame(self._records, columns=SCHOOLS_COLUMNS)
+
+    def names_for(self, school_ids, default=None):
+        """Return the school name of every ID in a column, as an array.
+
+        Categorical columns are looked up once per category and expanded
+        by their codes; unknown IDs get `default`.
+        """
+        names = self._names.copy()
+        names[-1] = default
+        school_ids = pd.Series(school_ids)
+        if isinstance(school_ids.dtype, pd.CategoricalDtype):
+            categories = self._keys.get_indexer(school_ids.cat.categories.astype(str))
+            # Missing values have code -1, which picks the appended -1
+            positions = np.append(categories, -1)[school_ids.cat.codes.to_numpy()]
+        else:
+            positions = self._keys.get_indexer(school_ids.astype(str))
+        return names.take(positions)
+
+
+def get_registry(storage):
+    """Return the process-wide school registry for a storage backend, rebuilding it if the schools changed."""
+    key = storage.cache_key()
+    signature = storage.schools_signature()
+    with _registry_cache_lock:
+        cached = _registry_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    registry = SchoolRegistry(storage.load_schools())
+    with _registry_cache_lock:
+        _registry_cache[key] = (signature, registry)
+    return registry
+
+
+def forget(storage):
+    """Drop the cached school registry of a storage backend."""
+    with _registry_cache_lock:
+        _registry_cache.pop(storage.cache_key(), None)
+
+
+def add_school(storage, school):
+    """Register a school and append it to storage; returns the saved record."""
+    with _insert_lock:
+        # Build a private copy so a failed append leaves the shared registry untouched
+        registry = SchoolRegistry(get_registry(storage).to_frame())
+        record = registry.register(school)
+        storage.append_schools([record])
+        with _registry_cache_lock:
+            _registry_cache[storage.cache_key()] = (storage.schools_signature(), registry)
+    return record
+
+
+def update_school(storage, school_id, changes):
+    """Change the name, address or contact of a school in storage; returns the updated record."""
+    with _insert_lock:
+        registry = get_registry(storage)
+        record = registry.get(school_id)
+        if record is None:
+            raise ValueError(f"No school with ID {school_id}")
+        record = {**record, **{column: changes[column] for column in ('name', 'address', 'contact') if column in changes}}
+        record['name'] = str(record['name'] or '').strip()
+        if not record['name']:
+            raise ValueError("School name is required")
+        taken = registry.id_for_name(record['name'])
+        if taken is not None and str(taken) != str(record['school_id']):
+            raise ValueError(f"A school named {record['name']} already exists")
+        storage.update_school(record)
+        registry = SchoolRegistry(storage.load_schools())
+        with _registry_cache_lock:
+            _registry_cache[storage.cache_key()] = (storage.schools_signature(), registry)
+    return registry.get(school_id)
@@ -0,0 +1,1504 @@
+import pandas as pd
+import numpy as np
+import argparse
+import csv
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
+
+import instrumentation
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized within this process
+    fcntl = None
+
+# pyarrow is imported by the parquet backend on first use, so the CSV and
+# SQLite backends start without paying for it
+pa = ds = pq = None
+
+CLASSES_COLUMNS = ['date', 'time', 'duration', 'class_type', 'school_id', 'price', 'notes']
+SCHOOLS_COLUMNS = ['school_id', 'name', 'address', 'contact']
+
+# Every class has a stable integer ID, stored after the other columns
+CLASS_ID = 'class_id'
+STORED_CLASSES_COLUMNS = CLASSES_COLUMNS + [CLASS_ID]
+
+# Rows of an edit log: the class, whether it was deleted, and otherwise its new values
+EDIT_COLUMNS = [CLASS_ID, 'deleted'] + CLASSES_COLUMNS
+
+# Changing any of these reprices a class unless the edit sets a price too
+PRICE_INPUTS = ('date', 'duration', 'class_type', 'school_id')
+
+# Parsed CSV files shared by every session in the process, keyed on
+# absolute path and validated against the file's mtime and size
+_frame_cache = {}
+_frame_cache_lock = threading.Lock()
+
+# Fallback locks used when fcntl is unavailable, one per data file
+_process_locks = {}
+_process_locks_guard = threading.Lock()
+
+
+def _file_signature(stat):
+    """Modification time, size and inode of a file; the inode changes when the file is replaced."""
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+@contextmanager
+def file_lock(file_path, exclusive=True):
+    """Lock a data file against other threads and processes.
+
+    The lock is taken on a sidecar `.lock` file so it survives the data file
+    being swapped out by os.replace. Readers take it shared, writers exclusive.
+    """
+    if fcntl is None:
+        with _process_locks_guard:
+            lock = _process_locks.setdefault(os.path.abspath(file_path), threading.RLock())
+        with lock:
+            yield
+        return
+
+    # Each open() gets its own lock owner, so threads block each other too
+    with open(file_path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+# In-memory dtypes of the classes table; dates and times are parsed separately
+CLASSES_DTYPES = {
+    'duration': 'float32',
+    'class_type': 'category',
+    'school_id': 'category',
+    'price': 'float32',
+    CLASS_ID: 'int64',
+}
+
+# On-disk layout of the parquet backend, set once pyarrow is imported;
+# school_id is a string for the same reason as in SQLite
+_PARQUET_SCHEMA = None
+
+
+def _import_pyarrow():
+    """Import pyarrow and build the parquet schema, once."""
+    global pa, ds, pq, _PARQUET_SCHEMA
+    if pa is not None:
+        return
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("The parquet backend needs pyarrow: pip install pyarrow") from None
+    _PARQUET_SCHEMA = pyarrow.schema([
+        ('date', pyarrow.date32()),
+        ('time', pyarrow.int16()),
+        ('duration', pyarrow.float32()),
+        ('class_type', pyarrow.string()),
+        ('school_id', pyarrow.string()),
+        ('price', pyarrow.float32()),
+        ('notes', pyarrow.string()),
+        (CLASS_ID, pyarrow.int64()),
+    ])
+    pa, ds, pq = pyarrow, pyarrow.dataset, pyarrow.parquet
+
+# Dtypes read_csv can apply directly; school_id is read as a number first so
+# its categories match the IDs in the schools table
+_CSV_READ_DTYPES = {
+    'time': str,
+    'duration': 'float32',
+    'class_type': 'category',
+    'price': 'float32',
+    # Text even when a batch has no notes, so appended rows concatenate without conversion
+    'notes': str,
+    CLASS_ID: 'int64',
+}
+# Tombstones leave school_id blank, which would read it as floats
+_EDIT_READ_DTYPES = {**_CSV_READ_DTYPES, 'deleted': 'int8', 'school_id': str}
+
+
+def _coerce_classes(df):
+    """Convert stored class rows to the compact in-memory schema.
+
+    Dates become datetime64, times become int16 minutes since midnight and
+    the remaining columns follow CLASSES_DTYPES.
+    """
+    if 'date' in df:
+        df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d')
+    if 'time' in df and not pd.api.types.is_integer_dtype(df['time']):
+        times = pd.to_datetime(df['time'], format='%H:%M', errors='coerce')
+        missing = times.isna()
+        if missing.any():
+            # Times written with seconds still count; only tombstones may leave the time blank
+            raw = df['time'][missing]
+            given = raw[raw.notna() & (raw.astype(str).str.strip() != '')]
+            with_seconds = pd.to_datetime(given, format='%H:%M:%S', errors='coerce')
+            if with_seconds.isna().any():
+                raise ValueError(f"Invalid class time: {given[with_seconds.isna()].iloc[0]!r}")
+            times[given.index] = with_seconds
+        df['time'] = (times.dt.hour * 60 + times.dt.minute).fillna(0).astype('int16')
+    if 'notes' in df:
+        # Blank notes read back as NaN from CSV and Parquet but as '' or NULL from SQLite
+        df['notes'] = df['notes'].fillna('')
+    return df.astype({column: dtype for column, dtype in CLASSES_DTYPES.items() if column in df})
+
+
+def _sort_classes(df):
+    """Order a typed classes frame by date, keeping rows of the same day in insertion order."""
+    return df.sort_values('date', kind='stable', ignore_index=True)
+
+
+def _concat_classes(frames):
+    """Concatenate typed classes frames, merging categories instead of falling back to objects."""
+    frames = [df for df in frames if not df.empty] or frames[:1]
+    for column in ('class_type', 'school_id'):
+        if all(column in df for df in frames):
+            categories = frames[0][column].cat.categories
+            for df in frames[1:]:
+                categories = categories.union(df[column].cat.categories)
+            frames = [df.assign(**{column: df[column].cat.set_categories(categories)}) for df in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _insert_sorted(df, new):
+    """Insert date-sorted `new` rows into the date-sorted frame `df`, after rows of the same day."""
+    merged = _concat_classes([df, new])
+    if df.empty or new.empty or new['date'].iloc[0] >= df['date'].iloc[-1]:
+        # Classes for the latest day or later just go on the end
+        return merged
+    positions = df['date'].searchsorted(new['date'], side='right')
+    order = np.insert(np.arange(len(df)), positions, np.arange(len(df), len(df) + len(new)))
+    return merged.take(order).reset_index(drop=True)
+
+
+def _filter_classes(df, start=None, end=None, class_types=None, school_id=None, columns=None):
+    """Apply the query_classes filters to a date-sorted classes frame.
+
+    The date range is two binary searches, so only the rows inside it are
+    looked at by the class type and school filters.
+    """
+    lo = 0 if start is None else df['date'].searchsorted(pd.Timestamp(start), side='left')
+    hi = len(df) if end is None else df['date'].searchsorted(pd.Timestamp(end) + timedelta(days=1), side='left')
+    df = df.iloc[lo:hi]
+    if class_types is not None:
+        df = df[df['class_type'].isin(list(class_types))]
+    if school_id is not None:
+        df = df[df['school_id'] == school_id]
+    return df[columns or CLASSES_COLUMNS]
+
+
+def _page_classes(df, start=None, end=None, class_types=None, school_id=None, columns=None, before=None, limit=50):
+    """Return one page of a date-sorted classes frame, newest first, and the cursor of the next page.
+
+    A cursor is (date, position among that day's classes), which later
+    appends never shift. Only rows just before the cursor are filtered,
+    in growing blocks, so the cost follows the page size rather than the
+    width of the date range. The next cursor is None on the last page.
+    """
+    dates = df['date']
+    lo = 0 if start is None else dates.searchsorted(pd.Timestamp(start), side='left')
+    hi = len(df) if end is None else dates.searchsorted(pd.Timestamp(end) + timedelta(days=1), side='left')
+    if class_types is not None and not list(class_types):
+        hi = lo
+    if before is not None:
+        day, ordinal = before
+        hi = min(hi, dates.searchsorted(pd.Timestamp(day), side='left') + int(ordinal))
+
+    picked, found, block = [], 0, max(limit * 4, 256)
+    while hi > lo and found <= limit:
+        first = max(lo, hi - block)
+        chunk = df.iloc[first:hi]
+        mask = np.ones(len(chunk), dtype=bool)
+        if class_types is not None:
+            mask &= chunk['class_type'].isin(list(class_types)).to_numpy()
+        if school_id is not None:
+            mask &= (chunk['school_id'] == school_id).to_numpy()
+        positions = np.flatnonzero(mask)[::-1] + first
+        picked.append(positions)
+        found += len(positions)
+        hi, block = first, block * 2
+
+    positions = np.concatenate(picked) if picked else np.array([], dtype='int64')
+    page = df.iloc[positions[:limit]]
+    cursor = None
+    if len(positions) > limit:
+        last = positions[limit - 1]
+        day = dates.iloc[last]
+        cursor = (_to_iso(day), int(last - dates.searchsorted(day, side='left')))
+    return page[columns or CLASSES_COLUMNS].reset_index(drop=True), cursor
+
+
+def _to_iso(day):
+    """Format a date bound the way dates are stored."""
+    return pd.Timestamp(day).strftime('%Y-%m-%d')
+
+
+def _parse_classes(df):
+    """Type and sort the rows of a classes file; files from before class IDs are numbered in file order."""
+    if CLASS_ID not in df:
+        df[CLASS_ID] = np.arange(1, len(df) + 1, dtype='int64')
+    return _sort_classes(_coerce_classes(df))
+
+
+def _parse_edits(df):
+    """Type the rows of an edit log; tombstones only carry their class ID."""
+    school_ids = df['school_id'].astype('category')
+    df['school_id'] = school_ids.cat.rename_categories(pd.to_numeric(school_ids.cat.categories))
+    return _coerce_classes(df)
+
+
+def _apply_edits(df, edits, start=None, end=None, class_types=None, school_id=None):
+    """Replace edited classes in a date-sorted frame with their latest version and drop deleted ones.
+
+    `df` holds the classes matching the query_classes filters, and the new
+    versions are filtered the same way. A changed class goes after the other
+    classes of its day, as if it had just been added.
+    """
+    if edits.empty:
+        return df
+    latest = edits.drop_duplicates(CLASS_ID, keep='last')
+    df = df[~df[CLASS_ID].isin(latest[CLASS_ID])]
+    updated = _sort_classes(latest[latest['deleted'] == 0])
+    return _insert_sorted(df, _filter_classes(updated, start, end, class_types, school_id, list(df.columns)))
+
+
+def _stored_time(value):
+    """Format a class time, as a time, minutes since midnight or text, as HH:MM; raises ValueError if it isn't one."""
+    if isinstance(value, dt_time):
+        return value.strftime('%H:%M')
+    if isinstance(value, str):
+        for time_format in ('%H:%M', '%H:%M:%S'):
+            try:
+                return datetime.strptime(value.strip(), time_format).strftime('%H:%M')
+            except ValueError:
+                pass
+    elif not pd.isna(value) and 0 <= int(value) < 24 * 60:
+        return f"{int(value) // 60:02d}:{int(value) % 60:02d}"
+    raise ValueError(f"Invalid class time: {value!r}")
+
+
+def _stored_values(values):
+    """Convert class values, typed or as entered in a form, to the text the stores write.
+
+    Raises ValueError for a time that can't be read rather than storing midnight.
+    """
+    row = dict(values)
+    if row.get('date') is not None:
+        row['date'] = _to_iso(row['date'])
+    if 'time' in row:
+        row['time'] = _stored_time(row['time'])
+    if 'notes' in row and not isinstance(row['notes'], str):
+        row['notes'] = '' if pd.isna(row['notes']) else str(row['notes'])
+    return row
+
+
+def _check_class_ids(classes_df, class_ids):
+    """Raise ValueError unless every class ID is in the frame."""
+    missing = pd.Index(class_ids).difference(classes_df[CLASS_ID])
+    if len(missing):
+        raise ValueError(f"No class with ID {missing[0]}")
+
+
+def _edited_rows(old, updates, reprice=None):
+    """Return the stored rows of the classes in the typed frame `old` once `updates` are applied.
+
+    `updates` maps class IDs to the new values of some columns. Classes whose
+    date, duration, type or school change get a new price from `reprice`,
+    unless the update sets the price too.
+    """
+    by_id = old.set_index(CLASS_ID)
+    rows, stale = [], []
+    for class_id, changes in updates.items():
+        row = _stored_values(by_id.loc[class_id, CLASSES_COLUMNS].to_dict())
+        row.update(_stored_values({column: value for column, value in changes.items() if column in CLASSES_COLUMNS}))
+        row[CLASS_ID] = class_id
+        rows.append(row)
+        if 'price' not in changes and any(column in changes for column in PRICE_INPUTS):
+            stale.append(row)
+    if reprice is not None and stale:
+        prices = reprice(_coerce_classes(pd.DataFrame(stale, columns=CLASSES_COLUMNS)))
+        for row, price in zip(stale, prices):
+            row['price'] = round(float(price), 2)
+    return rows
+
+
+def _log_edits(storage, writer, lock_file, find_classes, updates, deletes, reprice):
+    """Append updates and tombstones to the edit log of `storage`, as CsvStorage.edit_classes describes.
+
+    `writer` is the CSV store that writes the log, `lock_file` the file whose
+    lock guards the classes and `find_classes` looks classes up by ID.
+    """
+    deletes = [int(class_id) for class_id in deletes]
+    updates = {int(class_id): changes for class_id, changes in (updates or {}).items() if int(class_id) not in deletes}
+    class_ids = list(updates) + deletes
+    header = ','.join(EDIT_COLUMNS) + '\n'
+    while True:
+        # Look the classes up without the lock, then make sure nothing changed before logging
+        before = storage.signature()
+        old = find_classes(class_ids)
+        with file_lock(lock_file):
+            if storage.signature() != before:
+                continue
+            _check_class_ids(old, class_ids)
+            updated = _format_rows(EDIT_COLUMNS, ({**row, 'deleted': 0} for row in _edited_rows(old, updates, reprice)))
+            tombstones = _format_rows(EDIT_COLUMNS, ({CLASS_ID: class_id, 'deleted': 1} for class_id in deletes))
+            if not os.path.exists(storage.edits_file):
+                writer._replace_file(storage.edits_file, header)
+            writer._append_payload(storage.edits_file, EDIT_COLUMNS, updated + tombstones, os.path.getsize(storage.edits_file))
+            after = storage.signature()
+            break
+    # Parse the new versions from the text that was logged so they match a re-read
+    added = pd.read_csv(io.StringIO(header + updated), dtype=_EDIT_READ_DTYPES)
+    return before, after, old.reset_index(drop=True), _sort_classes(_parse_edits(added))[STORED_CLASSES_COLUMNS]
+
+
+def _format_rows(columns, rows):
+    """Format rows as CSV lines without a header."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore', lineterminator='\n')
+    for row in rows:
+        writer.writerow(row)
+    return buffer.getvalue()
+
+
+class CsvStorage:
+    """Classes and schools kept in two append-only CSV files.
+
+    Changed and deleted classes go to an edit log next to the classes file
+    (classes_edits.csv for classes.csv) and are applied on read, so a
+    correction appends one line instead of rewriting the history. Once the
+    log grows past `compact_bytes` it is folded into the classes file in
+    the background.
+    """
+
+    def __init__(self, classes_file='classes.csv', schools_file='schools.csv', edits=True, compact_bytes=256 * 1024):
+        self.classes_file = classes_file
+        self.schools_file = schools_file
+        self.edits_file = os.path.splitext(classes_file)[0] + '_edits.csv' if edits else None
+        self.compact_bytes = compact_bytes
+
+        # fsync once per append batch so saved rows survive a crash
+        self.fsync_writes = True
+
+        # Set once the classes file is known to have a class_id column
+        self._has_ids = False
+        self._compacting = threading.Lock()
+
+        # Initialize files with headers if they don't exist
+        if not os.path.exists(self.classes_file):
+            self._create_empty_file(self.classes_file, STORED_CLASSES_COLUMNS)
+
+        if not os.path.exists(self.schools_file):
+            self._create_empty_file(self.schools_file, SCHOOLS_COLUMNS)
+
+    def _create_empty_file(self, file_path, columns):
+        """Create an empty CSV file with just the header."""
+        with file_lock(file_path):
+            if not os.path.exists(file_path):
+                self._replace_file(file_path, ','.join(columns) + '\n')
+
+    def _replace_file(self, file_path, text):
+        """Write a whole file through a temp file and swap it in with os.replace."""
+        directory, name = os.path.split(os.path.abspath(file_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(text.encode('utf-8'))
+                f.flush()
+                if self.fsync_writes:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _read_csv(self, data, columns, dtypes=None):
+        try:
+            return pd.read_csv(io.BytesIO(data), dtype=dtypes)
+        except pd.errors.EmptyDataError:
+            return pd.DataFrame(columns=columns)
+
+    def _read_cached(self, file_path, columns, parse, dtypes=None):
+        """Return a shallow copy of the parsed file, re-reading it only when it changed on disk."""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        with _frame_cache_lock:
+            cached = _frame_cache.get(path)
+        if cached is not None and cached[0] == _file_signature(stat):
+            return cached[1].copy(deep=False)
+
+        # Copy the bytes under a shared lock so no append is seen half-written,
+        # then parse without holding up writers
+        with instrumentation.span('storage.read_csv') as span:
+            with file_lock(path, exclusive=False):
+                with open(path, 'rb') as f:
+                    stat = os.fstat(f.fileno())
+                    data = f.read()
+            df = parse(self._read_csv(data, columns, dtypes))
+            span.rows = len(df)
+            span.bytes = len(data)
+        # Count the read against the operation that caused it, too
+        instrumentation.add_bytes(len(data))
+        with _frame_cache_lock:
+            _frame_cache[path] = (_file_signature(stat), df)
+        # Callers may replace columns on the copy without touching the shared frame
+        return df.copy(deep=False)
+
+    def _read_classes(self):
+        """Return a shallow copy of the classes with the edit log applied, re-reading only when either file changed."""
+        path = os.path.abspath(self.classes_file)
+        with _frame_cache_lock:
+            cached = _frame_cache.get(path)
+        if cached is not None and cached[0] == self.signature():
+            return cached[1].copy(deep=False)
+
+        with instrumentation.span('storage.read_csv') as span:
+            # Edits are written under the classes file lock, so both files come from the same moment
+            with file_lock(path, exclusive=False):
+                signature = self.signature()
+                with open(path, 'rb') as f:
+                    data = f.read()
+                edits = b''
+                if signature[1] is not None:
+                    with open(self.edits_file, 'rb') as f:
+                        edits = f.read()
+            df = _parse_classes(self._read_csv(data, STORED_CLASSES_COLUMNS, _CSV_READ_DTYPES))
+            if edits:
+                df = _apply_edits(df, _parse_edits(self._read_csv(edits, EDIT_COLUMNS, _EDIT_READ_DTYPES)))
+            span.rows = len(df)
+            span.bytes = len(data) + len(edits)
+        instrumentation.add_bytes(len(data) + len(edits))
+        with _frame_cache_lock:
+            _frame_cache[path] = (signature, df)
+        return df.copy(deep=False)
+
+    def _invalidate(self, file_path):
+        """Drop the cached copy of a file after writing to it."""
+        with _frame_cache_lock:
+            _frame_cache.pop(os.path.abspath(file_path), None)
+
+    def cache_key(self):
+        return ('csv', os.path.abspath(self.classes_file))
+
+    def release(self):
+        """Drop the parsed copies of this store's files from the shared cache."""
+        self._invalidate(self.classes_file)
+        self._invalidate(self.schools_file)
+
+    def signature(self):
+        """Return a value that changes whenever the classes file or its edit log changes."""
+        return _file_signature(os.stat(self.classes_file)), self._edits_signature()
+
+    def _edits_signature(self):
+        if self.edits_file is None or not os.path.exists(self.edits_file):
+            return None
+        return _file_signature(os.stat(self.edits_file))
+
+    def schools_signature(self):
+        """Return a value that changes whenever the schools file changes."""
+        return _file_signature(os.stat(self.schools_file))
+
+    def load_classes(self):
+        return self._read_classes()
+
+    def load_schools(self):
+        # Contacts stay text so phone numbers keep their leading zero
+        return self._read_cached(self.schools_file, SCHOOLS_COLUMNS, lambda df: df, {'name': str, 'address': str, 'contact': str})
+
+    def query_classes(self, start=None, end=None, class_types=None, school_id=None, columns=None):
+        """Slice the cached, date-sorted classes frame by inclusive date range, type and school."""
+        return _filter_classes(self.load_classes(), start, end, class_types, school_id, columns)
+
+    def query_page(self, start=None, end=None, class_types=None, school_id=None, columns=None, before=None, limit=50):
+        """Return up to `limit` matching classes older than the cursor, newest first, and the next cursor."""
+        return _page_classes(self.load_classes(), start, end, class_types, school_id, columns, before, limit)
+
+    def date_bounds(self):
+        """Return the first and last class date, or None when there are no classes."""
+        dates = self.load_classes()['date']
+        if dates.empty:
+            return None
+        return dates.iloc[0], dates.iloc[-1]
+
+    def append_classes(self, rows):
+        """Append classes, numbered after the last class ID, and return the signatures from just before and after the write."""
+        with file_lock(self.classes_file):
+            self._add_class_ids()
+            before = self.signature()
+            first_id = self._last_class_id() + 1
+            payload = _format_rows(
+                STORED_CLASSES_COLUMNS, ({**_stored_values(row), CLASS_ID: first_id + i} for i, row in enumerate(rows))
+            )
+            if payload:
+                self._append_payload(self.classes_file, STORED_CLASSES_COLUMNS, payload, before[0][1])
+            after = self.signature()
+        self._insert_cached(before, after, payload)
+        return before, after
+
+    def append_schools(self, rows):
+        self._append_rows(self.schools_file, SCHOOLS_COLUMNS, rows)
+        self._invalidate(self.schools_file)
+
+    def _id_floor(self):
+        """Class IDs start after this one in an empty file."""
+        return 0
+
+    def _last_class_id(self):
+        """Return the ID on the last line of the classes file; the caller holds the file lock."""
+        with open(self.classes_file, 'rb') as f:
+            f.seek(max(0, f.seek(0, os.SEEK_END) - 4096))
+            lines = f.read().split(b'\n')
+        for line in reversed(lines):
+            if line.strip():
+                # The ID is the last column and never quoted, even after a multi-line note
+                last = line.rsplit(b',', 1)[-1].strip()
+                return int(last) if last.isdigit() else self._id_floor()
+        return self._id_floor()
+
+    def _add_class_ids(self):
+        """Number the rows of a classes file written before classes had IDs; the caller holds the file lock.
+
+        Rows are numbered in file order, the same IDs reads have been giving them.
+        """
+        if self._has_ids:
+            return
+        with open(self.classes_file, 'rb') as f:
+            header = f.readline().decode('utf-8').strip().split(',')
+        if header != [''] and CLASS_ID not in header:
+            raw = pd.read_csv(self.classes_file, dtype=str, keep_default_na=False)
+            first_id = self._id_floor() + 1
+            raw[CLASS_ID] = np.arange(first_id, first_id + len(raw))
+            self._replace_file(self.classes_file, raw.to_csv(index=False, lineterminator='\n'))
+            self._invalidate(self.classes_file)
+        self._has_ids = True
+
+    def edit_classes(self, updates=None, deletes=(), reprice=None):
+        """Log changed and deleted classes instead of rewriting the classes file.
+
+        `updates` maps class IDs to the new values of some columns and
+        `deletes` lists the IDs of classes to remove; `reprice` prices
+        classes whose date, duration, type or school changed. Returns the
+        signatures from just before and after the write, the affected classes
+        as they were, and the new versions of the updated ones.
+        """
+        with file_lock(self.classes_file):
+            self._add_class_ids()
+        before, after, old, added = _log_edits(self, self, self.classes_file, self._find_classes, updates, deletes, reprice)
+        self._patch_cached(before, after, added, old[CLASS_ID])
+        if after[1][1] >= self.compact_bytes and not self._compacting.locked():
+            threading.Thread(target=self.compact, daemon=True).start()
+        return before, after, old, added
+
+    def _find_classes(self, class_ids):
+        """Return the classes with these IDs as they are now."""
+        classes = self.load_classes()
+        return classes[classes[CLASS_ID].isin(class_ids)]
+
+    def compact(self):
+        """Fold the edit log into the classes file and start a new log."""
+        if self.edits_file is None or not self._compacting.acquire(blocking=False):
+            return
+        try:
+            with file_lock(self.classes_file):
+                self._compact_locked()
+        finally:
+            self._compacting.release()
+
+    def _compact_locked(self):
+        """Rewrite the classes file with the edit log applied; the caller holds the file lock.
+
+        Changed classes keep their place in the file and deleted ones are
+        dropped, so the file stays in ID order.
+        """
+        if self.edits_file is None or not os.path.exists(self.edits_file):
+            return
+        edits = pd.read_csv(self.edits_file, dtype=str, keep_default_na=False)
+        if edits.empty:
+            return
+        self._add_class_ids()
+        try:
+            # Every column stays text so the rest of each row is written back untouched
+            raw = pd.read_csv(self.classes_file, dtype=str, keep_default_na=False)
+        except pd.errors.EmptyDataError:
+            raw = pd.DataFrame(columns=STORED_CLASSES_COLUMNS)
+        latest = edits.drop_duplicates(CLASS_ID, keep='last').set_index(CLASS_ID)
+        updated = latest[latest['deleted'] == '0']
+        changed = raw[CLASS_ID].isin(updated.index)
+        raw.loc[changed, CLASSES_COLUMNS] = updated.loc[raw.loc[changed, CLASS_ID], CLASSES_COLUMNS].to_numpy()
+        raw = raw[~raw[CLASS_ID].isin(latest.index[latest['deleted'] != '0'])]
+        self._replace_file(self.classes_file, raw.to_csv(index=False, lineterminator='\n'))
+        self._replace_file(self.edits_file, ','.join(EDIT_COLUMNS) + '\n')
+        # Same classes, but changed ones are back in their original place within the day
+        self._invalidate(self.classes_file)
+
+    def update_prices(self, reprice, start=None, end=None):
+        """Rewrite the price of the classes in an inclusive date range.
+
+        `reprice` gets the typed classes in the range and returns their new
+        prices. Returns the number of classes whose price changed.
+        """
+        with file_lock(self.classes_file):
+            # Fold in the edit log first so every class is in the file as it is now
+            self._compact_locked()
+            try:
+                # Every column stays text so the rest of each row is written back untouched
+                raw = pd.read_csv(self.classes_file, dtype=str, keep_default_na=False)
+            except pd.errors.EmptyDataError:
+                return 0
+            typed = _coerce_classes(raw.astype(_CSV_READ_DTYPES))
+            in_range = pd.Series(True, index=typed.index)
+            if start is not None:
+                in_range &= typed['date'] >= pd.Timestamp(start)
+            if end is not None:
+                in_range &= typed['date'] < pd.Timestamp(end) + timedelta(days=1)
+            if not in_range.any():
+                return 0
+            old_prices = typed.loc[in_range, 'price'].to_numpy(dtype='float64')
+            new_prices = np.asarray(reprice(typed.loc[in_range]), dtype='float64')
+            changed = int((np.abs(new_prices - old_prices) > 0.005).sum())
+            if changed:
+                raw.loc[in_range, 'price'] = pd.Series(new_prices, index=raw.index[in_range]).astype(str)
+                self._replace_file(self.classes_file, raw.to_csv(index=False, lineterminator='\n'))
+        self._invalidate(self.classes_file)
+        return changed
+
+    def update_school(self, record):
+        """Rewrite the schools file with the name, address and contact of one school replaced."""
+        with file_lock(self.schools_file):
+            raw = pd.read_csv(self.schools_file, dtype=str, keep_default_na=False)
+            match = raw['school_id'] == str(record['school_id'])
+            if not match.any():
+                raise ValueError(f"No school with ID {record['school_id']}")
+            for column in ('name', 'address', 'contact'):
+                raw.loc[match, column] = '' if record.get(column) is None else str(record[column])
+            self._replace_file(self.schools_file, raw.to_csv(index=False, lineterminator='\n'))
+        self._invalidate(self.schools_file)
+
+    def _insert_cached(self, before, after, payload):
+        """Patch the cached classes frame with rows just appended instead of re-reading the file."""
+        # Parse exactly the text that was written so the cache matches a re-read
+        self._patch_cached(before, after, self._parse_payload(payload))
+
+    def _parse_payload(self, payload):
+        new = pd.read_csv(io.StringIO(','.join(STORED_CLASSES_COLUMNS) + '\n' + payload), dtype=_CSV_READ_DTYPES)
+        return _sort_classes(_coerce_classes(new))
+
+    def _patch_cached(self, before, after, new, removed=()):
+        """Swap the cached classes frame at signature `before` for one at `after`, without the `removed` IDs and with `new` rows."""
+        path = os.path.abspath(self.classes_file)
+        with _frame_cache_lock:
+            cached = _frame_cache.get(path)
+            if cached is not None and cached[0] == after:
+                return
+            if cached is None or cached[0] != before:
+                # Someone else changed the file too; read it afresh next time
+                _frame_cache.pop(path, None)
+                return
+            df = cached[1]
+            if len(removed):
+                df = df[~df[CLASS_ID].isin(removed)]
+            _frame_cache[path] = (after, _insert_sorted(df, new))
+
+    def read_changes(self, since):
+        """Return the classes appended since signature `since`, and the current signature.
+
+        Only the bytes written after that point are read. The classes are
+        None when the file was rewritten rather than appended to, or classes
+        were edited, and everything has to be read again.
+        """
+        path = os.path.abspath(self.classes_file)
+        with file_lock(path, exclusive=False):
+            with open(path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                current = _file_signature(stat), self._edits_signature()
+                if since is not None and current == since:
+                    return self._parse_payload(''), current
+                if since is None or current[1] != since[1] or stat.st_ino != since[0][2] or stat.st_size < since[0][1]:
+                    return None, current
+                f.seek(since[0][1])
+                data = f.read()
+        instrumentation.add_bytes(len(data))
+        new = self._parse_payload(data.decode('utf-8'))
+        self._patch_cached(since, current, new)
+        return new, current
+
+    def _append_rows(self, file_path, columns, rows):
+        """Append rows to a CSV file without rewriting the existing data.
+
+        Returns the file signatures from just before and after the write and
+        the text that was appended.
+        """
+        payload = _format_rows(columns, rows)
+        with file_lock(file_path):
+            before = os.stat(file_path)
+            if payload:
+                self._append_payload(file_path, columns, payload, before.st_size)
+            after = os.stat(file_path)
+        return _file_signature(before), _file_signature(after), payload
+
+    def _append_payload(self, file_path, columns, payload, size):
+        """Write the payload after the last complete row; the caller holds the file lock."""
+        header = ','.join(columns) + '\n'
+        with open(file_path, 'r+b') as f:
+            if size <= len(header) and not f.read().strip():
+                # Blank placeholder file: replace it with a header and the new rows
+                f.close()
+                self._replace_file(file_path, header + payload)
+                return
+            f.seek(size - 1)
+            prefix = '' if f.read(1) in (b'\n', b'\r') else '\n'
+            try:
+                # A single write per batch keeps the rows together on disk
+                f.seek(size)
+                f.write((prefix + payload).encode('utf-8'))
+                f.flush()
+                if self.fsync_writes:
+                    os.fsync(f.fileno())
+            except BaseException:
+                # Don't leave a partial row behind for readers to trip over
+                f.truncate(size)
+                raise
+
+
+def _select_columns(columns):
+    """SQL column list for class columns; class IDs are the rowid."""
+    return ', '.join(f'id AS {CLASS_ID}' if column == CLASS_ID else column for column in columns)
+
+
+class SqliteStorage:
+    """Classes and schools kept in a SQLite database with indexed filter columns."""
+
+    def __init__(self, db_file='tracker.db'):
+        self.db_file = db_file
+        # sqlite3 connections can't be shared across Streamlit's session threads
+        self._local = threading.local()
+        # Every thread's open connection, so release() can close them all
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        self._create_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        with self._connections_lock:
+            if conn is not None and conn in self._connections:
+                return conn
+        # Wait for other writers instead of failing with "database is locked".
+        # Each connection is still only used by the thread that opened it;
+        # check_same_thread is off so release() can close it from another.
+        conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with self._connections_lock:
+            self._connections.add(conn)
+        self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self._connect()
+        with conn:
+            # school_id is TEXT because the hashed IDs don't fit in a signed 64-bit integer
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS classes (
+                    id INTEGER PRIMARY KEY,
+                    date TEXT NOT NULL,
+                    time TEXT,
+                    duration REAL,
+                    class_type TEXT,
+                    school_id TEXT,
+                    price REAL,
+                    notes TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_classes_date ON classes (date, class_type);
+                CREATE INDEX IF NOT EXISTS idx_classes_date_id ON classes (date, id);
+                CREATE INDEX IF NOT EXISTS idx_classes_school_id ON classes (school_id);
+                CREATE INDEX IF NOT EXISTS idx_classes_class_type ON classes (class_type);
+                CREATE TABLE IF NOT EXISTS schools (
+                    school_id TEXT,
+                    name TEXT,
+                    address TEXT,
+                    contact TEXT
+                );
+            """)
+
+    def _read_classes(self, where='', params=(), columns=None, order='date, id'):
+        columns = columns or STORED_CLASSES_COLUMNS
+        with instrumentation.span('storage.sqlite_query') as span:
+            cursor = self._connect().execute(
+                f"SELECT {_select_columns(columns)} FROM classes {where} ORDER BY {order}", params
+            )
+            df = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+            span.rows = len(df)
+        if 'school_id' in df:
+            df['school_id'] = pd.to_numeric(df['school_id'])
+        return _coerce_classes(df)
+
+    def cache_key(self):
+        return ('sqlite', os.path.abspath(self.db_file))
+
+    def release(self):
+        """Close the connections of every thread; the database itself caches nothing in the process.
+
+        A thread that uses the storage again afterwards opens a new connection.
+        """
+        with self._connections_lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+        self._local.conn = None
+
+    def signature(self):
+        """Return a value that changes whenever classes are added, edited or repriced."""
+        return self._signature(self._connect())
+
+    def schools_signature(self):
+        """Return a value that changes whenever schools are added."""
+        return self._connect().execute('SELECT COUNT(*), MAX(rowid) FROM schools').fetchone()
+
+    def _signature(self, conn):
+        # user_version counts in-place rewrites, MAX(id) covers appends
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        return version, conn.execute('SELECT MAX(id) FROM classes').fetchone()[0]
+
+    def read_changes(self, since):
+        """Return the classes inserted since the database had signature `since`, and the current signature.
+
+        The classes are None when rows were rewritten in place, and the
+        table has to be read again in full.
+        """
+        conn = self._connect()
+        # One read transaction so the rows and the signature come from the same snapshot
+        conn.execute('BEGIN')
+        try:
+            current = self._signature(conn)
+            if since is None or current[0] != since[0]:
+                return None, current
+            # Walk the primary key rather than the date index, which would visit every row
+            new = _sort_classes(self._read_classes('WHERE id > ?', (since[1] or 0,), order='id'))
+        finally:
+            conn.commit()
+        return new, current
+
+    def load_classes(self):
+        return self._read_classes()
+
+    def load_schools(self):
+        df = pd.read_sql_query(f"SELECT {', '.join(SCHOOLS_COLUMNS)} FROM schools", self._connect())
+        df['school_id'] = pd.to_numeric(df['school_id'])
+        return df
+
+    def _filters(self, start=None, end=None, class_types=None, school_id=None):
+        """Build the WHERE clauses and parameters of the query_classes filters."""
+        clauses, params = [], []
+        if start is not None:
+            clauses.append('date >= ?')
+            params.append(_to_iso(start))
+        if end is not None:
+            clauses.append('date <= ?')
+            params.append(_to_iso(end))
+        if class_types is not None:
+            class_types = list(class_types)
+            if not class_types:
+                return ['0'], []
+            clauses.append(f"class_type IN ({', '.join('?' * len(class_types))})")
+            params.extend(class_types)
+        if school_id is not None:
+            clauses.append('school_id = ?')
+            params.append(str(school_id))
+        return clauses, params
+
+    def query_classes(self, start=None, end=None, class_types=None, school_id=None, columns=None):
+        """Run the date range, class type and school filters as an indexed SQL query."""
+        clauses, params = self._filters(start, end, class_types, school_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self._read_classes(where, params, columns or CLASSES_COLUMNS)
+
+    def query_page(self, start=None, end=None, class_types=None, school_id=None, columns=None, before=None, limit=50):
+        """Fetch one page newest first with a keyset query; the cursor is the last row's (date, id)."""
+        columns = columns or CLASSES_COLUMNS
+        clauses, params = self._filters(start, end, class_types, school_id)
+        if before is not None:
+            clauses.append('(date, id) < (?, ?)')
+            params.extend([before[0], int(before[1])])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with instrumentation.span('storage.sqlite_query') as span:
+            rows = self._connect().execute(
+                f"SELECT date, id, {_select_columns(columns)} FROM classes {where} ORDER BY date DESC, id DESC LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+            span.rows = len(rows)
+        cursor = (rows[limit - 1][0], rows[limit - 1][1]) if len(rows) > limit else None
+        df = pd.DataFrame.from_records([row[2:] for row in rows[:limit]], columns=columns)
+        if 'school_id' in df:
+            df['school_id'] = pd.to_numeric(df['school_id'])
+        return _coerce_classes(df), cursor
+
+    def date_bounds(self):
+        first, last = self._connect().execute('SELECT MIN(date), MAX(date) FROM classes').fetchone()
+        if first is None:
+            return None
+        return pd.Timestamp(first), pd.Timestamp(last)
+
+    def append_classes(self, rows):
+        """Insert classes and return the signatures from just before and after the write."""
+        conn = self._connect()
+        # Take the write lock up front so the signatures bracket exactly this insert
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            before = self._signature(conn)
+            conn.executemany(
+                f"INSERT INTO classes ({', '.join(CLASSES_COLUMNS)}) VALUES ({', '.join('?' * len(CLASSES_COLUMNS))})",
+                (self._class_values(_stored_values(row)) for row in rows)
+            )
+            after = self._signature(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return before, after
+
+    def append_schools(self, rows):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO schools ({', '.join(SCHOOLS_COLUMNS)}) VALUES ({', '.join('?' * len(SCHOOLS_COLUMNS))})",
+                ((str(row['school_id']), row.get('name'), row.get('address'), row.get('contact')) for row in rows)
+            )
+
+    def update_prices(self, reprice, start=None, end=None):
+        """Rewrite the price of the classes in an inclusive date range, in one transaction."""
+        conn = self._connect()
+        clauses, params = [], []
+        if start is not None:
+            clauses.append('date >= ?')
+            params.append(_to_iso(start))
+        if end is not None:
+            clauses.append('date <= ?')
+            params.append(_to_iso(end))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            columns = ['id'] + CLASSES_COLUMNS
+            cursor = conn.execute(f"SELECT {', '.join(columns)} FROM classes {where}", params)
+            df = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+            df['school_id'] = pd.to_numeric(df['school_id'])
+            df = _coerce_classes(df)
+            new_prices = np.asarray(reprice(df), dtype='float64')
+            changed = np.abs(new_prices - df['price'].to_numpy(dtype='float64')) > 0.005
+            conn.executemany(
+                'UPDATE classes SET price = ? WHERE id = ?',
+                zip(new_prices[changed].tolist(), df['id'].to_numpy()[changed].tolist())
+            )
+            if changed.any():
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                conn.execute(f'PRAGMA user_version = {version + 1}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return int(changed.sum())
+
+    def edit_classes(self, updates=None, deletes=(), reprice=None):
+        """Update and delete classes in place, in one transaction.
+
+        Takes and returns the same values as CsvStorage.edit_classes.
+        """
+        deletes = [int(class_id) for class_id in deletes]
+        updates = {int(class_id): changes for class_id, changes in (updates or {}).items() if int(class_id) not in deletes}
+        ids = list(updates) + deletes
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            before = self._signature(conn)
+            where = f"WHERE id IN ({', '.join('?' * len(ids))})"
+            old = self._read_classes(where, ids)
+            _check_class_ids(old, ids)
+            conn.executemany(
+                f"UPDATE classes SET {', '.join(f'{column} = ?' for column in CLASSES_COLUMNS)} WHERE id = ?",
+                (self._class_values(row) + (row[CLASS_ID],) for row in _edited_rows(old, updates, reprice))
+            )
+            conn.executemany('DELETE FROM classes WHERE id = ?', ((class_id,) for class_id in deletes))
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            conn.execute(f'PRAGMA user_version = {version + 1}')
+            added = self._read_classes(f"WHERE id IN ({', '.join('?' * len(updates))})", list(updates))
+            after = self._signature(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return before, after, old, added
+
+    def update_school(self, record):
+        """Replace the name, address and contact of one school."""
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                'UPDATE schools SET name = ?, address = ?, contact = ? WHERE school_id = ?',
+                (record.get('name'), record.get('address'), record.get('contact'), str(record['school_id']))
+            )
+            if not cursor.rowcount:
+                raise ValueError(f"No school with ID {record['school_id']}")
+
+    def _class_values(self, row):
+        return (
+            _to_iso(row['date']),
+            row.get('time'),
+            float(row['duration']),
+            row.get('class_type'),
+            str(row['school_id']),
+            float(row['price']),
+            row.get('notes'),
+        )
+
+    def import_csv(self, classes_file='classes.csv', schools_file='schools.csv', chunksize=50_000):
+        """Copy the rows of the CSV store into this database in chunks."""
+        if os.path.exists(classes_file):
+            # Pending edits go into the CSV file first so the rows are copied as they are now
+            CsvStorage(classes_file, schools_file).compact()
+        conn = self._connect()
+        for file_path, table, columns in (
+            (schools_file, 'schools', SCHOOLS_COLUMNS),
+            (classes_file, 'classes', CLASSES_COLUMNS),
+        ):
+            if not os.path.exists(file_path):
+                continue
+            try:
+                for chunk in pd.read_csv(file_path, chunksize=chunksize, dtype={'school_id': str}):
+                    # Classes keep the IDs they had in the CSV store
+                    names = columns + ([CLASS_ID] if table == 'classes' and CLASS_ID in chunk else [])
+                    insert = (
+                        f"INSERT INTO {table} ({', '.join('id' if name == CLASS_ID else name for name in names)}) "
+                        f"VALUES ({', '.join('?' * len(names))})"
+                    )
+                    chunk = chunk[names].astype(object).where(chunk[names].notna(), None)
+                    with conn:
+                        conn.executemany(insert, chunk.itertuples(index=False, name=None))
+            except pd.errors.EmptyDataError:
+                continue
+        # Refresh the planner statistics so range queries pick the date index
+        conn.execute('ANALYZE')
+
+
+class _ParquetDelta(CsvStorage):
+    """The CSV delta of a parquet store, numbering new classes after those in the partitions."""
+
+    def __init__(self, store):
+        # Edits of a parquet store cover the partitions too, so the store keeps the log
+        super().__init__(os.path.join(store.data_dir, 'delta.csv'), os.path.join(store.data_dir, 'schools.csv'), edits=False)
+        self.store = store
+
+    def _id_floor(self):
+        return self.store._last_class_id()
+
+
+class ParquetStorage:
+    """Classes kept as Parquet files partitioned by month, plus a CSV delta of recent writes.
+
+    New classes are appended to `delta.csv` and edits to `edits.csv`; both
+    are folded into the monthly partitions by compact(), which runs in the
+    background once either grows past `compact_bytes`. Schools stay in a
+    plain CSV file.
+    """
+
+    def __init__(self, data_dir='parquet', compact_bytes=256 * 1024):
+        _import_pyarrow()
+        self.data_dir = data_dir
+        self.classes_dir = os.path.join(data_dir, 'classes')
+        self.manifest_file = os.path.join(data_dir, 'manifest')
+        self.edits_file = os.path.join(data_dir, 'edits.csv')
+        self.compact_bytes = compact_bytes
+        os.makedirs(self.classes_dir, exist_ok=True)
+        if not os.path.exists(self.manifest_file):
+            open(self.manifest_file, 'a').close()
+
+        # The delta and schools files reuse the locked, append-only CSV store
+        self.delta = _ParquetDelta(self)
+        self._compacting = threading.Lock()
+        with file_lock(self.delta.classes_file):
+            self._add_class_ids()
+
+    @property
+    def fsync_writes(self):
+        return self.delta.fsync_writes
+
+    @fsync_writes.setter
+    def fsync_writes(self, value):
+        self.delta.fsync_writes = value
+
+    def _dataset(self):
+        month = pa.field('month', pa.string())
+        return ds.dataset(
+            self.classes_dir,
+            format='parquet',
+            schema=_PARQUET_SCHEMA.append(month),
+            partitioning=ds.partitioning(pa.schema([month]), flavor='hive')
+        )
+
+    def _to_frame(self, table):
+        """Convert scanned partition rows to a typed classes frame."""
+        # Dictionary-encode the repetitive string columns so they arrive as categoricals
+        for name in ('class_type', 'school_id'):
+            if name in table.column_names:
+                table = table.set_column(table.column_names.index(name), name, table[name].dictionary_encode())
+        df = table.to_pandas(date_as_object=False)
+        if 'school_id' in df:
+            categories = df['school_id'].cat.categories
+            df['school_id'] = df['school_id'].cat.rename_categories(pd.to_numeric(categories))
+        return _coerce_classes(df)
+
+    def _load_edits(self):
+        """Return the parsed edit log; the caller holds the delta lock."""
+        if not os.path.exists(self.edits_file):
+            return _parse_edits(pd.DataFrame(columns=EDIT_COLUMNS))
+        return self.delta._read_cached(self.edits_file, EDIT_COLUMNS, _parse_edits, _EDIT_READ_DTYPES)
+
+    def _read(self, start=None, end=None, class_types=None, school_id=None, columns=None):
+        """Read matching classes from the partitions, the delta and the edit log as one snapshot."""
+        columns = columns or STORED_CLASSES_COLUMNS
+        expression = ds.scalar(True)
+        if start is not None:
+            start = pd.Timestamp(start)
+            # The month bound prunes whole partitions, the date bound row groups
+            expression &= (ds.field('month') >= start.strftime('%Y-%m')) & (ds.field('date') >= start.date())
+        if end is not None:
+            end = pd.Timestamp(end)
+            expression &= (ds.field('month') <= end.strftime('%Y-%m')) & (ds.field('date') <= end.date())
+        if class_types is not None:
+            # pyarrow can't infer a value type from an empty list
+            class_types = list(class_types)
+            expression &= ds.field('class_type').isin(class_types) if class_types else ds.scalar(False)
+        if school_id is not None:
+            expression &= ds.field('school_id') == str(school_id)
+
+        # Compaction holds the delta lock exclusively while it moves rows into the partitions
+        with instrumentation.span('storage.parquet_scan') as span:
+            with file_lock(self.delta.classes_file, exclusive=False):
+                edits = self._load_edits()
+                # Edited classes are matched by ID, so read the IDs even when they weren't asked for
+                scan = columns if edits.empty or CLASS_ID in columns else columns + [CLASS_ID]
+                table = self._dataset().to_table(columns=scan, filter=expression)
+                delta = self.delta.query_classes(start, end, class_types, school_id, scan)
+            span.rows = table.num_rows
+            span.bytes = table.nbytes
+        instrumentation.add_bytes(table.nbytes)
+
+        df = self._to_frame(table)
+        if not delta.empty:
+            df = _sort_classes(_concat_classes([df, delta]))
+        if not edits.empty:
+            df = _apply_edits(df, edits, start, end, class_types, school_id)[columns]
+        return df
+
+    def _find_classes(self, class_ids):
+        """Read the classes with these IDs as they are now."""
+        with file_lock(self.delta.classes_file, exclusive=False):
+            edits = self._load_edits()
+            table = self._dataset().to_table(columns=STORED_CLASSES_COLUMNS, filter=ds.field(CLASS_ID).isin(class_ids))
+            delta = self.delta.load_classes()
+        df = _sort_classes(_concat_classes([self._to_frame(table), delta[delta[CLASS_ID].isin(class_ids)]]))
+        df = _apply_edits(df, edits)
+        return df[df[CLASS_ID].isin(class_ids)]
+
+    def cache_key(self):
+        return ('parquet', os.path.abspath(self.data_dir))
+
+    def release(self):
+        """Drop the parsed delta, edit log and schools files from the shared cache."""
+        self.delta.release()
+        self.delta._invalidate(self.edits_file)
+
+    def _manifest_signature(self):
+        manifest = os.stat(self.manifest_file)
+        return manifest.st_mtime_ns, manifest.st_size
+
+    def _edits_signature(self):
+        if not os.path.exists(self.edits_file):
+            return None
+        return _file_signature(os.stat(self.edits_file))
+
+    def read_changes(self, since):
+        """Return the classes appended since signature `since`, and the current signature.
+
+        The classes are None once the delta has been compacted, classes
+        edited or prices rewritten, and everything has to be read again.
+        """
+        manifest, edits = self._manifest_signature(), self._edits_signature()
+        if since is None or manifest != since[0] or edits != since[2]:
+            return None, (manifest, self.delta.signature(), edits)
+        new, delta = self.delta.read_changes(since[1])
+        return new, (manifest, delta, edits)
+
+    def signature(self):
+        """Return a value that changes whenever classes are added, edited or compacted."""
+        return self._manifest_signature(), self.delta.signature(), self._edits_signature()
+
+    def schools_signature(self):
+        return self.delta.schools_signature()
+
+    def load_classes(self):
+        return self._read()
+
+    def load_schools(self):
+        return self.delta.load_schools()
+
+    def query_classes(self, start=None, end=None, class_types=None, school_id=None, columns=None):
+        """Read only the requested columns of the partitions overlapping the date range."""
+        return self._read(start, end, class_types, school_id, columns or CLASSES_COLUMNS)
+
+    def query_page(self, start=None, end=None, class_types=None, school_id=None, columns=None, before=None, limit=50):
+        """Return one page of classes newest first, reading month partitions backwards until it is full.
+
+        Cursors are (date, position among that day's classes) as in the CSV store.
+        """
+        if class_types is not None and not list(class_types):
+            return _page_classes(self.delta.load_classes(), class_types=[], columns=columns, limit=limit)
+        months = {partition.split('=', 1)[-1] for partition in os.listdir(self.classes_dir)}
+        months |= set(self.delta.load_classes()['date'].dt.strftime('%Y-%m'))
+        # Edited classes may have moved to a month nothing else is in
+        with file_lock(self.delta.classes_file, exclusive=False):
+            edits = self._load_edits()
+        months |= set(edits.loc[edits['deleted'] == 0, 'date'].dt.strftime('%Y-%m'))
+        last = before[0] if before is not None else end
+        months = sorted(
+            (month for month in months
+             if (start is None or month >= pd.Timestamp(start).strftime('%Y-%m'))
+             and (last is None or month <= pd.Timestamp(last).strftime('%Y-%m'))),
+            reverse=True
+        )
+
+        # Read whole months, newest first, until they hold more than a page of matches;
+        # whole days keep positions within a day the same as in a full read
+        frames, found = [], 0
+        for month in months:
+            first_day = pd.Timestamp(f"{month}-01")
+            df = self._read(first_day, first_day + pd.offsets.MonthEnd(0))
+            frames.append(df)
+            found += len(_page_classes(df, start, end, class_types, school_id, ['date'], before, limit + 1)[0])
+            if found > limit:
+                break
+        if not frames:
+            frames = [self.delta.load_classes().iloc[:0]]
+        return _page_classes(_concat_classes(frames[::-1]), start, end, class_types, school_id, columns, before, limit)
+
+    def date_bounds(self):
+        dates = self._read(columns=['date'])['date']
+        if dates.empty:
+            return None
+        return dates.min(), dates.max()
+
+    def append_classes(self, rows):
+        """Append classes to the delta and return the signatures from before and after the write."""
+        manifest, edits = self._manifest_signature(), self._edits_signature()
+        before, after = self.delta.append_classes(rows)
+        if after[0][1] >= self.compact_bytes and not self._compacting.locked():
+            threading.Thread(target=self.compact, daemon=True).start()
+        return (manifest, before, edits), (manifest, after, edits)
+
+    def append_schools(self, rows):
+        self.delta.append_schools(rows)
+
+    def edit_classes(self, updates=None, deletes=(), reprice=None):
+        """Log changed and deleted classes; reads apply them until compact() folds them into the partitions.
+
+        Takes and returns the same values as CsvStorage.edit_classes.
+        """
+        edited = _log_edits(self, self.delta, self.delta.classes_file, self._find_classes, updates, deletes, reprice)
+        if edited[1][2][1] >= self.compact_bytes and not self._compacting.locked():
+            threading.Thread(target=self.compact, daemon=True).start()
+        return edited
+
+    def update_school(self, record):
+        self.delta.update_school(record)
+
+    def _partition_file(self, month):
+        return os.path.join(self.classes_dir, f"month={month}", 'data.parquet')
+
+    def _write_partition(self, month, rows):
+        """Replace one monthly partition with `rows`."""
+        path = self._partition_file(month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        rows = rows[STORED_CLASSES_COLUMNS].astype({'school_id': str, 'class_type': str}).sort_values('date', kind='stable')
+        table = pa.Table.from_pandas(rows, schema=_PARQUET_SCHEMA, preserve_index=False)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table, tmp_path, row_group_size=64 * 1024)
+        os.replace(tmp_path, path)
+
+    def _last_class_id(self):
+        """Return the largest class ID in the partitions, as recorded by the last manifest line."""
+        with open(self.manifest_file, 'rb') as f:
+            f.seek(max(0, f.seek(0, os.SEEK_END) - 4096))
+            lines = f.read().splitlines()
+        # Lines are "<time> <rows> <last class ID>"; older ones have no ID
+        last = lines[-1].split() if lines else []
+        return int(last[2]) if len(last) == 3 else 0
+
+    def _bump_manifest(self, rows, last_id=None):
+        # Any change to the partitions bumps the manifest, and with it the signature
+        if last_id is None:
+            last_id = self._last_class_id()
+        with open(self.manifest_file, 'a') as f:
+            f.write(f"{pd.Timestamp.now().isoformat()} {rows} {last_id}\n")
+
+    def _add_class_ids(self):
+        """Number the classes of a store written before classes had IDs; the caller holds the delta lock.
+
+        Partitions are numbered month by month, then the delta after them.
+        """
+        partitions = sorted(os.listdir(self.classes_dir))
+        if partitions and CLASS_ID not in pq.read_schema(self._partition_file(partitions[0].split('=', 1)[-1])).names:
+            next_id = 1
+            for partition in partitions:
+                month = partition.split('=', 1)[-1]
+                rows = pq.read_table(self._partition_file(month)).to_pandas(date_as_object=False)
+                rows[CLASS_ID] = np.arange(next_id, next_id + len(rows))
+                next_id += len(rows)
+                self._write_partition(month, rows)
+            self._bump_manifest(0, next_id - 1)
+        self.delta._add_class_ids()
+
+    def write_classes(self, df):
+        """Merge a typed classes frame into the monthly partitions."""
+        df = df.assign(month=df['date'].dt.strftime('%Y-%m'))
+        for month, rows in df.groupby('month', sort=True):
+            path = self._partition_file(month)
+            if os.path.exists(path):
+                existing = pq.read_table(path).to_pandas(date_as_object=False)
+                rows = pd.concat([existing, rows[STORED_CLASSES_COLUMNS]], ignore_index=True)
+            self._write_partition(month, rows)
+        self._bump_manifest(len(df), max(self._last_class_id(), int(df[CLASS_ID].max()) if len(df) else 0))
+
+    def _compact_locked(self):
+        """Fold the delta and the edit log into the partitions; the caller holds the delta lock."""
+        delta_file = self.delta.classes_file
+        try:
+            delta = _coerce_classes(pd.read_csv(delta_file, dtype=_CSV_READ_DTYPES))
+        except pd.errors.EmptyDataError:
+            delta = None
+        if delta is not None and not delta.empty:
+            self.write_classes(delta)
+            self.delta._replace_file(delta_file, ','.join(STORED_CLASSES_COLUMNS) + '\n')
+
+        # Every class is in a partition now, so edits only touch the months they were or are in
+        if not os.path.exists(self.edits_file):
+            return
+        latest = _parse_edits(pd.read_csv(self.edits_file, dtype=_EDIT_READ_DTYPES)).drop_duplicates(CLASS_ID, keep='last')
+        if latest.empty:
+            return
+        class_ids = latest[CLASS_ID].tolist()
+        found = self._dataset().to_table(columns=['month'], filter=ds.field(CLASS_ID).isin(class_ids))
+        updated = latest[latest['deleted'] == 0]
+        updated_months = updated['date'].dt.strftime('%Y-%m')
+        for month in sorted(set(found['month'].to_pylist()) | set(updated_months)):
+            path = self._partition_file(month)
+            rows = [updated.loc[updated_months == month, STORED_CLASSES_COLUMNS].astype({'school_id': str, 'class_type': str})]
+            if os.path.exists(path):
+                existing = pq.read_table(path).to_pandas(date_as_object=False)
+                rows.insert(0, existing[~existing[CLASS_ID].isin(class_ids)])
+            self._write_partition(month, pd.concat(rows, ignore_index=True))
+        self._bump_manifest(len(latest))
+        self.delta._replace_file(self.edits_file, ','.join(EDIT_COLUMNS) + '\n')
+
+    def compact(self):
+        """Move the rows of the delta file and the edit log into the monthly partitions."""
+        if not self._compacting.acquire(blocking=False):
+            return
+        try:
+            with file_lock(self.delta.classes_file):
+                self._compact_locked()
+            self.delta._invalidate(self.delta.classes_file)
+        finally:
+            self._compacting.release()
+
+    def update_prices(self, reprice, start=None, end=None):
+        """Rewrite the price of the classes in an inclusive date range, one month partition at a time."""
+        changed = 0
+        with file_lock(self.delta.classes_file):
+            # Fold the delta in first so every class lives in a partition
+            self._compact_locked()
+            self.delta._invalidate(self.delta.classes_file)
+            first = None if start is None else pd.Timestamp(start).strftime('%Y-%m')
+            last = None if end is None else pd.Timestamp(end).strftime('%Y-%m')
+            for partition in sorted(os.listdir(self.classes_dir)):
+                month = partition.split('=', 1)[-1]
+                if (first is not None and month < first) or (last is not None and month > last):
+                    continue
+                rows = pq.read_table(self._partition_file(month)).to_pandas(date_as_object=False)
+                typed = _coerce_classes(rows.assign(school_id=pd.to_numeric(rows['school_id'])))
+                in_range = pd.Series(True, index=typed.index)
+                if start is not None:
+                    in_range &= typed['date'] >= pd.Timestamp(start)
+                if end is not None:
+                    in_range &= typed['date'] < pd.Timestamp(end) + timedelta(days=1)
+                if not in_range.any():
+                    continue
+                old_prices = typed.loc[in_range, 'price'].to_numpy(dtype='float64')
+                new_prices = np.asarray(reprice(typed.loc[in_range]), dtype='float64')
+                month_changed = int((np.abs(new_prices - old_prices) > 0.005).sum())
+                if month_changed:
+                    rows.loc[in_range, 'price'] = new_prices.astype('float32')
+                    self._write_partition(month, rows)
+                    changed += month_changed
+            if changed:
+                self._bump_manifest(changed)
+        return changed
+
+    def import_csv(self, classes_file='classes.csv', schools_file='schools.csv', chunksize=500_000):
+        """Copy the rows of the CSV store into the partitions."""
+        source = CsvStorage(classes_file, schools_file)
+        # Pending edits go into the CSV file first so the rows are copied as they are now
+        source.compact()
+        if os.path.exists(schools_file):
+            self.delta.append_schools(source.load_schools().to_dict('records'))
+        try:
+            for chunk in pd.read_csv(classes_file, chunksize=chunksize, dtype=_CSV_READ_DTYPES):
+                with file_lock(self.delta.classes_file):
+                    chunk = _coerce_classes(chunk)
+                    if CLASS_ID not in chunk:
+                        first_id = self._last_class_id() + 1
+                        chunk[CLASS_ID] = np.arange(first_id, first_id + len(chunk))
+                    self.write_classes(chunk)
+        except pd.errors.EmptyDataError:
+            pass
+
+
+def get_storage(backend=None, root=None):
+    """Build the storage backend named by `backend` or the TRACKER_BACKEND environment variable.
+
+    With a `root` directory the data files are kept inside it under their
+    default names, so every educator can have a directory of their own.
+    """
+    backend = backend or os.environ.get('TRACKER_BACKEND', 'csv')
+    if root is not None:
+        os.makedirs(root, exist_ok=True)
+    if backend == 'csv':
+        if root is None:
+            return CsvStorage()
+        return CsvStorage(os.path.join(root, 'classes.csv'), os.path.join(root, 'schools.csv'))
+    if backend == 'sqlite':
+        return SqliteStorage(os.environ.get('TRACKER_DB', 'tracker.db') if root is None else os.path.join(root, 'tracker.db'))
+    if backend == 'parquet':
+        return ParquetStorage(os.environ.get('TRACKER_PARQUET_DIR', 'parquet') if root is None else os.path.join(root, 'parquet'))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Copy the CSV files into another storage backend.")
+    parser.add_argument('backend', choices=['sqlite', 'parquet'])
+    parser.add_argument('--classes', default='classes.csv')
+    parser.add_argument('--schools', default='schools.csv')
+    parser.add_argument('--db', default='tracker.db', help="SQLite database file")
+    parser.add_argument('--dir', default='parquet', help="Parquet data directory")
+    args = parser.parse_args()
+
+    if args.backend == 'sqlite':
+        SqliteStorage(args.db).import_csv(args.classes, args.schools)
+        target = args.db
+    else:
+        ParquetStorage(args.dir).import_csv(args.classes, args.schools)
+        target = args.dir
+    print(f"Imported {args.classes} and {args.schools} into {target}")
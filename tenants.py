@@ -0,0 +1,151 @@
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+import aggregates
+import changes
+import recurring
+import schedule
+import schools
+import write_queue
+from data_manager import DataManager
+
+# Each educator's data lives in a directory of their own under this one
+TENANTS_DIR = os.environ.get('TRACKER_TENANTS_DIR', 'tenants')
+
+# Educators whose DataManager stays loaded, and how long an idle one is kept
+MAX_ACTIVE = max(1, int(os.environ.get('TRACKER_MAX_TENANTS', 20)))
+IDLE_SECONDS = float(os.environ.get('TRACKER_TENANT_IDLE_SECONDS', 30 * 60))
+
+TENANT_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9_-]{0,63}')
+
+# Educators a session or API request may pick, as "name=token,name=token";
+# without it only TRACKER_TENANT (or the working directory) can be used
+TENANT_TOKENS = dict(
+    pair.strip().split('=', 1) for pair in os.environ.get('TRACKER_TENANT_TOKENS', '').split(',') if '=' in pair
+)
+
+# One DataManager per educator, shared by all of their sessions, least
+# recently used first; the default educator is keyed on None
+_managers = OrderedDict()
+_managers_lock = threading.Lock()
+
+
+def check_tenant(tenant):
+    """Raise ValueError unless a tenant name is safe to use as a directory name."""
+    if not TENANT_PATTERN.fullmatch(str(tenant)):
+        raise ValueError(f"Invalid educator name: {tenant}")
+    return str(tenant)
+
+
+def authorize(tenant, token):
+    """Return a tenant picked by a visitor once `token` is the one configured for it.
+
+    Raises ValueError for a name that isn't a tenant name and PermissionError
+    when no token is configured for the tenant or `token` doesn't match.
+    """
+    tenant = check_tenant(tenant)
+    expected = TENANT_TOKENS.get(tenant)
+    if expected is None or not hmac.compare_digest(str(token or '').encode(), expected.encode()):
+        raise PermissionError(f"Not allowed to open the data of {tenant}")
+    return tenant
+
+
+def tenant_root(tenant):
+    """Return the data directory of a tenant, or None for the files in the working directory."""
+    if tenant is None:
+        return None
+    return os.path.join(TENANTS_DIR, check_tenant(tenant))
+
+
+def session_tenant():
+    """Return the educator of the current session.
+
+    `?tenant=<name>&token=<token>` picks one, if the token is the one
+    TRACKER_TENANT_TOKENS lists for it. The choice is remembered for the rest
+    of the session, since moving between pages drops it from the URL, and
+    the token is taken out of the URL. Without one, TRACKER_TENANT or the
+    files in the working directory are used.
+    """
+    token = st.query_params.get('token')
+    if token is not None:
+        del st.query_params['token']
+    if 'tenant' in st.query_params and st.query_params['tenant'] != st.session_state.get('tenant'):
+        try:
+            st.session_state.tenant = authorize(st.query_params['tenant'], token)
+        except (ValueError, PermissionError) as e:
+            st.error(str(e))
+            st.stop()
+    return st.session_state.get('tenant', os.environ.get('TRACKER_TENANT') or None)
+
+
+def session_data_manager():
+    """Return the shared DataManager of the current session's educator, caught up with changes saved elsewhere."""
+    manager = get_data_manager(session_tenant())
+    manager.get_changes()
+    return manager
+
+
+def release(manager):
+    """Drop everything the process caches for a DataManager's storage."""
+    storage = manager.storage
+    # Commit queued classes before letting go of the store
+    write_queue.flush(storage)
+    aggregates.forget(storage)
+    changes.forget(storage)
+    recurring.forget(manager.series_file)
+    schedule.forget(storage)
+    schools.forget(storage)
+    # Only loaded once someone has exported
+    if 'invoices' in sys.modules:
+        sys.modules['invoices'].forget(storage)
+    storage.release()
+
+
+def get_data_manager(tenant=None):
+    """Return the shared DataManager of a tenant, loading it if needed.
+
+    Managers idle for longer than IDLE_SECONDS, and the least recently used
+    ones beyond MAX_ACTIVE, are evicted along with their cached data, so
+    memory grows with the educators in use rather than with sessions.
+    """
+    loaded = None
+    while True:
+        now = time.monotonic()
+        evicted = []
+        with _managers_lock:
+            entry = _managers.pop(tenant, None)
+            if entry is not None or loaded is not None:
+                # Another session may have loaded the same educator meanwhile; keep the first
+                manager = entry[1] if entry is not None else loaded
+                _managers[tenant] = (now, manager)
+                while len(_managers) > MAX_ACTIVE or next(iter(_managers.values()))[0] < now - IDLE_SECONDS:
+                    evicted.append(_managers.popitem(last=False)[1][1])
+                break
+        # Load a new educator without the lock so other sessions don't wait on it
+        loaded = DataManager(root=tenant_root(tenant))
+    for stale in evicted:
+        release(stale)
+    return manager
+
+
+def active():
+    """Return (tenant, idle seconds) of every loaded DataManager, most recently used first."""
+    now = time.monotonic()
+    with _managers_lock:
+        return [(tenant, now - used) for tenant, (used, _) in reversed(_managers.items())]
+
+
+def clear():
+    """Evict every loaded DataManager."""
+    with _managers_lock:
+        evicted = [manager for _, manager in _managers.values()]
+        _managers.clear()
+    for stale in evicted:
+        release(stale)
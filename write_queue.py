@@ -0,0 +1,180 @@
+import atexit
+import os
+import queue
+import threading
+import time
+
+import aggregates
+import instrumentation
+import schedule
+
+# Opt in with TRACKER_WRITE_BEHIND=1; otherwise classes are saved before the form returns
+WRITE_BEHIND = os.environ.get('TRACKER_WRITE_BEHIND', '') == '1'
+
+# Most classes committed in one append
+MAX_BATCH = 1_000
+
+# Queues shared by every session in the process, keyed on the storage location
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+class Ticket:
+    """Receipt for submitted classes; `done` is set once they are durable or have failed."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.submitted = time.time()
+        self.committed = None
+        self.error = None
+        self.done = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def status(self):
+        if not self.done.is_set():
+            return 'queued'
+        return 'failed' if self.error else 'saved'
+
+    def wait(self, timeout=None):
+        """Block until the classes are committed; returns True if they were saved."""
+        self.done.wait(timeout)
+        return self.status == 'saved'
+
+    def add_callback(self, callback):
+        """Call `callback(ticket)` from the writer thread once the commit finishes, or now if it has."""
+        with self._lock:
+            if not self.done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def finish(self, error=None):
+        """Record the outcome of the commit and wake up everyone waiting on it."""
+        with self._lock:
+            self.error = error
+            self.committed = time.time()
+            self.done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class WriteQueue:
+    """Classes waiting to be appended to one store, and the thread that appends them.
+
+    Whatever piles up while a commit is running goes out together in the
+    next one, so a burst of submissions costs a few appends (and fsyncs)
+    instead of one each.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        """Queue classes for the writer and return their Ticket right away.
+
+        A queue that was flushed while the caller held on to it hands the
+        classes to the store's current queue instead.
+        """
+        ticket = Ticket(list(rows))
+        with self._lock:
+            if not self._closed:
+                self._queue.put(ticket)
+                return ticket
+        return get_queue(self.storage).submit(ticket.rows)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            ticket = self._queue.get()
+            if ticket is None:
+                return
+            batch = [ticket]
+            rows = len(ticket.rows)
+            # Take whatever else arrived in the meantime, up to a batch
+            while rows < MAX_BATCH:
+                try:
+                    ticket = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if ticket is None:
+                    self._commit(batch)
+                    return
+                batch.append(ticket)
+                rows += len(ticket.rows)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        rows = [row for ticket in batch for row in ticket.rows]
+        with instrumentation.span('write_queue.commit') as span:
+            try:
+                before, after = self.storage.append_classes(rows)
+            except Exception as e:
+                if len(batch) > 1:
+                    # Don't let one bad submission fail everyone else's
+                    for ticket in batch:
+                        self._commit([ticket])
+                    return
+                instrumentation.mark_error(e)
+                batch[0].finish(str(e))
+                return
+            try:
+                aggregates.record_append(self.storage, rows, before, after)
+                schedule.record_append(self.storage, rows, before, after)
+            except Exception as e:
+                # The classes are saved; rebuild the caches from disk instead of patching them
+                instrumentation.mark_error(e)
+                aggregates.forget(self.storage)
+                schedule.forget(self.storage)
+            span.rows = len(rows)
+        for ticket in batch:
+            ticket.finish()
+
+    def close(self, timeout=None):
+        """Commit everything queued so far and stop the writer."""
+        with _queues_lock:
+            # Later submissions start a new queue rather than coming back here
+            if _queues.get(self.storage.cache_key()) is self:
+                del _queues[self.storage.cache_key()]
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+        self._thread.join(timeout)
+
+
+def get_queue(storage):
+    """Return the process-wide write queue of a storage backend, starting it on first use."""
+    key = storage.cache_key()
+    with _queues_lock:
+        write_queue = _queues.get(key)
+        if write_queue is None:
+            write_queue = _queues[key] = WriteQueue(storage)
+        return write_queue
+
+
+def flush(storage, timeout=None):
+    """Commit and stop the write queue of a storage backend, if it has one."""
+    with _queues_lock:
+        write_queue = _queues.pop(storage.cache_key(), None)
+    if write_queue is not None:
+        write_queue.close(timeout)
+
+
+@atexit.register
+def flush_all(timeout=30):
+    """Commit every queued class before the process exits."""
+    with _queues_lock:
+        write_queues = list(_queues.values())
+        _queues.clear()
+    for write_queue in write_queues:
+        write_queue.close(timeout)